@@ -0,0 +1,546 @@
+"""Benchmarks the manager's backend against local stand-in servers.
+
+Synthetic manifests and .mrpack archives are generated at each requested size
+and served from a MockModrinthServer and a MockFileServer, so no run touches
+the real API. Every stage reports its wall time, the requests it sent and the
+peak memory allocated while it ran. The memory enriched manifests retain is
+measured per 1,000 files, against the same manifests built keeping their raw
+JSON. Results are appended to a JSON lines file and compared with the
+previous run, so regressions between releases show up.
+
+Usage:
+    python bench.py
+    python bench.py --sizes 100 1000 --latency 0.05 --rate-limit 300
+    python bench.py --override-size 1048576 --no-trace-memory
+"""
+
+import argparse
+import gc
+import hashlib
+import json
+import os
+import pathlib
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from collections import Counter
+from typing import Any, Callable, Optional, TypeVar
+
+from manifest import ModrinthManifest, enrich_manifests, get_remote_manifest
+from manifest_diff import diff_manifests
+from manifest_history import ManifestHistory, get_history, set_history
+from metadata_cache import MetadataCache
+from mock_api import MockFileServer, MockModrinthServer
+from modrinth_api import (
+    ModrinthClient,
+    ModrinthProject,
+    ModrinthVersionFile,
+    RateLimiter,
+    build_projects,
+    build_version_files,
+    get_metadata_cache,
+    set_client,
+    set_metadata_cache,
+)
+from mrpack import MrPack
+from paths import user_cache_dir
+
+_default_sizes = (100, 1000, 10000)
+_changed_fraction = 0.05
+
+
+def _package_version() -> str:
+    pyproject = pathlib.Path(__file__).parent.parent.joinpath("pyproject.toml")
+    try:
+        for line in pyproject.read_text().splitlines():
+            if line.startswith("version"):
+                return line.split("=", 1)[1].strip().strip('"')
+    except OSError:
+        pass
+    return "unknown"
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return (
+            subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=pathlib.Path(__file__).parent,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+            or None
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _file_json(name: str, seed: str) -> dict:
+    sha1 = hashlib.sha1(seed.encode()).hexdigest()
+    sha512 = hashlib.sha512(seed.encode()).hexdigest()
+    return {
+        "path": f"mods/{name}.jar",
+        "hashes": {"sha1": sha1, "sha512": sha512},
+        "env": {"client": "required", "server": "required"},
+        "downloads": [f"https://cdn.modrinth.com/data/{sha1[:8]}/{name}.jar"],
+        "fileSize": 1024,
+    }
+
+
+def generate_manifests(size: int, seed: int = 0) -> tuple[dict, dict]:
+    """Generates a remote manifest and a local manifest a few versions
+    behind it.
+
+    Args:
+        size (int): Files in each manifest.
+        seed (int, optional): Seeds which files differ.
+
+    Returns:
+        tuple[dict, dict]: The json-encoded remote and local manifests.
+    """
+    rng = random.Random(seed)
+    local_files = [
+        _file_json(f"mod-{index}", f"{size}:{index}:1") for index in range(size)
+    ]
+    remote_files = list(local_files)
+    for index in rng.sample(range(size), max(1, int(size * _changed_fraction))):
+        remote_files[index] = _file_json(f"mod-{index}", f"{size}:{index}:2")
+
+    def manifest(version_id: str, files: list[dict]) -> dict:
+        return {
+            "formatVersion": 1,
+            "game": "minecraft",
+            "versionId": version_id,
+            "name": f"Benchmark {size}",
+            "files": files,
+            "dependencies": {"minecraft": "1.20.1", "fabric-loader": "0.15.11"},
+        }
+
+    return manifest("2", remote_files), manifest("1", local_files)
+
+
+def generate_metadata(manifests: list[dict]) -> tuple[list[dict], list[dict]]:
+    """Generates API responses for every file of the manifests, one project
+    per mod shared across its versions.
+
+    Returns:
+        tuple[list[dict], list[dict]]: The json-encoded version files and
+        projects, shaped like the API's but with shorter text fields.
+    """
+    version_files: dict[str, dict] = {}
+    projects: dict[str, dict] = {}
+    for manifest_json in manifests:
+        for file_json in manifest_json["files"]:
+            slug = file_json["path"].split("/")[-1].removesuffix(".jar")
+            # Project ids differ between sizes, so runs don't share projects.
+            project_id = hashlib.sha1(
+                f"{manifest_json['name']}/{slug}".encode()
+            ).hexdigest()[:8]
+            projects[project_id] = {
+                "id": project_id,
+                "slug": slug,
+                "title": slug.title(),
+                "description": f"The {slug} mod.",
+                "categories": ["utility"],
+                "game_versions": ["1.20.1"],
+                "loaders": ["fabric"],
+            }
+            sha1 = file_json["hashes"]["sha1"]
+            version_files[sha1] = {
+                "id": sha1[:8],
+                "name": slug,
+                "version_number": sha1[:6],
+                "project_id": project_id,
+                "date_published": "2024-01-01T00:00:00Z",
+                "game_versions": ["1.20.1"],
+                "loaders": ["fabric"],
+                "changelog": f"Changes in {slug} {sha1[:6]}.",
+                "files": [
+                    {
+                        "hashes": file_json["hashes"],
+                        "url": file_json["downloads"][0],
+                        "filename": f"{slug}.jar",
+                        "primary": True,
+                        "size": file_json["fileSize"],
+                    }
+                ],
+            }
+    return list(version_files.values()), list(projects.values())
+
+
+def populate_server(server: MockModrinthServer, manifests: list[dict]) -> None:
+    """Registers the generate_metadata responses for the manifests."""
+    version_files, projects = generate_metadata(manifests)
+    for project_json in projects:
+        server.add_project(project_json)
+    for version_file_json in version_files:
+        server.add_version_file(version_file_json)
+
+
+def _retained(build: Callable[[], object]) -> tuple[object, int]:
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    gc.collect()
+    return value, tracemalloc.get_traced_memory()[0] - before
+
+
+def measure_model_memory(manifests: list[dict]) -> dict[str, int]:
+    """Measures the memory enriched manifests retain, built the compact way
+    and built keeping every raw JSON payload. Needs tracemalloc running.
+
+    Returns:
+        dict[str, int]: The bytes retained per 1,000 manifest files by either
+        model, and the difference.
+    """
+    version_files, projects = generate_metadata(manifests)
+    payload = json.dumps([manifests, version_files, projects])
+
+    def build(keep_json: bool) -> list[ModrinthManifest]:
+        manifests_json, version_files_json, projects_json = json.loads(payload)
+        if keep_json:
+            version_file_models = {
+                version_file_json["id"]: ModrinthVersionFile(
+                    version_file_json, keep_json=True
+                )
+                for version_file_json in version_files_json
+            }
+            project_models = {
+                project_json["id"]: ModrinthProject(project_json, keep_json=True)
+                for project_json in projects_json
+            }
+        else:
+            # The same shared objects the API lookups hand out.
+            version_file_models = build_version_files(
+                {version_file["id"]: version_file for version_file in version_files_json}
+            )
+            project_models = build_projects(
+                {project["id"]: project for project in projects_json}
+            )
+        built = [
+            ModrinthManifest(manifest_json, enrich=False, keep_json=keep_json)
+            for manifest_json in manifests_json
+        ]
+        for manifest in built:
+            manifest._apply_metadata(version_file_models, project_models)
+        return built
+
+    history = get_history()
+    set_history(None)
+    try:
+        compact, compact_bytes = _retained(lambda: build(False))
+        del compact
+        kept, kept_bytes = _retained(lambda: build(True))
+        del kept
+    finally:
+        set_history(history)
+
+    thousands = sum(len(manifest["files"]) for manifest in manifests) / 1000
+    return {
+        "compact_bytes_per_1k": round(compact_bytes / thousands),
+        "json_bytes_per_1k": round(kept_bytes / thousands),
+        "saved_bytes_per_1k": round((kept_bytes - compact_bytes) / thousands),
+    }
+
+
+def write_pack(
+    path: pathlib.Path, manifest_json: dict, override_files: int, override_size: int
+) -> None:
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("modrinth.index.json", json.dumps(manifest_json, indent=4))
+        for index in range(override_files):
+            # Half random, half repetitive, so the overrides compress like
+            # real configs rather than not at all or completely.
+            content = os.urandom(override_size // 2) + b"a" * (
+                override_size - override_size // 2
+            )
+            archive.writestr(f"overrides/config/file-{index}.cfg", content)
+
+
+def stream_pack(path: pathlib.Path, enrich: bool) -> ModrinthManifest:
+    with MrPack(path).open_manifest() as manifest_file:
+        return ModrinthManifest.from_stream(manifest_file, enrich=enrich)
+
+
+_T = TypeVar("_T")
+
+
+class _Stage:
+    def __init__(
+        self,
+        servers: list[MockModrinthServer | MockFileServer],
+        client: ModrinthClient,
+        trace_memory: bool,
+    ) -> None:
+        self.servers: list[MockModrinthServer | MockFileServer] = servers
+        self.client: ModrinthClient = client
+        self.trace_memory: bool = trace_memory
+        self.results: dict[str, dict] = {}
+
+    def _requests(self) -> Counter[str]:
+        sent: Counter[str] = Counter()
+        for server in self.servers:
+            sent.update(server.requests)
+        return sent
+
+    def run(self, name: str, function: Callable[[], _T]) -> _T:
+        requests_before = self._requests()
+        stats_before = self.client.stats()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        value = function()
+        seconds = time.perf_counter() - started
+        peak = (
+            tracemalloc.get_traced_memory()[1] - memory_before
+            if self.trace_memory
+            else None
+        )
+        stats = self.client.stats()
+        sent = self._requests()
+        sent.subtract(requests_before)
+        self.results[name] = {
+            "seconds": round(seconds, 6),
+            "requests": {route: count for route, count in sent.items() if count},
+            "retries": stats["retries"] - stats_before["retries"],
+            "peak_bytes": peak,
+        }
+        return value
+
+
+def run_size(
+    size: int,
+    work_dir: pathlib.Path,
+    latency: float,
+    rate_limit: int,
+    override_files: int,
+    override_size: int,
+    trace_memory: bool,
+) -> dict[str, dict]:
+    """Runs every stage against manifests of one size.
+
+    Returns:
+        dict[str, dict]: The wall time, requests and peak memory of each
+        stage, identified by stage name.
+    """
+    remote_json, local_json = generate_manifests(size)
+    size_dir = work_dir.joinpath(str(size))
+    size_dir.mkdir()
+    pack_path = size_dir.joinpath("local.mrpack")
+    write_pack(pack_path, local_json, override_files, override_size)
+
+    set_history(ManifestHistory(size_dir.joinpath("history.sqlite3")))
+    set_metadata_cache(MetadataCache(size_dir.joinpath("metadata.sqlite3")))
+
+    with MockModrinthServer(
+        rate_limit=rate_limit, latency=latency
+    ) as api_server, MockFileServer(latency=latency) as file_server:
+        populate_server(api_server, [remote_json, local_json])
+        remote_url = file_server.add_file(
+            f"{size}/modrinth.index.json", json.dumps(remote_json).encode()
+        )
+        client = ModrinthClient(
+            api_url=api_server.api_url, rate_limiter=RateLimiter(rate_limit)
+        )
+        set_client(client)
+        stage = _Stage([api_server, file_server], client, trace_memory)
+
+        remote, _ = stage.run("fetch_remote", lambda: get_remote_manifest(remote_url))
+        local = stage.run(
+            "read_pack",
+            lambda: ModrinthManifest(MrPack(pack_path).read_manifest(), enrich=False),
+        )
+        stage.run("stream_pack", lambda: stream_pack(pack_path, enrich=False))
+        stage.run("metadata_cold", lambda: enrich_manifests([remote, local]))
+        stage.run(
+            "metadata_warm",
+            lambda: enrich_manifests(
+                [
+                    ModrinthManifest(remote_json, enrich=False),
+                    ModrinthManifest(local_json, enrich=False),
+                ]
+            ),
+        )
+        # Streams the pack again against an empty cache, so the lookups run
+        # while the rest of the index is read.
+        metadata_cache = get_metadata_cache()
+        set_metadata_cache(MetadataCache(size_dir.joinpath("metadata-stream.sqlite3")))
+        stage.run("stream_enrich", lambda: stream_pack(pack_path, enrich=True))
+        set_metadata_cache(metadata_cache)
+        stage.run("diff", lambda: diff_manifests(remote, local))
+        stage.run(
+            "copy_manifest",
+            lambda: MrPack(pack_path).copy_manifest(
+                remote_json, size_dir.joinpath("synced.mrpack")
+            ),
+        )
+        client.close()
+
+    return stage.results
+
+
+def _previous_results(results_path: pathlib.Path, settings: dict) -> Optional[dict]:
+    # Only runs with the same settings are comparable.
+    try:
+        lines = results_path.read_text().splitlines()
+    except OSError:
+        return None
+    for line in reversed(lines):
+        record = json.loads(line)
+        if record.get("settings") == settings:
+            return record
+    return None
+
+
+def _format_change(current: float, previous: Optional[float]) -> str:
+    if not previous:
+        return ""
+    return f"{(current - previous) / previous:+.0%}"
+
+
+def print_results(record: dict, previous: Optional[dict]) -> None:
+    print(
+        f"{'files':>6} {'stage':<14} {'seconds':>9} {'change':>7} "
+        f"{'peak MiB':>9} {'requests':>8}"
+    )
+    for size, stages in record["results"].items():
+        previous_stages = ((previous or {}).get("results") or {}).get(size, {})
+        for name, result in stages.items():
+            previous_seconds = previous_stages.get(name, {}).get("seconds")
+            peak = result["peak_bytes"]
+            print(
+                f"{size:>6} {name:<14} {result['seconds']:>9.4f} "
+                f"{_format_change(result['seconds'], previous_seconds):>7} "
+                f"{'' if peak is None else f'{peak / 2**20:.1f}':>9} "
+                f"{sum(result['requests'].values()):>8}"
+            )
+    if record.get("memory"):
+        print(
+            f"\n{'files':>6} {'model KiB/1k':>13} {'raw JSON KiB/1k':>16} "
+            f"{'saved KiB/1k':>13}"
+        )
+        for size, memory in record["memory"].items():
+            print(
+                f"{size:>6} {memory['compact_bytes_per_1k'] / 1024:>13.0f} "
+                f"{memory['json_bytes_per_1k'] / 1024:>16.0f} "
+                f"{memory['saved_bytes_per_1k'] / 1024:>13.0f}"
+            )
+    if previous is not None:
+        recorded = time.strftime(
+            "%Y-%m-%d %H:%M", time.localtime(previous["recorded_at"])
+        )
+        print(
+            f"\nchange is against {previous['version']} "
+            f"({previous.get('commit') or 'unknown commit'}) recorded {recorded}"
+        )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=list(_default_sizes),
+        help="Files per manifest, one benchmark run per size.",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds added to every response."
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=int,
+        default=100000,
+        help="Requests per minute the mock API allows.",
+    )
+    parser.add_argument(
+        "--override-files", type=int, default=20, help="Files under overrides/."
+    )
+    parser.add_argument(
+        "--override-size",
+        type=int,
+        default=64 * 1024,
+        help="Size in bytes of each override file.",
+    )
+    parser.add_argument(
+        "--no-trace-memory",
+        action="store_true",
+        help="Skip measuring peak memory, which slows every stage down.",
+    )
+    parser.add_argument(
+        "--results",
+        type=pathlib.Path,
+        default=None,
+        help="JSON lines file results are appended to. Defaults to "
+        "bench/results.jsonl in the user cache dir.",
+    )
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    results_path: pathlib.Path = args.results or user_cache_dir().joinpath(
+        "bench", "results.jsonl"
+    )
+    trace_memory = not args.no_trace_memory
+
+    with tempfile.TemporaryDirectory(prefix="manifest-manager-bench-") as work_dir:
+        # Keeps the remote manifest cache and anything else written to the
+        # cache dir out of the user's real cache.
+        os.environ["MANIFEST_MANAGER_CACHE_DIR"] = work_dir
+        if trace_memory:
+            tracemalloc.start()
+        memory: dict[str, dict] = {}
+        results: dict[str, dict] = {}
+        for size in args.sizes:
+            if trace_memory:
+                memory[str(size)] = measure_model_memory(
+                    list(generate_manifests(size))
+                )
+            results[str(size)] = run_size(
+                size,
+                pathlib.Path(work_dir),
+                args.latency,
+                args.rate_limit,
+                args.override_files,
+                args.override_size,
+                trace_memory,
+            )
+        if trace_memory:
+            tracemalloc.stop()
+
+    settings: dict[str, Any] = {
+        "latency": args.latency,
+        "rate_limit": args.rate_limit,
+        "override_files": args.override_files,
+        "override_size": args.override_size,
+        "trace_memory": trace_memory,
+    }
+    record: dict[str, Any] = {
+        "version": _package_version(),
+        "commit": _git_commit(),
+        "recorded_at": time.time(),
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "settings": settings,
+        "results": results,
+        "memory": memory,
+    }
+    previous = _previous_results(results_path, settings)
+    print_results(record, previous)
+
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(results_path, "a") as results_file:
+        results_file.write(json.dumps(record) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
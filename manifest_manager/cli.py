@@ -0,0 +1,412 @@
+"""Headless entry point for checking packs in automation.
+
+Diffs any number of local .mrpack archives against one remote manifest in a
+single process. The remote manifest and the Modrinth metadata for every pack
+are fetched once and shared, and the results are written as JSON.
+
+Usage:
+    python cli.py diff --remote URL [--sync] [--no-metadata] PACK [PACK ...]
+    python cli.py history NAME [--diff FROM_VERSION TO_VERSION]
+    python cli.py verify PACK INSTANCE_DIR
+    python cli.py install PACK INSTANCE_DIR [--side client|server] [--store [DIR]]
+    python cli.py update PACK INSTANCE_DIR --remote URL [--side client|server]
+    python cli.py outdated PACK [--write]
+    python cli.py store {stats,gc} [--root DIR]
+
+Any command takes --trace PATH before it to write a Chrome trace of where its
+time went.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from typing import TYPE_CHECKING, Optional
+
+from tracing import enable_recording
+
+# Each command imports the backend it needs when it runs, so parsing the
+# arguments, or printing --help, doesn't load the networking and archive
+# modules.
+if TYPE_CHECKING:
+    from manifest import ModrinthManifest
+
+
+def _describe_files(manifest: ModrinthManifest, hashes: list[str]) -> list[dict]:
+    described: list[dict] = []
+    for file_hash in hashes:
+        file = manifest.files[file_hash]
+        described.append(
+            {
+                "sha1": file_hash,
+                "path": file.path,
+                "title": file.title,
+                "version": file.version_number,
+            }
+        )
+    return described
+
+
+def diff_packs(
+    remote_url: str,
+    pack_paths: list[str],
+    sync: bool = False,
+    fetch_metadata: bool = True,
+    max_workers: Optional[int] = None,
+) -> dict:
+    """Diffs local packs against a remote manifest.
+
+    Args:
+        remote_url (str): The URL of the remote modrinth.index.json.
+        pack_paths (list[str]): Paths of the local .mrpack archives.
+        sync (bool, optional): Copy the remote manifest into every outdated
+        pack. Defaults to False.
+        fetch_metadata (bool, optional): Look up titles and versions for the
+        differing files. Defaults to True.
+        max_workers (Optional[int], optional): Threads used to read packs.
+
+    Returns:
+        dict: The json-encodable results, one entry per pack in the order
+        given, skipping packs given more than once.
+    """
+    from fleet import load_fleet
+    from mrpack import MrPack
+
+    fleet = load_fleet(remote_url, pack_paths, fetch_metadata, max_workers)
+    remote = fleet.remote
+
+    results: list[dict] = []
+    for entry in fleet.entries:
+        if entry.manifest is None or entry.diff is None:
+            results.append(
+                {"path": entry.path, "status": "error", "error": entry.error}
+            )
+            continue
+        path = entry.path
+        local = entry.manifest
+        diff = entry.diff
+        result: dict = {
+            "path": path,
+            "name": local.name,
+            "versionId": local.version_id,
+            "status": entry.status,
+            "remote_only": _describe_files(remote, diff.source_only),
+            "local_only": _describe_files(local, diff.target_only),
+            "changes": diff.to_json(),
+            "synced": False,
+        }
+        if sync and result["status"] == "outdated":
+            try:
+                MrPack(path).copy_manifest(remote.to_json())
+                result["synced"] = True
+            except Exception as error:
+                result["status"] = "error"
+                result["error"] = str(error)
+        results.append(result)
+
+    return {
+        "remote": {
+            "url": remote_url,
+            "name": remote.name,
+            "versionId": remote.version_id,
+            "files": len(remote.files),
+        },
+        "packs": results,
+    }
+
+
+def _diff_command(args: argparse.Namespace) -> int:
+    report = diff_packs(
+        args.remote,
+        args.packs,
+        sync=args.sync,
+        fetch_metadata=not args.no_metadata,
+        max_workers=args.workers,
+    )
+    output = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+    statuses = {pack["status"] for pack in report["packs"]}
+    if "error" in statuses:
+        return 2
+    if any(pack["status"] == "outdated" and not pack["synced"] for pack in report["packs"]):
+        return 1
+    return 0
+
+
+def _history_command(args: argparse.Namespace) -> int:
+    from manifest_history import ManifestHistory, get_history
+
+    history = get_history() or ManifestHistory()
+    if args.diff is None:
+        versions = [
+            {"versionId": version_id, "files": file_count, "recorded_at": recorded_at}
+            for version_id, file_count, recorded_at in history.versions(args.name)
+        ]
+        print(json.dumps(versions, indent=4))
+        return 0
+
+    from_version_id, to_version_id = args.diff
+    try:
+        added, removed = history.diff(args.name, from_version_id, to_version_id)
+    except KeyError as error:
+        print(error.args[0], file=sys.stderr)
+        return 2
+    print(
+        json.dumps(
+            {
+                "added": [file["path"] for file in added.values()],
+                "removed": [file.get("path") for file in removed.values()],
+            },
+            indent=4,
+        )
+    )
+    return 0
+
+
+def _verify_command(args: argparse.Namespace) -> int:
+    from fleet import read_pack
+    from instance import verify_instance
+
+    try:
+        manifest = read_pack(args.pack)
+    except Exception as error:
+        print(error, file=sys.stderr)
+        return 2
+    result = verify_instance(manifest, args.instance, max_workers=args.workers)
+    print(json.dumps(result.to_json(), indent=4))
+    return 0 if result.ok else 1
+
+
+def _install_command(args: argparse.Namespace) -> int:
+    from installer import install_pack
+    from jar_store import JarStore
+
+    try:
+        store = None
+        if args.store is not None:
+            store = JarStore(args.store or None)
+        report = install_pack(
+            args.pack,
+            args.instance,
+            side=args.side,
+            max_workers=args.workers,
+            store=store,
+        )
+    except Exception as error:
+        print(error, file=sys.stderr)
+        return 2
+    print(json.dumps(report.to_json(), indent=4))
+    return 0 if not report.failed else 1
+
+
+def _update_command(args: argparse.Namespace) -> int:
+    from fleet import read_pack
+    from installer import Installer
+    from instance_sync import sync_instance
+    from jar_store import JarStore
+    from manifest import get_remote_manifest
+    from manifest_diff import diff_manifests
+    from mrpack import MrPack
+
+    try:
+        local = read_pack(args.pack)
+        remote, _ = get_remote_manifest(args.remote)
+    except Exception as error:
+        print(error, file=sys.stderr)
+        return 2
+
+    installer = Installer(
+        max_workers=args.workers,
+        side=args.side,
+        store=JarStore(args.store or None) if args.store is not None else None,
+    )
+    report = sync_instance(diff_manifests(remote, local), args.instance, installer)
+
+    # The pack keeps describing what is installed, so the next update diffs
+    # against the right manifest.
+    report_json = report.to_json()
+    if report_json["ok"] and not args.pack.endswith(".json"):
+        MrPack(args.pack).copy_manifest(remote.to_json())
+    print(json.dumps(report_json, indent=4))
+    return 0 if report_json["ok"] else 1
+
+
+def _outdated_command(args: argparse.Namespace) -> int:
+    from fleet import read_pack
+    from mrpack import MrPack
+    from updates import check_updates
+
+    try:
+        manifest = read_pack(args.pack)
+        manifest.enrich()
+        check = check_updates(manifest)
+    except Exception as error:
+        print(error, file=sys.stderr)
+        return 2
+
+    if args.write and check.updates and not args.pack.endswith(".json"):
+        MrPack(args.pack).copy_manifest(check.updated_manifest_json())
+    print(json.dumps(check.to_json(), indent=4))
+    return 1 if check.updates and not args.write else 0
+
+
+def _store_command(args: argparse.Namespace) -> int:
+    from jar_store import JarStore
+
+    store = JarStore(args.root)
+    if args.action == "gc":
+        deleted, freed = store.collect_garbage()
+        print(json.dumps({"deleted": deleted, "freed": freed}, indent=4))
+    else:
+        print(
+            json.dumps(
+                {
+                    **store.stats(),
+                    "instances": [
+                        {"path": path, "name": name, "versionId": version_id}
+                        for path, name, version_id in store.instances()
+                    ],
+                },
+                indent=4,
+            )
+        )
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    # Only for the default remote URL. The module defers its own networking
+    # imports until a manifest is fetched.
+    from manifest import ModrinthManifest
+
+    parser = argparse.ArgumentParser(
+        prog="manifest-manager", description="Modrinth Manifest File Manager"
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Write a Chrome trace of the command's timing spans to PATH.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    diff = commands.add_parser(
+        "diff", help="Diff local packs against a remote manifest."
+    )
+    diff.add_argument(
+        "--remote",
+        default=ModrinthManifest.remote_url,
+        help="URL of the remote modrinth.index.json.",
+    )
+    diff.add_argument("packs", nargs="+", help="Local .mrpack archives.")
+    diff.add_argument(
+        "--sync",
+        action="store_true",
+        help="Copy the remote manifest into every outdated pack.",
+    )
+    diff.add_argument(
+        "--no-metadata",
+        action="store_true",
+        help="Skip looking up titles and versions on Modrinth.",
+    )
+    diff.add_argument("--workers", type=int, help="Threads used to read packs.")
+    diff.add_argument("--output", help="Write the JSON report to a file.")
+    diff.set_defaults(handler=_diff_command)
+
+    history = commands.add_parser(
+        "history", help="List or diff recorded versions of a manifest."
+    )
+    history.add_argument("name", help="The manifest's name.")
+    history.add_argument(
+        "--diff",
+        nargs=2,
+        metavar=("FROM_VERSION", "TO_VERSION"),
+        help="Diff two recorded versionIds without network access.",
+    )
+    history.set_defaults(handler=_history_command)
+
+    verify = commands.add_parser(
+        "verify", help="Check an installed instance against a pack's manifest."
+    )
+    verify.add_argument("pack", help="A .mrpack archive or modrinth.index.json.")
+    verify.add_argument("instance", help="The instance's root directory.")
+    verify.add_argument("--workers", type=int, help="Threads used to hash files.")
+    verify.set_defaults(handler=_verify_command)
+
+    install = commands.add_parser(
+        "install", help="Download a pack's files and overrides into an instance."
+    )
+    install.add_argument("pack", help="The .mrpack archive to install.")
+    install.add_argument("instance", help="The instance's root directory.")
+    install.add_argument(
+        "--side",
+        choices=("client", "server"),
+        help="Skip files unsupported on this side and unpack its overrides.",
+    )
+    install.add_argument(
+        "--workers", type=int, default=8, help="Files downloaded at the same time."
+    )
+    install.add_argument(
+        "--store",
+        nargs="?",
+        const="",
+        metavar="DIR",
+        help="Share files through a jar store, by default the one in the cache dir.",
+    )
+    install.set_defaults(handler=_install_command)
+
+    update = commands.add_parser(
+        "update",
+        help="Bring an installed instance up to date with the remote manifest, "
+        "changing only the files that differ.",
+    )
+    update.add_argument("pack", help="The .mrpack archive the instance runs.")
+    update.add_argument("instance", help="The instance's root directory.")
+    update.add_argument(
+        "--remote",
+        default=ModrinthManifest.remote_url,
+        help="URL of the remote modrinth.index.json.",
+    )
+    update.add_argument("--side", choices=("client", "server"))
+    update.add_argument(
+        "--workers", type=int, default=8, help="Files downloaded at the same time."
+    )
+    update.add_argument("--store", nargs="?", const="", metavar="DIR")
+    update.set_defaults(handler=_update_command)
+
+    outdated = commands.add_parser(
+        "outdated",
+        help="List the mods in a pack with newer releases for its loader and "
+        "Minecraft version.",
+    )
+    outdated.add_argument("pack", help="The .mrpack archive to check.")
+    outdated.add_argument(
+        "--write",
+        action="store_true",
+        help="Write the pack's index with every mod updated.",
+    )
+    outdated.set_defaults(handler=_outdated_command)
+
+    store = commands.add_parser(
+        "store", help="Inspect or garbage collect the shared jar store."
+    )
+    store.add_argument("action", choices=("stats", "gc"))
+    store.add_argument("--root", help="The store's directory.")
+    store.set_defaults(handler=_store_command)
+
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.trace:
+        enable_recording(args.trace)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Loads many local packs at once and diffs each against one remote manifest.
+
+The remote manifest and every pack are read concurrently on a pool of
+threads, then the Modrinth metadata for the union of their files is fetched
+once and shared, so loading a fleet of variants derived from one remote takes
+about as long as loading the largest of them.
+
+Usage:
+    from fleet import load_fleet
+
+    fleet = load_fleet(remote_url, ["a.mrpack", "b.mrpack"])
+    for entry in fleet.entries:
+        print(entry.path, entry.status)
+"""
+
+import concurrent.futures
+import os
+import time
+from typing import Callable, Optional
+
+from manifest import ModrinthManifest, enrich_manifests, get_remote_manifest
+from manifest_diff import ManifestDiff, diff_manifests
+from mrpack import MrPack
+from tracing import span
+
+
+def read_pack(path: str) -> ModrinthManifest:
+    """Reads a pack's manifest without enriching it. A bare
+    modrinth.index.json is accepted wherever a pack is."""
+    if path.endswith(".json"):
+        with open(path, "rb") as manifest_file:
+            return ModrinthManifest.from_stream(manifest_file, enrich=False)
+    with MrPack(path).open_manifest() as manifest_file:
+        return ModrinthManifest.from_stream(manifest_file, enrich=False)
+
+
+def unique_paths(paths: list[str]) -> list[str]:
+    """Drops paths that lead to a pack already listed, such as the same pack
+    named twice or matched by overlapping globs, keeping the first of each."""
+    seen: set[str] = set()
+    unique: list[str] = []
+    for path in paths:
+        resolved = os.path.realpath(path)
+        if resolved not in seen:
+            seen.add(resolved)
+            unique.append(path)
+    return unique
+
+
+class FleetEntry:
+    """One local pack of a fleet.
+
+    Attributes:
+        path (str): The pack's path.
+        manifest (Optional[ModrinthManifest]): The pack's manifest once read.
+        diff (Optional[ManifestDiff]): The remote diffed against the pack,
+        once every pack has been read and enriched.
+        error (Optional[str]): Why the pack couldn't be read.
+        seconds (float): Time spent reading the pack.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.manifest: Optional[ModrinthManifest] = None
+        self.diff: Optional[ManifestDiff] = None
+        self.error: Optional[str] = None
+        self.seconds: float = 0.0
+
+    @property
+    def status(self) -> str:
+        """One of "loading", "error", "up-to-date" or "outdated"."""
+        if self.error is not None:
+            return "error"
+        if self.diff is None:
+            return "loading"
+        return "up-to-date" if self.diff.is_empty else "outdated"
+
+
+class Fleet:
+    """Local packs diffed against one remote manifest.
+
+    Attributes:
+        remote (ModrinthManifest): The remote manifest.
+        entries (list[FleetEntry]): One entry per pack, in the order given.
+        A pack given more than once only has the first entry.
+        seconds (float): Wall time of the whole load.
+    """
+
+    def __init__(self, remote: ModrinthManifest, entries: list[FleetEntry]) -> None:
+        self.remote: ModrinthManifest = remote
+        self.entries: list[FleetEntry] = entries
+        self.seconds: float = 0.0
+
+
+def load_fleet(
+    remote_url: str,
+    pack_paths: list[str],
+    fetch_metadata: bool = True,
+    max_workers: Optional[int] = None,
+    on_entry: Optional[Callable[[FleetEntry], None]] = None,
+) -> Fleet:
+    """Reads packs concurrently and diffs each against a remote manifest.
+
+    Args:
+        remote_url (str): The URL of the remote modrinth.index.json.
+        pack_paths (list[str]): Paths of the local .mrpack archives.
+        fetch_metadata (bool, optional): Look up titles and versions for every
+        file, which also pairs upgraded files by project. Defaults to True.
+        max_workers (Optional[int], optional): Threads used to read packs.
+        on_entry (Optional[Callable[[FleetEntry], None]], optional): Called
+        from a worker thread when a pack has been read or failed, and again
+        from the calling thread once it has been diffed.
+
+    Returns:
+        Fleet: The remote manifest and an entry per pack.
+    """
+    started = time.perf_counter()
+    pack_paths = unique_paths(pack_paths)
+    entries = [FleetEntry(path) for path in pack_paths]
+
+    def read_entry(entry: FleetEntry) -> None:
+        entry_started = time.perf_counter()
+        try:
+            entry.manifest = read_pack(entry.path)
+        except Exception as error:
+            entry.error = str(error)
+        entry.seconds = time.perf_counter() - entry_started
+        if on_entry is not None:
+            on_entry(entry)
+
+    with span("fleet load", packs=len(pack_paths)):
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers or min(32, (os.cpu_count() or 1) * 4)
+        ) as executor:
+            remote_future = executor.submit(get_remote_manifest, remote_url)
+            for _ in executor.map(read_entry, entries):
+                pass
+            remote, _ = remote_future.result()
+
+        loaded = {
+            entry: entry.manifest for entry in entries if entry.manifest is not None
+        }
+        if fetch_metadata:
+            enrich_manifests([remote, *loaded.values()])
+
+        for entry, manifest in loaded.items():
+            entry.diff = diff_manifests(remote, manifest)
+            if on_entry is not None:
+                on_entry(entry)
+
+    fleet = Fleet(remote, entries)
+    fleet.seconds = time.perf_counter() - started
+    return fleet
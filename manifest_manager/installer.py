@@ -0,0 +1,375 @@
+"""Installs a pack into an instance directory from its manifest.
+
+Every file is downloaded from the URLs in its downloads list by a bounded
+pool of threads through the shared ModrinthClient, so downloads reuse its
+connection pool and retry 429s and 5xxs with its backoff, and streamed to disk while its
+sha1 and sha512 are computed. A transfer that is cut off leaves a .part file
+behind that the next attempt resumes with a Range request, trying the next
+URL in the list if one fails. Files already installed with the right content
+are left alone, so installing again only fetches what is missing.
+
+Given a JarStore, files are downloaded into the store and linked into the
+instance, and files the store already holds aren't downloaded at all.
+
+Usage:
+    from installer import install_pack
+
+    report = install_pack("my-pack.mrpack", "/srv/minecraft", side="server")
+    print(report.throughput, report.failed)
+"""
+
+import concurrent.futures
+import hashlib
+import logging
+import os
+import pathlib
+import time
+from typing import Optional
+
+import requests
+
+from instance import (
+    DigestCache,
+    file_matches,
+    get_digest_cache,
+    hash_file,
+    resolve_file_path,
+)
+from jar_store import JarStore
+from manifest import ModrinthFile, ModrinthManifest
+from modrinth_api import get_client
+from mrpack import MrPack
+
+_chunk_size = 256 * 1024
+
+
+class FileDownloadError(Exception):
+    """A file could not be downloaded with the expected content."""
+
+
+class FileTiming:
+    """How a single file was installed.
+
+    Attributes:
+        path (str): The instance relative path of the file.
+        url (Optional[str]): The URL the file was downloaded from.
+        bytes (int): Bytes transferred, which is less than the file's size
+        when a partial download was resumed.
+        seconds (float): Time spent installing the file.
+        resumed (bool): Whether a partial download was resumed.
+        skipped (bool): Whether the file was already installed.
+        linked (Optional[str]): How the file was placed from the jar store,
+        if it was.
+        error (Optional[str]): Why the file couldn't be installed.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.url: Optional[str] = None
+        self.bytes: int = 0
+        self.seconds: float = 0.0
+        self.resumed: bool = False
+        self.skipped: bool = False
+        self.linked: Optional[str] = None
+        self.error: Optional[str] = None
+
+    def to_json(self) -> dict:
+        return {
+            "path": self.path,
+            "url": self.url,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 4),
+            "resumed": self.resumed,
+            "skipped": self.skipped,
+            "linked": self.linked,
+            "error": self.error,
+        }
+
+
+class InstallReport:
+    """The outcome of installing a pack.
+
+    Attributes:
+        files (list[FileTiming]): One entry per manifest file installed, in
+        the manifest's order.
+        excluded (list[str]): Files the manifest marks as unsupported on the
+        side being installed.
+        overrides (list[str]): Files unpacked from the pack's overrides.
+        seconds (float): Wall time of the whole install.
+    """
+
+    def __init__(self) -> None:
+        self.files: list[FileTiming] = []
+        self.excluded: list[str] = []
+        self.overrides: list[str] = []
+        self.seconds: float = 0.0
+
+    @property
+    def bytes(self) -> int:
+        return sum(timing.bytes for timing in self.files)
+
+    @property
+    def throughput(self) -> float:
+        """Bytes downloaded per second of wall time."""
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+    @property
+    def failed(self) -> list[str]:
+        return [timing.path for timing in self.files if timing.error is not None]
+
+    def to_json(self) -> dict:
+        return {
+            "ok": not self.failed,
+            "seconds": round(self.seconds, 4),
+            "bytes": self.bytes,
+            "throughput": round(self.throughput),
+            "downloaded": sum(1 for timing in self.files if timing.url is not None),
+            "linked": sum(
+                1
+                for timing in self.files
+                if timing.linked is not None and timing.url is None
+            ),
+            "skipped": sum(1 for timing in self.files if timing.skipped),
+            "failed": self.failed,
+            "excluded": self.excluded,
+            "overrides": len(self.overrides),
+            "files": [timing.to_json() for timing in self.files],
+        }
+
+
+class Installer:
+    """Downloads manifest files into instance directories.
+
+    Args:
+        max_workers (int, optional): Files downloaded at the same time.
+        attempts_per_url (int, optional): Attempts made against each URL
+        before failing over to the next one.
+        timeout (float, optional): Connect and read timeout in seconds.
+        side (Optional[str], optional): Either "client" or "server". Files the
+        manifest marks as unsupported on that side are skipped. Defaults to
+        None, which installs every file.
+        cache (Optional[DigestCache], optional): Digest cache used to tell
+        whether a file is already installed. Defaults to the shared cache.
+        store (Optional[JarStore], optional): Store to download files into
+        and link them from. Defaults to None, which downloads every file
+        straight into the instance.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        attempts_per_url: int = 2,
+        timeout: float = 30.0,
+        side: Optional[str] = None,
+        cache: Optional[DigestCache] = None,
+        store: Optional[JarStore] = None,
+    ) -> None:
+        self.max_workers: int = max_workers
+        self.attempts_per_url: int = attempts_per_url
+        self.timeout: float = timeout
+        self.side: Optional[str] = side
+        self.cache: DigestCache = cache or get_digest_cache()
+        self.store: Optional[JarStore] = store
+
+    def is_excluded(self, file: ModrinthFile) -> bool:
+        env: dict = file.env or {}
+        return self.side is not None and env.get(self.side) == "unsupported"
+
+    def _is_installed(self, file: ModrinthFile, target: pathlib.Path) -> bool:
+        try:
+            stat = target.stat()
+        except OSError:
+            return False
+        expected_size = file.file_size
+        if expected_size is not None and expected_size != stat.st_size:
+            return False
+        digest = self.cache.lookup([stat]).get((stat.st_dev, stat.st_ino))
+        if digest is None:
+            digest = hash_file(target)
+            self.cache.store([(stat, *digest)])
+        return file_matches(file, *digest)
+
+    def _download(
+        self, url: str, part: pathlib.Path, file: ModrinthFile, timing: FileTiming
+    ) -> None:
+        sha1 = hashlib.sha1()
+        sha512 = hashlib.sha512()
+
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {"range": f"bytes={offset}-"} if offset else {}
+        try:
+            response = get_client().download(url, headers=headers, timeout=self.timeout)
+        except requests.HTTPError as error:
+            if error.response is None or error.response.status_code != 416:
+                raise
+            # The partial file can't be resumed, so start over.
+            part.unlink()
+            return self._download(url, part, file, timing)
+
+        with response:
+            resuming = response.status_code == 206 and response.headers.get(
+                "content-range", ""
+            ).startswith(f"bytes {offset}-")
+            if resuming:
+                with open(part, "rb") as existing:
+                    while chunk := existing.read(_chunk_size):
+                        sha1.update(chunk)
+                        sha512.update(chunk)
+                timing.resumed = True
+            with open(part, "ab" if resuming else "wb") as target:
+                for chunk in response.iter_content(_chunk_size):
+                    target.write(chunk)
+                    sha1.update(chunk)
+                    sha512.update(chunk)
+                    timing.bytes += len(chunk)
+
+        if not file_matches(file, sha1.hexdigest(), sha512.hexdigest()):
+            part.unlink()
+            raise FileDownloadError("content did not match the manifest's hashes")
+
+    def install_file(self, file: ModrinthFile, instance_dir: pathlib.Path) -> FileTiming:
+        """Installs one manifest file, unless it is already installed.
+
+        Args:
+            file (ModrinthFile): The file to install.
+            instance_dir (pathlib.Path): The instance's root directory.
+
+        Returns:
+            FileTiming: How the file was installed. Failures are recorded in
+            its error rather than raised.
+        """
+        timing = FileTiming(file.path)
+        started = time.perf_counter()
+        try:
+            target = resolve_file_path(instance_dir, file.path)
+            if self._is_installed(file, target):
+                timing.skipped = True
+                return timing
+
+            sha1 = file.sha1
+            if self.store is not None and self.store.has(sha1):
+                try:
+                    timing.linked = self.store.link(sha1, target)
+                    return timing
+                except FileNotFoundError:
+                    # Collected by another process since, so it is fetched.
+                    pass
+
+            target.parent.mkdir(parents=True, exist_ok=True)
+            part = (
+                self.store.incoming_path(sha1)
+                if self.store is not None
+                else target.with_name(target.name + ".part")
+            )
+            errors: list[str] = []
+            for url in file.downloads:
+                for _ in range(self.attempts_per_url):
+                    try:
+                        self._download(url, part, file, timing)
+                    except (requests.RequestException, FileDownloadError) as error:
+                        logging.debug(f"Downloading {file.path} from {url} failed: {error}")
+                        errors.append(f"{url}: {error}")
+                        continue
+                    if self.store is not None:
+                        self.store.add(sha1, part)
+                        timing.linked = self.store.link(sha1, target)
+                    else:
+                        os.replace(part, target)
+                    timing.url = url
+                    return timing
+            timing.error = "; ".join(errors) or "no download URLs"
+        except (OSError, ValueError) as error:
+            timing.error = str(error)
+        finally:
+            timing.seconds = time.perf_counter() - started
+        return timing
+
+    def install_files(
+        self, files: list[ModrinthFile], instance_dir: pathlib.Path
+    ) -> list[FileTiming]:
+        """Installs files concurrently on the installer's pool.
+
+        Returns:
+            list[FileTiming]: How each file was installed, in the order given.
+        """
+        if not files:
+            return []
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers
+        ) as executor:
+            return list(
+                executor.map(lambda file: self.install_file(file, instance_dir), files)
+            )
+
+    def install(
+        self,
+        manifest: ModrinthManifest,
+        instance_dir: pathlib.Path | str,
+        pack: Optional[MrPack] = None,
+    ) -> InstallReport:
+        """Installs every file of a manifest, then the pack's overrides.
+
+        Args:
+            manifest (ModrinthManifest): The manifest to install.
+            instance_dir (pathlib.Path | str): The instance's root directory,
+            created if it doesn't exist.
+            pack (Optional[MrPack], optional): The pack to unpack overrides
+            from. Overrides are only unpacked once every file installed.
+
+        Returns:
+            InstallReport: Per-file timings along with the overall throughput.
+        """
+        instance_dir = pathlib.Path(instance_dir)
+        instance_dir.mkdir(parents=True, exist_ok=True)
+        report = InstallReport()
+        started = time.perf_counter()
+
+        files: list[ModrinthFile] = []
+        for file in manifest.files.values():
+            if self.is_excluded(file):
+                report.excluded.append(file.path)
+            else:
+                files.append(file)
+
+        if self.store is not None:
+            # Referenced before any is linked, so garbage collection running
+            # meanwhile keeps them.
+            self.store.reference(instance_dir, [file.sha1 for file in files])
+        report.files = self.install_files(files, instance_dir)
+
+        if self.store is not None:
+            # Files that failed are registered too, so a retry can still
+            # link any of them a concurrent install stores meanwhile.
+            self.store.register(instance_dir, manifest.to_json())
+
+        if pack is not None and not report.failed:
+            report.overrides = pack.extract_overrides(instance_dir, self.side)
+
+        report.seconds = time.perf_counter() - started
+        return report
+
+
+def install_pack(
+    pack_path: pathlib.Path | str,
+    instance_dir: pathlib.Path | str,
+    side: Optional[str] = None,
+    max_workers: int = 8,
+    store: Optional[JarStore] = None,
+) -> InstallReport:
+    """Installs a .mrpack archive into an instance directory.
+
+    Args:
+        pack_path (pathlib.Path | str): The pack to install.
+        instance_dir (pathlib.Path | str): The instance's root directory.
+        side (Optional[str], optional): Either "client" or "server".
+        max_workers (int, optional): Files downloaded at the same time.
+        store (Optional[JarStore], optional): Store to share files through.
+
+    Returns:
+        InstallReport: Per-file timings along with the overall throughput.
+    """
+    pack = MrPack(pack_path)
+    with pack.open_manifest() as manifest_file:
+        manifest = ModrinthManifest.from_stream(manifest_file, enrich=False)
+    installer = Installer(max_workers=max_workers, side=side, store=store)
+    return installer.install(manifest, instance_dir, pack)
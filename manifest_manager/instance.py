@@ -0,0 +1,305 @@
+"""Checks an installed instance directory against a manifest.
+
+Every file the manifest lists is hashed with sha1 and sha512 in a single read,
+with files spread over a thread pool (hashlib releases the GIL while hashing
+large buffers). Digests are cached by the file's device, inode, size and
+modification time, so verifying an instance again only rehashes the files
+that changed since.
+
+Usage:
+    from instance import verify_instance
+
+    result = verify_instance(manifest, "/srv/minecraft")
+    print(result.missing, result.mismatched)
+"""
+
+import concurrent.futures
+import hashlib
+import os
+import pathlib
+import sqlite3
+import stat as stat_module
+import threading
+import time
+from typing import Iterable, Optional
+
+from manifest import ModrinthFile, ModrinthManifest
+from paths import user_cache_dir
+
+_read_size = 1024 * 1024
+# Files modified this recently may still be modified again within the same
+# mtime tick, so their digests aren't cached.
+_racy_window_ns = 2 * 1_000_000_000
+
+
+def resolve_file_path(instance_dir: pathlib.Path, path: str) -> pathlib.Path:
+    """Resolves a manifest file's path inside an instance directory.
+
+    Raises:
+        ValueError: The path is absolute or escapes the instance directory,
+        which the mrpack format forbids.
+    """
+    relative = pathlib.PurePosixPath(path)
+    if relative.is_absolute() or ".." in relative.parts or not relative.parts:
+        raise ValueError(f"{path} is not a path inside the instance")
+    return instance_dir.joinpath(*relative.parts)
+
+
+def hash_file(path: pathlib.Path | str) -> tuple[str, str]:
+    """Hashes a file with sha1 and sha512 in one pass over its content.
+
+    Returns:
+        tuple[str, str]: The sha1 and sha512 hex digests.
+    """
+    sha1 = hashlib.sha1()
+    sha512 = hashlib.sha512()
+    buffer = bytearray(_read_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as file:
+        while True:
+            read = file.readinto(buffer)
+            if not read:
+                break
+            sha1.update(view[:read])
+            sha512.update(view[:read])
+    return sha1.hexdigest(), sha512.hexdigest()
+
+
+class DigestCache:
+    """A SQLite backed store of file digests keyed by file identity.
+
+    Args:
+        path (Optional[pathlib.Path | str], optional): Location of the
+        database file. Defaults to digests.sqlite3 in the user cache dir.
+    """
+
+    def __init__(self, path: Optional[pathlib.Path | str] = None) -> None:
+        if path is None:
+            path = user_cache_dir().joinpath("digests.sqlite3")
+        self.path: pathlib.Path = pathlib.Path(path)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS digests (
+                    device INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha1 TEXT NOT NULL,
+                    sha512 TEXT NOT NULL,
+                    PRIMARY KEY (device, inode)
+                )"""
+            )
+
+    def lookup(
+        self, stats: Iterable[os.stat_result]
+    ) -> dict[tuple[int, int], tuple[str, str]]:
+        """Looks up the digests of files that haven't changed since they were
+        hashed.
+
+        Args:
+            stats (Iterable[os.stat_result]): The current stats of the files.
+
+        Returns:
+            dict[tuple[int, int], tuple[str, str]]: The sha1 and sha512 of each
+            unchanged file, identified by device and inode.
+        """
+        wanted = {(stat.st_dev, stat.st_ino): stat for stat in stats}
+        found: dict[tuple[int, int], tuple[str, str]] = {}
+        inodes = list(wanted)
+        with self._lock:
+            for start in range(0, len(inodes), 250):
+                chunk = inodes[start : start + 250]
+                placeholders = ",".join("(?, ?)" for _ in chunk)
+                rows = self._connection.execute(
+                    f"SELECT device, inode, size, mtime_ns, sha1, sha512 FROM digests "
+                    f"WHERE (device, inode) IN (VALUES {placeholders})",
+                    [value for key in chunk for value in key],
+                )
+                for device, inode, size, mtime_ns, sha1, sha512 in rows:
+                    stat = wanted[(device, inode)]
+                    if stat.st_size == size and stat.st_mtime_ns == mtime_ns:
+                        found[(device, inode)] = (sha1, sha512)
+        return found
+
+    def store(self, entries: Iterable[tuple[os.stat_result, str, str]]) -> None:
+        """Stores the digests of freshly hashed files.
+
+        Args:
+            entries (Iterable[tuple[os.stat_result, str, str]]): The stat taken
+            before hashing, and the sha1 and sha512 of each file.
+        """
+        now = time.time_ns()
+        rows = [
+            (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, sha1, sha512)
+            for stat, sha1, sha512 in entries
+            if now - stat.st_mtime_ns > _racy_window_ns
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM digests")
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+_digest_cache: Optional[DigestCache] = None
+_digest_cache_lock = threading.Lock()
+
+
+def set_digest_cache(cache: Optional[DigestCache]) -> None:
+    global _digest_cache
+    with _digest_cache_lock:
+        _digest_cache = cache
+
+
+def get_digest_cache() -> DigestCache:
+    """Gets the digest cache, opening the default on-disk cache on first use."""
+    global _digest_cache
+    with _digest_cache_lock:
+        if _digest_cache is None:
+            _digest_cache = DigestCache()
+        return _digest_cache
+
+
+class InstanceVerification:
+    """The result of verifying an instance directory against a manifest.
+
+    Attributes:
+        verified (list[str]): Paths whose content matches the manifest.
+        missing (list[str]): Paths that don't exist or aren't regular files.
+        mismatched (list[str]): Paths whose size or hashes differ from the
+        manifest's.
+        invalid (list[str]): Paths the manifest lists outside the instance.
+        hashed (int): Files read and hashed.
+        cached (int): Files whose digests came from the digest cache.
+    """
+
+    def __init__(self) -> None:
+        self.verified: list[str] = []
+        self.missing: list[str] = []
+        self.mismatched: list[str] = []
+        self.invalid: list[str] = []
+        self.hashed: int = 0
+        self.cached: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return not (self.missing or self.mismatched or self.invalid)
+
+    def to_json(self) -> dict:
+        return {
+            "ok": self.ok,
+            "verified": len(self.verified),
+            "missing": self.missing,
+            "mismatched": self.mismatched,
+            "invalid": self.invalid,
+            "hashed": self.hashed,
+            "cached": self.cached,
+        }
+
+
+def file_matches(file: ModrinthFile, sha1: str, sha512: str) -> bool:
+    """Checks digests against the hashes a manifest lists for a file. A
+    manifest isn't required to list a sha512, in which case only the sha1 is
+    checked."""
+    expected_sha512 = file.sha512
+    return file.sha1 == sha1 and (
+        expected_sha512 is None or expected_sha512 == sha512
+    )
+
+
+def verify_instance(
+    manifest: ModrinthManifest,
+    instance_dir: pathlib.Path | str,
+    max_workers: Optional[int] = None,
+    cache: Optional[DigestCache] = None,
+) -> InstanceVerification:
+    """Checks that every file a manifest lists is installed with the listed
+    content.
+
+    Files the manifest doesn't list, such as configs and worlds, are ignored.
+
+    Args:
+        manifest (ModrinthManifest): The manifest the instance was installed
+        from.
+        instance_dir (pathlib.Path | str): The instance's root directory.
+        max_workers (Optional[int], optional): Threads used to hash files.
+        cache (Optional[DigestCache], optional): The digest cache to use.
+        Defaults to the shared on-disk cache.
+
+    Returns:
+        InstanceVerification: The files that verified, and the ones that
+        didn't.
+    """
+    instance_dir = pathlib.Path(instance_dir)
+    cache = cache or get_digest_cache()
+    result = InstanceVerification()
+
+    to_check: list[tuple[ModrinthFile, os.stat_result]] = []
+    for file in manifest.files.values():
+        try:
+            file_path = resolve_file_path(instance_dir, file.path)
+        except ValueError:
+            result.invalid.append(file.path)
+            continue
+        try:
+            stat = file_path.stat()
+        except OSError:
+            result.missing.append(file.path)
+            continue
+        if not stat_module.S_ISREG(stat.st_mode):
+            result.missing.append(file.path)
+            continue
+        expected_size = file.file_size
+        if expected_size is not None and expected_size != stat.st_size:
+            result.mismatched.append(file.path)
+            continue
+        to_check.append((file, stat))
+
+    digests = cache.lookup(stat for _, stat in to_check)
+    result.cached = len(digests)
+
+    to_hash = [
+        (file, stat)
+        for file, stat in to_check
+        if (stat.st_dev, stat.st_ino) not in digests
+    ]
+    if to_hash:
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers or min(32, (os.cpu_count() or 1) + 4)
+        ) as executor:
+            futures = {
+                executor.submit(
+                    hash_file, resolve_file_path(instance_dir, file.path)
+                ): stat
+                for file, stat in to_hash
+            }
+            hashed: list[tuple[os.stat_result, str, str]] = []
+            for future, stat in futures.items():
+                try:
+                    sha1, sha512 = future.result()
+                except OSError:
+                    continue
+                digests[(stat.st_dev, stat.st_ino)] = (sha1, sha512)
+                hashed.append((stat, sha1, sha512))
+        result.hashed = len(hashed)
+        cache.store(hashed)
+
+    for file, stat in to_check:
+        digest = digests.get((stat.st_dev, stat.st_ino))
+        if digest is None:
+            result.missing.append(file.path)
+        elif file_matches(file, *digest):
+            result.verified.append(file.path)
+        else:
+            result.mismatched.append(file.path)
+
+    return result
@@ -0,0 +1,233 @@
+"""Brings an installed instance up to date with a newer manifest in place.
+
+Only the files a ManifestDiff reports are touched. New files are first
+downloaded into a staging directory inside the instance, and nothing in the
+instance changes until every one of them arrived. The swap that follows is a
+handful of renames per changed file: obsolete files are moved aside into a
+backup directory and the staged files are renamed into place. If any rename
+fails the swap is rolled back, and a journal written before the swap lets an
+interrupted sync be rolled back on the next run, so the instance is always
+left at either the old or the new manifest.
+
+Usage:
+    from instance_sync import sync_instance
+    from manifest_diff import diff_manifests
+
+    report = sync_instance(diff_manifests(remote, local), "/srv/minecraft")
+"""
+
+import json
+import os
+import pathlib
+import shutil
+import time
+from typing import Optional
+
+from installer import InstallReport, Installer
+from instance import resolve_file_path
+from manifest import ModrinthFile
+from manifest_diff import ManifestDiff
+
+_sync_dir_name = ".manifest-manager-sync"
+
+
+class SyncReport(InstallReport):
+    """The outcome of syncing an instance.
+
+    Attributes:
+        removed (list[str]): Obsolete files removed from the instance.
+        placed (list[str]): New files renamed into the instance.
+        swap_seconds (float): Time the instance spent between the old and new
+        manifest, which is the downtime of the sync.
+        rolled_back (bool): Whether the swap failed and was undone.
+        error (Optional[str]): Why the swap failed.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.removed: list[str] = []
+        self.placed: list[str] = []
+        self.swap_seconds: float = 0.0
+        self.rolled_back: bool = False
+        self.error: Optional[str] = None
+
+    def to_json(self) -> dict:
+        return {
+            **super().to_json(),
+            "ok": not self.failed and not self.rolled_back,
+            "removed": self.removed,
+            "placed": self.placed,
+            "swap_seconds": round(self.swap_seconds, 4),
+            "rolled_back": self.rolled_back,
+            "error": self.error,
+        }
+
+
+def _journal_path(sync_dir: pathlib.Path) -> pathlib.Path:
+    return sync_dir.joinpath("journal.json")
+
+
+def _roll_back(
+    instance_dir: pathlib.Path, sync_dir: pathlib.Path, journal: dict
+) -> None:
+    # Every step checks what is actually on disk, so rolling back twice, or
+    # after an interruption part way through a swap, is safe.
+    staged_dir = sync_dir.joinpath("staged")
+    backup_dir = sync_dir.joinpath("backup")
+    for path in journal["placed"]:
+        if not staged_dir.joinpath(path).exists():
+            resolve_file_path(instance_dir, path).unlink(missing_ok=True)
+    for path in journal["removed"]:
+        backup = backup_dir.joinpath(path)
+        if backup.exists():
+            os.replace(backup, resolve_file_path(instance_dir, path))
+
+
+def recover_instance(instance_dir: pathlib.Path | str) -> bool:
+    """Rolls back a sync that was interrupted part way through its swap.
+
+    Args:
+        instance_dir (pathlib.Path | str): The instance's root directory.
+
+    Returns:
+        bool: Whether there was an interrupted sync to roll back.
+    """
+    instance_dir = pathlib.Path(instance_dir)
+    sync_dir = instance_dir.joinpath(_sync_dir_name)
+    journal_path = _journal_path(sync_dir)
+    if not journal_path.exists():
+        # A sync interrupted while staging never touched the instance.
+        shutil.rmtree(sync_dir, ignore_errors=True)
+        return False
+    _roll_back(instance_dir, sync_dir, json.loads(journal_path.read_text()))
+    shutil.rmtree(sync_dir)
+    return True
+
+
+def _stage_moved_file(
+    instance_dir: pathlib.Path,
+    staged_dir: pathlib.Path,
+    old: ModrinthFile,
+    new: ModrinthFile,
+) -> None:
+    source = resolve_file_path(instance_dir, old.path)
+    staged = resolve_file_path(staged_dir, new.path)
+    staged.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, staged)
+    except OSError:
+        shutil.copy2(source, staged)
+
+
+def sync_instance(
+    diff: ManifestDiff,
+    instance_dir: pathlib.Path | str,
+    installer: Optional[Installer] = None,
+) -> SyncReport:
+    """Applies a diff to an instance installed from the diff's target.
+
+    Files the instance is missing are not reinstalled, see
+    instance.verify_instance to find them.
+
+    Args:
+        diff (ManifestDiff): The diff of the installed manifest, as target,
+        against the manifest to sync to, as source.
+        instance_dir (pathlib.Path | str): The instance's root directory.
+        installer (Optional[Installer], optional): Downloads the new files,
+        which also decides the side installed and the jar store used.
+        Defaults to an installer with default settings.
+
+    Returns:
+        SyncReport: What was downloaded, placed and removed. If a download
+        failed, the instance is left untouched.
+    """
+    instance_dir = pathlib.Path(instance_dir)
+    recover_instance(instance_dir)
+    sync_dir = instance_dir.joinpath(_sync_dir_name)
+    staged_dir = sync_dir.joinpath("staged")
+    backup_dir = sync_dir.joinpath("backup")
+    staged_dir.mkdir(parents=True)
+    installer = installer or Installer()
+    report = SyncReport()
+    started = time.perf_counter()
+
+    try:
+        # Moved files are copied from the instance rather than downloaded,
+        # unless the instance is missing them.
+        moved: set[str] = set()
+        for change in diff.moved:
+            try:
+                _stage_moved_file(instance_dir, staged_dir, change.old, change.new)
+                moved.add(change.new_hash)
+            except FileNotFoundError:
+                pass
+
+        new_files: list[ModrinthFile] = []
+        for hash in diff.source_only:
+            file = diff.source.files[hash]
+            if hash in moved:
+                continue
+            if installer.is_excluded(file):
+                report.excluded.append(file.path)
+            else:
+                new_files.append(file)
+        if installer.store is not None:
+            installer.store.reference(instance_dir, [file.sha1 for file in new_files])
+        report.files = installer.install_files(new_files, staged_dir)
+        if report.failed:
+            report.seconds = time.perf_counter() - started
+            return report
+
+        journal = {
+            "removed": [
+                diff.target.files[hash].path
+                for hash in diff.target_only
+                if resolve_file_path(
+                    instance_dir, diff.target.files[hash].path
+                ).exists()
+            ],
+            "placed": [
+                diff.source.files[hash].path
+                for hash in diff.source_only
+                if resolve_file_path(staged_dir, diff.source.files[hash].path).exists()
+            ],
+        }
+        journal_path = _journal_path(sync_dir)
+        with open(journal_path, "w") as journal_file:
+            json.dump(journal, journal_file)
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+        swap_started = time.perf_counter()
+        try:
+            for path in journal["removed"]:
+                backup = resolve_file_path(backup_dir, path)
+                backup.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(resolve_file_path(instance_dir, path), backup)
+            for path in journal["placed"]:
+                destination = resolve_file_path(instance_dir, path)
+                destination.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(resolve_file_path(staged_dir, path), destination)
+        except OSError as error:
+            # If rolling back fails too, the journal is kept so the next sync
+            # or recover_instance can finish it.
+            _roll_back(instance_dir, sync_dir, journal)
+            journal_path.unlink()
+            report.rolled_back = True
+            report.error = str(error)
+        finally:
+            report.swap_seconds = time.perf_counter() - swap_started
+
+        if not report.rolled_back:
+            # The swap is complete once the journal is gone.
+            journal_path.unlink()
+            report.removed = journal["removed"]
+            report.placed = journal["placed"]
+            if installer.store is not None:
+                installer.store.register(instance_dir, diff.source.to_json())
+    finally:
+        if not _journal_path(sync_dir).exists():
+            shutil.rmtree(sync_dir, ignore_errors=True)
+
+    report.seconds = time.perf_counter() - started
+    return report
@@ -0,0 +1,334 @@
+"""A content-addressed store of downloaded files shared between instances.
+
+Files are stored once under their sha1 and linked into every instance that
+uses them, as a reflink where the filesystem supports copy-on-write clones, a
+hardlink where it doesn't, and a plain copy when the store and the instance
+are on different filesystems. Stored files are left writable: a read-only bit
+would be shared by every hardlink to the file, so the instances' own files
+would become read-only too, and Windows refuses to delete or replace those.
+The manager never writes a linked file in place, it only replaces files with
+renames, so editing a hardlinked file by hand is the only way to change it for
+every instance that shares it.
+
+Each instance registers the manifest it was installed from, and garbage
+collection removes the files no registered manifest uses any more. Installs
+reference their files before linking any of them, and garbage collection
+leaves alone files stored after it started, so it can run while an install
+is in progress.
+
+Usage:
+    from jar_store import JarStore
+
+    store = JarStore()
+    if store.has(sha1):
+        store.link(sha1, "/srv/minecraft/mods/example.jar")
+"""
+
+import errno
+import os
+import pathlib
+import shutil
+import sqlite3
+import stat as stat_module
+import sys
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from paths import user_cache_dir
+
+# Partial downloads untouched for this long are assumed to be abandoned.
+_abandoned_after = 24 * 60 * 60
+# FICLONE from linux/fs.h, which clones a file's extents into another file.
+_ficlone = 0x40049409
+_unsupported_link_errors = frozenset(
+    {
+        errno.EXDEV,
+        errno.EOPNOTSUPP,
+        errno.ENOTTY,
+        errno.EINVAL,
+        errno.EPERM,
+        errno.EMLINK,
+    }
+)
+
+# Places a stored file at a staging path. copyfile returns the path, which
+# is ignored.
+_Place = Callable[[pathlib.Path, pathlib.Path], object]
+
+
+def _reflink(source: pathlib.Path, destination: pathlib.Path) -> None:
+    if sys.platform != "linux":
+        raise OSError(errno.EOPNOTSUPP, "reflinks are only attempted on Linux")
+    import fcntl
+
+    with open(source, "rb") as source_file, open(
+        destination, "wb"
+    ) as destination_file:
+        try:
+            fcntl.ioctl(destination_file.fileno(), _ficlone, source_file.fileno())
+        except OSError:
+            destination_file.close()
+            destination.unlink()
+            raise
+
+
+def _clear_read_only(path: pathlib.Path) -> None:
+    # Stores written by earlier versions made their files read-only. The bit
+    # is shared by every hardlink to a file, and Windows won't delete or
+    # replace a read-only file.
+    mode = path.stat().st_mode
+    if not mode & stat_module.S_IWUSR:
+        os.chmod(path, mode | stat_module.S_IWUSR)
+
+
+class JarStore:
+    """Stores files by sha1 and tracks which instances use them.
+
+    Args:
+        root (Optional[pathlib.Path | str], optional): The store's directory.
+        Defaults to store in the user cache dir. Linking only avoids copies
+        when the store is on the same filesystem as the instances.
+    """
+
+    def __init__(self, root: Optional[pathlib.Path | str] = None) -> None:
+        if root is None:
+            root = user_cache_dir().joinpath("store")
+        self.root: pathlib.Path = pathlib.Path(root)
+        self.objects_dir: pathlib.Path = self.root.joinpath("objects")
+        self.incoming_dir: pathlib.Path = self.root.joinpath("incoming")
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.incoming_dir.mkdir(parents=True, exist_ok=True)
+        self.links: dict[str, int] = {"reflink": 0, "hardlink": 0, "copy": 0}
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            self.root.joinpath("store.sqlite3"), check_same_thread=False
+        )
+        with self._connection:
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS refs (
+                    instance TEXT NOT NULL,
+                    sha1 TEXT NOT NULL,
+                    PRIMARY KEY (instance, sha1)
+                );
+                CREATE INDEX IF NOT EXISTS refs_sha1 ON refs (sha1);
+                CREATE TABLE IF NOT EXISTS instances (
+                    instance TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    version_id TEXT NOT NULL,
+                    registered_at REAL NOT NULL
+                );
+                """
+            )
+
+    def object_path(self, sha1: str) -> pathlib.Path:
+        return self.objects_dir.joinpath(sha1[:2], sha1)
+
+    def incoming_path(self, sha1: str) -> pathlib.Path:
+        """Gets where a file is downloaded to before it is added, which is on
+        the store's filesystem so adding it is a rename."""
+        return self.incoming_dir.joinpath(sha1 + ".part")
+
+    def has(self, sha1: str) -> bool:
+        return self.object_path(sha1).is_file()
+
+    def add(self, sha1: str, source: pathlib.Path | str) -> pathlib.Path:
+        """Moves a file whose content has been verified into the store.
+
+        Args:
+            sha1 (str): The file's sha1.
+            source (pathlib.Path | str): The file, which is moved rather than
+            copied. It is discarded if the store already holds the digest.
+
+        Returns:
+            pathlib.Path: The stored file.
+        """
+        object_path = self.object_path(sha1)
+        object_path.parent.mkdir(exist_ok=True)
+        if object_path.exists():
+            os.unlink(source)
+        else:
+            shutil.move(source, object_path)
+        return object_path
+
+    def link(self, sha1: str, destination: pathlib.Path | str) -> str:
+        """Places a stored file at a path, replacing whatever is there.
+
+        Returns:
+            str: How the file was placed, one of "reflink", "hardlink" or
+            "copy".
+
+        Raises:
+            FileNotFoundError: The store doesn't hold the digest.
+        """
+        object_path = self.object_path(sha1)
+        destination = pathlib.Path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        staged = destination.with_name(f".{destination.name}.{os.getpid()}.link")
+        _clear_read_only(object_path)
+
+        mode = "copy"
+        places: list[tuple[str, _Place]] = [
+            ("reflink", _reflink),
+            ("hardlink", os.link),
+            ("copy", shutil.copyfile),
+        ]
+        for mode, place in places:
+            try:
+                place(object_path, staged)
+                break
+            except OSError as error:
+                if mode == "copy" or error.errno not in _unsupported_link_errors:
+                    raise
+        os.replace(staged, destination)
+        with self._lock:
+            self.links[mode] += 1
+        return mode
+
+    def register(self, instance_dir: pathlib.Path | str, manifest_json: dict) -> None:
+        """Records the files an instance was installed with, replacing any
+        earlier registration of the same instance.
+
+        Args:
+            instance_dir (pathlib.Path | str): The instance's root directory.
+            manifest_json (dict): The json-encoded manifest it was installed
+            from.
+        """
+        instance = str(pathlib.Path(instance_dir).resolve())
+        sha1s = {file_json["hashes"]["sha1"] for file_json in manifest_json["files"]}
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM refs WHERE instance = ?", (instance,))
+            self._connection.executemany(
+                "INSERT INTO refs VALUES (?, ?)", [(instance, sha1) for sha1 in sha1s]
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO instances VALUES (?, ?, ?, ?)",
+                (
+                    instance,
+                    manifest_json["name"],
+                    manifest_json["versionId"],
+                    time.time(),
+                ),
+            )
+
+    def reference(self, instance_dir: pathlib.Path | str, sha1s: Iterable[str]) -> None:
+        """Marks files as used by an instance, keeping its other references,
+        so garbage collection keeps them while they are being installed. The
+        instance's next register call replaces them.
+
+        Args:
+            instance_dir (pathlib.Path | str): The instance's root directory.
+            sha1s (Iterable[str]): The sha1s of the files.
+        """
+        instance = str(pathlib.Path(instance_dir).resolve())
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO refs VALUES (?, ?)",
+                [(instance, sha1) for sha1 in sha1s],
+            )
+
+    def unregister(self, instance_dir: pathlib.Path | str) -> None:
+        instance = str(pathlib.Path(instance_dir).resolve())
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM refs WHERE instance = ?", (instance,))
+            self._connection.execute(
+                "DELETE FROM instances WHERE instance = ?", (instance,)
+            )
+
+    def instances(self) -> list[tuple[str, str, str]]:
+        """Lists the registered instances.
+
+        Returns:
+            list[tuple[str, str, str]]: The directory, manifest name and
+            versionId of each instance.
+        """
+        with self._lock:
+            return self._connection.execute(
+                "SELECT instance, name, version_id FROM instances ORDER BY instance"
+            ).fetchall()
+
+    def _stored(self) -> Iterable[pathlib.Path]:
+        for prefix in os.scandir(self.objects_dir):
+            if prefix.is_dir():
+                for entry in os.scandir(prefix.path):
+                    yield pathlib.Path(entry.path)
+
+    def stats(self) -> dict[str, int]:
+        """Counts the stored files and the bytes they take up."""
+        count = 0
+        size = 0
+        for object_path in self._stored():
+            try:
+                size += object_path.stat().st_size
+            except FileNotFoundError:
+                continue
+            count += 1
+        return {"objects": count, "bytes": size, **self.links}
+
+    def collect_garbage(self, prune_missing: bool = True) -> tuple[int, int]:
+        """Deletes every stored file that no registered instance uses, along
+        with abandoned partial downloads.
+
+        Files stored after collection started are kept, as an install that
+        stored them may not have registered its manifest yet.
+
+        Args:
+            prune_missing (bool, optional): Unregister instances whose
+            directory no longer exists first. Defaults to True.
+
+        Returns:
+            tuple[int, int]: The number of files deleted and bytes freed.
+        """
+        started = time.time()
+        if prune_missing:
+            with self._lock:
+                instances = [
+                    row[0]
+                    for row in self._connection.execute(
+                        "SELECT instance FROM instances"
+                        " UNION SELECT DISTINCT instance FROM refs"
+                    )
+                ]
+            for instance in instances:
+                if not os.path.isdir(instance):
+                    self.unregister(instance)
+
+        with self._lock:
+            referenced = {
+                row[0]
+                for row in self._connection.execute("SELECT DISTINCT sha1 FROM refs")
+            }
+
+        deleted = 0
+        freed = 0
+        for object_path in list(self._stored()):
+            if object_path.name in referenced:
+                continue
+            # Files can be linked or deleted by another process meanwhile,
+            # and on Windows a file that is open can't be deleted until it
+            # is closed, so it is left for the next collection.
+            try:
+                object_stat = object_path.stat()
+                if object_stat.st_mtime >= started:
+                    continue
+                _clear_read_only(object_path)
+                object_path.unlink()
+            except (FileNotFoundError, PermissionError):
+                continue
+            freed += object_stat.st_size
+            deleted += 1
+        for part in self.incoming_dir.iterdir():
+            try:
+                part_stat = part.stat()
+                if started - part_stat.st_mtime <= _abandoned_after:
+                    continue
+                part.unlink()
+            except FileNotFoundError:
+                continue
+            freed += part_stat.st_size
+        return deleted, freed
+
+    def close(self) -> None:
+        self._connection.close()
@@ -1,21 +1,60 @@
+import argparse
 from pathlib import Path
 from typing import Optional
-from zipfile import ZipFile
 from manifest import ModrinthManifest
+from manifest_diff import ManifestDiff, diff_manifests
 from mrpack import MrPack
+from tracing import enable_recording, span
 
 from textual import on
 from textual.app import App, ComposeResult
 from textual.widgets import Header, Footer, Button
 from textual.containers import Horizontal, Vertical
 
-from widgets import RemoteManifestBox, LocalManifestBox, ManagerMenu, ManifestBox
+from widgets import (
+    FleetView,
+    LocalManifestBox,
+    ManagerMenu,
+    ManifestBox,
+    RemoteManifestBox,
+)
 
 
 class ManagerApp(App):
     CSS_PATH = "manifest-manager.tcss"
+    BINDINGS = [("w", "toggle_watch", "Toggle Watch")]
     local_manifest: Optional[ModrinthManifest] = None
     remote_manifest: Optional[ModrinthManifest] = None
+    last_diff: Optional[ManifestDiff] = None
+
+    def __init__(
+        self,
+        fleet_paths: Optional[list[str]] = None,
+        remote_url: str = ModrinthManifest.remote_url,
+        watch: bool = False,
+    ) -> None:
+        """
+        Args:
+            fleet_paths (Optional[list[str]], optional): Packs to show side by
+            side against remote_url instead of the single pack view.
+            remote_url (str, optional): The remote manifest for the fleet view.
+            watch (bool, optional): Start in watch mode, reloading the local
+            pack and the remote manifest whenever they change.
+        """
+        super().__init__()
+        self.fleet_paths = fleet_paths
+        self.fleet_remote_url = remote_url
+        self.watching = watch
+
+    def on_mount(self) -> None:
+        for box in self.query(ManifestBox):
+            box.watching = self.watching
+
+    def action_toggle_watch(self) -> None:
+        self.watching = not self.watching
+        for box in self.query(ManifestBox):
+            box.watching = self.watching
+        self.notify("Watching for changes" if self.watching else "Stopped watching")
 
     @on(ManifestBox.ManifestLoaded, "#local")
     def handle_local_manifest_loaded(self, event: LocalManifestBox.ManifestLoaded):
@@ -39,28 +78,40 @@ class ManagerApp(App):
         local = self.query_one("#local", LocalManifestBox)
 
         local_pack = MrPack(local.local_manifest_path)
-        local_pack.copy_manifest(remote.manifest_json)
+        assert remote.manifest is not None
+        local_pack.copy_manifest(remote.manifest.to_json())
 
         remote.update_manifest_menu()
         local.update_manifest_menu()
 
     def scan_manifests(self):
-        files_in_remote_only = []
-        files_in_local_only = []
-
-        for file_hash, file in self.remote_manifest.files.items():
-            if file_hash not in self.local_manifest.files.keys():
-                files_in_remote_only.append(file_hash)
-
-        for file_hash, file in self.local_manifest.files.items():
-            if file_hash not in self.remote_manifest.files.keys():
-                files_in_local_only.append(file_hash)
-
-        remote = self.query_one("#remote", RemoteManifestBox)
-        local = self.query_one("#local", LocalManifestBox)
-
-        remote.dispirate_files = files_in_remote_only
-        local.dispirate_files = files_in_local_only
+        # Reloading a manifest that hasn't changed hands back the same object,
+        # so the last scan can be reapplied to the new menus as it is.
+        assert self.remote_manifest is not None and self.local_manifest is not None
+        with span("scan manifests") as current:
+            reused = (
+                self.last_diff is not None
+                and self.last_diff.source is self.remote_manifest
+                and self.last_diff.target is self.local_manifest
+            )
+            if not reused:
+                self.last_diff = diff_manifests(
+                    self.remote_manifest, self.local_manifest
+                )
+            assert self.last_diff is not None
+            files_in_remote_only = self.last_diff.source_only
+            files_in_local_only = self.last_diff.target_only
+            current.set(
+                reused=reused,
+                remote_only=len(files_in_remote_only),
+                local_only=len(files_in_local_only),
+            )
+
+            remote = self.query_one("#remote", RemoteManifestBox)
+            local = self.query_one("#local", LocalManifestBox)
+
+            remote.dispirate_files = files_in_remote_only
+            local.dispirate_files = files_in_local_only
 
         manager_menu = self.query_one(ManagerMenu)
         manager_menu.count_local_files_only = len(files_in_local_only)
@@ -68,6 +119,10 @@ class ManagerApp(App):
 
     def compose(self) -> ComposeResult:
         yield Header()
+        if self.fleet_paths:
+            yield FleetView(self.fleet_remote_url, self.fleet_paths)
+            yield Footer()
+            return
         with Vertical(classes="box"):
             yield ManagerMenu()
             with Horizontal():
@@ -77,4 +132,42 @@ class ManagerApp(App):
 
 
 if __name__ == "__main__":
-    ManagerApp().run()
+    parser = argparse.ArgumentParser(description="Modrinth Manifest File Manager")
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Record timing spans and write them to PATH as a Chrome trace on exit.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Reload the local pack and the remote manifest when they change.",
+    )
+    parser.add_argument(
+        "--fleet",
+        nargs="+",
+        metavar="PACK_OR_DIR",
+        help="Show many packs at once. Directories add every .mrpack inside.",
+    )
+    parser.add_argument(
+        "--remote",
+        default=ModrinthManifest.remote_url,
+        help="The remote manifest the fleet is diffed against.",
+    )
+    args = parser.parse_args()
+    if args.trace:
+        enable_recording(args.trace)
+
+    fleet_paths: list[str] = []
+    for fleet_path in args.fleet or []:
+        if Path(fleet_path).is_dir():
+            fleet_paths += sorted(
+                str(path) for path in Path(fleet_path).glob("*.mrpack")
+            )
+        else:
+            fleet_paths.append(fleet_path)
+    if args.fleet and not fleet_paths:
+        parser.error("--fleet found no .mrpack files")
+    ManagerApp(
+        fleet_paths=fleet_paths or None, remote_url=args.remote, watch=args.watch
+    ).run()
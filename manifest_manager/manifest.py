@@ -1,33 +1,123 @@
-from typing import Optional, cast
-import requests
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import sys
+import threading
+from typing import IO, Callable, Iterable, Iterator, Optional, cast
 import json
 from modrinth_api import (
     ModrinthProject,
     ModrinthVersionFile,
+    get_client,
     get_version_files_from_hashes,
+    get_version_files_from_hashes_async,
     get_projects,
+    get_projects_async,
 )
+from paths import user_cache_dir
+from tracing import span, traced
+
+
+# Nearly every file has one of a handful of env tables, so equal ones are
+# shared rather than kept once per file.
+_shared_envs: dict[tuple, dict[str, str]] = {}
+
+
+def _share_env(env: Optional[dict[str, str]]) -> Optional[dict[str, str]]:
+    if env is None:
+        return None
+    return _shared_envs.setdefault(tuple(env.items()), env)
 
 
 class ModrinthFile:
     """Corresponds to an individual object in a manifest's files list.
 
+    Paths, file names and sha1s are interned, since the same files show up
+    in every manifest of a pack.
+
     Args:
         file_json (dict): The json-encoded content that corresponds to a
         manifest file.
     """
 
+    __slots__ = (
+        "path",
+        "slug",
+        "sha1",
+        "sha512",
+        "env",
+        "downloads",
+        "file_size",
+        "version_file",
+        "project",
+        "_extra",
+    )
+
+    # Keys read into fields, anything else a manifest adds is kept in _extra.
+    _known_keys = frozenset({"path", "hashes", "env", "downloads", "fileSize"})
+
     def __init__(self, file_json: dict):
-        self._dict: dict = file_json
-        self.path: str = file_json["path"]
-        self.slug: str = self.path.split("/")[-1]
-        self.downloads: str = file_json["downloads"]
-        self.hashes: dict[str, str] = file_json["hashes"]
+        self.path: str = sys.intern(file_json["path"])
+        self.slug: str = sys.intern(self.path.split("/")[-1])
+        hashes: dict[str, str] = file_json["hashes"]
+        self.sha1: str = sys.intern(hashes["sha1"])
+        self.sha512: Optional[str] = hashes.get("sha512")
+        self.env: Optional[dict[str, str]] = _share_env(file_json.get("env"))
+        self.downloads: tuple[str, ...] = tuple(file_json["downloads"])
+        self.file_size: Optional[int] = file_json.get("fileSize")
         self.version_file: Optional[ModrinthVersionFile] = None
         self.project: Optional[ModrinthProject] = None
+        extra = {
+            key: value
+            for key, value in file_json.items()
+            if key not in self._known_keys
+        }
+        self._extra: Optional[dict] = extra or None
+
+    @property
+    def hashes(self) -> dict[str, str]:
+        """The file's digests by algorithm, as in the manifest."""
+        if self.sha512 is None:
+            return {"sha1": self.sha1}
+        return {"sha1": self.sha1, "sha512": self.sha512}
+
+    @property
+    def title(self) -> str:
+        """The project's title once enriched, otherwise the file name."""
+        return self.project.title if self.project is not None else self.slug
+
+    @property
+    def version_number(self) -> str:
+        """The version file's version number once enriched, otherwise empty."""
+        return self.version_file.version_number if self.version_file is not None else ""
+
+    def to_json(self) -> dict:
+        """Rebuilds the file's json-encoded content."""
+        file_json: dict = {"path": self.path, "hashes": self.hashes}
+        if self.env is not None:
+            file_json["env"] = self.env
+        file_json["downloads"] = list(self.downloads)
+        if self.file_size is not None:
+            file_json["fileSize"] = self.file_size
+        if self._extra is not None:
+            file_json.update(self._extra)
+        return file_json
 
     def __str__(self) -> str:
-        return self._dict.__str__()
+        return self.to_json().__str__()
+
+
+def _fetch_metadata(
+    hashes: list[str],
+) -> tuple[dict[str, ModrinthVersionFile], dict[str, ModrinthProject]]:
+    version_files: dict[str, ModrinthVersionFile] = get_version_files_from_hashes(
+        hashes
+    )
+    projects: dict[str, ModrinthProject] = get_projects(
+        [cast(str, file.project_id) for file in version_files.values()]
+    )
+    return version_files, projects
 
 
 class ModrinthManifest:
@@ -36,6 +126,15 @@ class ModrinthManifest:
     Args:
         manifest_json (dict): The json-encoded content that corresponds to a
         manifest.
+        enrich (bool, optional): Whether to fetch each file's version file and
+        project right away. Pass False to parse only and call enrich or
+        enrich_async later. Defaults to True.
+        keep_json (bool, optional): Keep manifest_json for to_json rather than
+        rebuilding it from the files. Defaults to False, which lets it be
+        freed once parsed.
+
+    Every manifest built is recorded into the manifest history, see
+    manifest_history.set_history to turn this off.
     """
 
     remote_url: str = (
@@ -43,52 +142,372 @@ class ModrinthManifest:
     )
     local_path: str = ""
 
-    def __init__(self, manifest_json: dict):
-        self._dict: dict = manifest_json
-        self.name: str = manifest_json["name"]
-        self.format_version: str = manifest_json["formatVersion"]
-        self.version_id: str = manifest_json["versionId"]
+    def __init__(
+        self, manifest_json: dict, enrich: bool = True, keep_json: bool = False
+    ):
+        with span("manifest parse", files=len(manifest_json["files"])):
+            self._set_header(
+                {key: value for key, value in manifest_json.items() if key != "files"}
+            )
+            self._set_files(
+                ModrinthFile(file_json) for file_json in manifest_json["files"]
+            )
+            self._json: Optional[dict] = manifest_json if keep_json else None
+
+        self._record(manifest_json)
+        if enrich:
+            self.enrich()
+
+    @classmethod
+    def from_stream(
+        cls,
+        source: IO[bytes],
+        enrich: bool = True,
+        on_header: Optional[Callable[[dict], None]] = None,
+        batch_size: Optional[int] = None,
+    ) -> "ModrinthManifest":
+        """Builds a manifest from a modrinth.index.json stream without
+        loading the whole index, see manifest_stream.ManifestReader.
 
-        files: dict[str, ModrinthFile] = {}
-        manifest_files: list[dict] = manifest_json["files"]
-        for file_json in manifest_files:
-            files.update({file_json["hashes"]["sha1"]: ModrinthFile(file_json)})
+        Args:
+            source (IO[bytes]): The index's bytes, such as MrPack.open_manifest.
+            enrich (bool, optional): Look up metadata while the files are
+            still being read, a batch of hashes at a time. Defaults to True.
+            on_header (Optional[Callable[[dict], None]], optional): Called
+            with the header fields before the first file is read.
+            batch_size (Optional[int], optional): Hashes per metadata lookup.
+            Defaults to the client's hashes_per_request.
 
-        self.files = files
+        Returns:
+            ModrinthManifest: The manifest, enriched if enrich was set.
 
-        version_files: dict[str, ModrinthVersionFile] = get_version_files_from_hashes(
-            list(files.keys())
+        Raises:
+            ValueError: The index is malformed.
+            KeyError: The index lacks a required field.
+        """
+        from manifest_stream import ManifestReader
+
+        manifest = cls.__new__(cls)
+        manifest._json = None
+        reader = ManifestReader(source)
+        batch_size = batch_size or get_client().hashes_per_request
+        lookups: list[concurrent.futures.Future] = []
+        executor = (
+            concurrent.futures.ThreadPoolExecutor(max_workers=get_client().max_workers)
+            if enrich
+            else None
+        )
+
+        def read_files() -> Iterator[ModrinthFile]:
+            batch: list[str] = []
+            for file_json in reader.iter_files():
+                file = ModrinthFile(file_json)
+                if executor is not None:
+                    batch.append(file.sha1)
+                    if len(batch) >= batch_size:
+                        lookups.append(executor.submit(_fetch_metadata, batch))
+                        batch = []
+                yield file
+            if executor is not None and batch:
+                lookups.append(executor.submit(_fetch_metadata, batch))
+
+        try:
+            with span("manifest stream", "io") as current:
+                header = reader.read_header()
+                if on_header is not None:
+                    on_header(header)
+                manifest._set_files(read_files())
+                manifest._set_header(reader.header)
+                current.set(files=len(manifest.files), bytes=reader.bytes_read)
+
+            if executor is not None:
+                # Lookups ran while the rest of the index was being read.
+                for lookup in lookups:
+                    manifest._apply_metadata(*lookup.result())
+                manifest.sort_files()
+                manifest.is_enriched = True
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        manifest._record(manifest.to_json())
+        return manifest
+
+    def _set_header(self, header: dict) -> None:
+        self.name: str = header["name"]
+        self.format_version: str = header["formatVersion"]
+        self.version_id: str = header["versionId"]
+        self._header: dict = header
+
+    def _set_files(self, files: Iterable[ModrinthFile]) -> None:
+        self.files: dict[str, ModrinthFile] = {file.sha1: file for file in files}
+        # The manifest's own order, as files is reordered by title.
+        self._order: tuple[str, ...] = tuple(self.files)
+        self.is_enriched: bool = False
+
+    def _record(self, manifest_json: dict) -> None:
+        # The history database is opened on the first manifest rather than
+        # when the module is imported.
+        import sqlite3
+
+        from manifest_history import get_history
+
+        history = get_history()
+        if history is not None:
+            try:
+                with span("history record"):
+                    history.record(manifest_json)
+            except sqlite3.Error as error:
+                logging.warning(f"Could not record {self.name} in history: {error}")
+
+    @property
+    def dependencies(self) -> dict[str, str]:
+        """The game and loader versions the pack runs on."""
+        return self._header.get("dependencies", {})
+
+    def to_json(self) -> dict:
+        """Gets the manifest's json-encoded content, rebuilt from its files
+        unless the original was kept."""
+        if self._json is not None:
+            return self._json
+        files = self.files
+        return {
+            **self._header,
+            "files": [files[hash].to_json() for hash in self._order if hash in files],
+        }
+
+    @traced("manifest enrich")
+    def enrich(self) -> None:
+        """Fetches the version file and project of every file in the manifest."""
+        self._apply_metadata(*_fetch_metadata(list(self.files.keys())))
+        self.sort_files()
+        self.is_enriched = True
+
+    async def enrich_async(self, hashes: Optional[list[str]] = None) -> None:
+        """Fetches version files and projects without blocking the event loop.
+
+        Args:
+            hashes (Optional[list[str]], optional): The sha1 hashes of the
+            files to enrich. Enriching a batch at a time lets callers show
+            metadata as it arrives. Defaults to every file, in which case the
+            files are sorted by title afterwards.
+        """
+        version_files: dict[str, ModrinthVersionFile] = (
+            await get_version_files_from_hashes_async(
+                list(self.files.keys()) if hashes is None else hashes
+            )
         )
 
-        projects: dict[str, ModrinthProject] = get_projects(
-            [
-                cast(str, file.project_id)
-                for file in cast(list[ModrinthVersionFile], version_files.values())
-            ]
+        projects: dict[str, ModrinthProject] = await get_projects_async(
+            [cast(str, file.project_id) for file in version_files.values()]
         )
 
+        self._apply_metadata(version_files, projects)
+        if hashes is None:
+            self.sort_files()
+            self.is_enriched = True
+
+    def adopt_metadata(self, previous: "ModrinthManifest") -> list[str]:
+        """Copies metadata over from an earlier version of the same manifest,
+        so that only the files new in this one need to be looked up.
+
+        Args:
+            previous (ModrinthManifest): The earlier version.
+
+        Returns:
+            list[str]: The sha1 hashes of files that still lack metadata,
+            which is every file if previous wasn't enriched.
+        """
+        if not previous.is_enriched:
+            return list(self.files)
+        missing: list[str] = []
+        for hash, file in self.files.items():
+            previous_file = previous.files.get(hash)
+            if previous_file is None:
+                missing.append(hash)
+                continue
+            file.version_file = previous_file.version_file
+            file.project = previous_file.project
+        return missing
+
+    def _apply_metadata(
+        self,
+        version_files: dict[str, ModrinthVersionFile],
+        projects: dict[str, ModrinthProject],
+    ) -> None:
+        files = self.files
         for version_file in version_files.values():
-            for file in version_file.files:
-                file_id: str = file["hashes"]["sha1"]
+            for file_id in version_file.sha1s:
                 if file_id in files:
                     matching_file: ModrinthFile = files[file_id]
                     matching_file.version_file = version_file
-                    matching_project: ModrinthProject = projects[
+                    matching_file.project = projects.get(
                         cast(str, version_file.project_id)
-                    ]
-                    matching_file.project = matching_project
+                    )
 
+    @traced("manifest sort")
+    def sort_files(self) -> None:
+        """Orders files by title, falling back to file name for files that
+        haven't been enriched."""
         self.files = dict(
             sorted(
-                files.items(),
-                key=lambda file_element_item: cast(
-                    ModrinthProject, cast(ModrinthFile, file_element_item[1]).project
-                ).title.lower(),
+                self.files.items(),
+                key=lambda file_element_item: file_element_item[1].title.lower(),
             )
         )
 
 
+@traced("manifest enrich")
+def enrich_manifests(manifests: list[ModrinthManifest]) -> None:
+    """Enriches several manifests with a single lookup for the union of their
+    files, so files shared between manifests are only fetched once.
+
+    Args:
+        manifests (list[ModrinthManifest]): The manifests to enrich.
+    """
+    hashes: dict[str, None] = {}
+    for manifest in manifests:
+        if not manifest.is_enriched:
+            hashes.update(dict.fromkeys(manifest.files))
+    if not hashes:
+        return
+
+    version_files, projects = _fetch_metadata(list(hashes))
+    for manifest in manifests:
+        if manifest.is_enriched:
+            continue
+        manifest._apply_metadata(version_files, projects)
+        manifest.sort_files()
+        manifest.is_enriched = True
+
+
+class _RemoteResponse:
+    # The last successful response for a remote manifest URL along with the
+    # manifest parsed from it, so that a 304 can hand back the same object.
+    # The body is dropped once the manifest is built and rebuilt from it when
+    # asked for.
+    def __init__(
+        self, body: dict, etag: Optional[str], last_modified: Optional[str]
+    ) -> None:
+        self.body: Optional[dict] = body
+        self.etag: Optional[str] = etag
+        self.last_modified: Optional[str] = last_modified
+        self.manifest: Optional[ModrinthManifest] = None
+
+    def manifest_json(self) -> dict:
+        if self.body is not None:
+            return self.body
+        return cast(ModrinthManifest, self.manifest).to_json()
+
+
+_remote_responses: dict[str, _RemoteResponse] = {}
+_remote_responses_lock = threading.Lock()
+
+
+def _remote_response_path(url: str):
+    return user_cache_dir().joinpath(
+        "remote", hashlib.sha1(url.encode()).hexdigest() + ".json"
+    )
+
+
+def _load_remote_response(url: str) -> Optional[_RemoteResponse]:
+    with _remote_responses_lock:
+        if url in _remote_responses:
+            return _remote_responses[url]
+    try:
+        stored = json.loads(_remote_response_path(url).read_text())
+    except (OSError, ValueError):
+        return None
+    remote_response = _RemoteResponse(
+        stored["body"], stored.get("etag"), stored.get("last_modified")
+    )
+    with _remote_responses_lock:
+        return _remote_responses.setdefault(url, remote_response)
+
+
+def _store_remote_response(url: str, remote_response: _RemoteResponse) -> None:
+    with _remote_responses_lock:
+        _remote_responses[url] = remote_response
+    if remote_response.etag is None and remote_response.last_modified is None:
+        return
+    path = _remote_response_path(url)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps(
+            {
+                "etag": remote_response.etag,
+                "last_modified": remote_response.last_modified,
+                "body": remote_response.manifest_json(),
+            }
+        )
+    )
+
+
+def read_remote_if_changed(url: str) -> tuple[dict, bool]:
+    """Fetches a remote manifest, revalidating the last response for the same
+    URL with If-None-Match/If-Modified-Since.
+
+    Args:
+        url (str): The URL of a modrinth.index.json file.
+
+    Returns:
+        tuple[dict, bool]: The manifest and whether it changed since the last
+        time it was read. Validators are kept on disk so a fresh process can
+        still be answered with a 304.
+    """
+    with span("read remote", "remote", url=url) as current:
+        previous = _load_remote_response(url)
+        headers: dict[str, str] = {}
+        if previous is not None and previous.etag is not None:
+            headers["if-none-match"] = previous.etag
+        if previous is not None and previous.last_modified is not None:
+            headers["if-modified-since"] = previous.last_modified
+
+        request = get_client().request("GET", url, headers=headers)
+        current.set(status=request.status_code, bytes=len(request.content))
+        if request.status_code == 304 and previous is not None:
+            return previous.manifest_json(), False
+
+        with span("json decode", "json", bytes=len(request.content)):
+            body: dict = request.json()
+        _store_remote_response(
+            url,
+            _RemoteResponse(
+                body, request.headers.get("etag"), request.headers.get("last-modified")
+            ),
+        )
+        return body, True
+
+
 def read_remote(url: str) -> dict:
-    request = requests.get(url)
-    request.raise_for_status()
-    return request.json()
+    return read_remote_if_changed(url)[0]
+
+
+def get_remote_manifest(url: str) -> tuple[ModrinthManifest, bool]:
+    """Gets the manifest at a URL, reusing the one built from the last
+    response if the remote hasn't changed.
+
+    Args:
+        url (str): The URL of a modrinth.index.json file.
+
+    Returns:
+        tuple[ModrinthManifest, bool]: The manifest and whether it changed.
+        A changed manifest is not enriched yet; an unchanged one is the same
+        object as last time, enriched if it was enriched before.
+    """
+    manifest_json, changed = read_remote_if_changed(url)
+    remote_response = cast(_RemoteResponse, _load_remote_response(url))
+    if changed or remote_response.manifest is None:
+        remote_response.manifest = ModrinthManifest(manifest_json, enrich=False)
+        remote_response.body = None
+    return remote_response.manifest, changed
+
+
+async def read_remote_async(url: str) -> dict:
+    """Fetches a remote manifest without blocking the event loop."""
+    return await asyncio.to_thread(read_remote, url)
+
+
+async def get_remote_manifest_async(url: str) -> tuple[ModrinthManifest, bool]:
+    """Behaves like get_remote_manifest without blocking the event loop."""
+    return await asyncio.to_thread(get_remote_manifest, url)
@@ -0,0 +1,236 @@
+"""Classifies the differences between two manifests.
+
+Files are first matched by sha1. The files left over on each side are then
+paired by the Modrinth project they belong to, so replacing a mod's jar with
+another version of it is reported as one upgrade or downgrade rather than as
+an unrelated added and removed file. Files that haven't been enriched have no
+project, and are paired by path instead. Every step is a dict or set lookup,
+so diffing costs time linear in the size of the manifests and makes no API
+calls.
+
+Usage:
+    from manifest_diff import diff_manifests
+
+    diff = diff_manifests(remote, local)
+    for change in diff.upgraded:
+        print(change.old.path, "->", change.new.path)
+"""
+
+import re
+from typing import Optional
+
+from manifest import ModrinthFile, ModrinthManifest
+
+_version_part = re.compile(r"(\d+)")
+
+
+class FileChange:
+    """A file whose content or location differs between two manifests.
+
+    Args:
+        old (ModrinthFile): The file in the manifest being synced to.
+        new (ModrinthFile): The file in the manifest being synced from.
+    """
+
+    def __init__(self, old: ModrinthFile, new: ModrinthFile) -> None:
+        self.old: ModrinthFile = old
+        self.new: ModrinthFile = new
+
+    @property
+    def old_hash(self) -> str:
+        return self.old.sha1
+
+    @property
+    def new_hash(self) -> str:
+        return self.new.sha1
+
+
+class ManifestDiff:
+    """The result of diffing a target manifest against a source manifest.
+
+    Each file belongs to exactly one of the lists below, or to neither when it
+    is identical in both manifests. Hashes in added and the new side of a
+    change are from the source manifest, hashes in removed and the old side
+    are from the target.
+
+    Args:
+        source (ModrinthManifest): The manifest being synced from.
+        target (ModrinthManifest): The manifest being synced to.
+
+    Attributes:
+        added (list[str]): Files only in the source manifest.
+        removed (list[str]): Files only in the target manifest.
+        upgraded (list[FileChange]): Files replaced by a newer version of the
+        same project.
+        downgraded (list[FileChange]): Files replaced by an older version of
+        the same project.
+        changed (list[FileChange]): Files replaced by another version of the
+        same project where neither manifest says which is newer.
+        moved (list[FileChange]): Identical files at a different path.
+    """
+
+    def __init__(self, source: ModrinthManifest, target: ModrinthManifest) -> None:
+        self.source: ModrinthManifest = source
+        self.target: ModrinthManifest = target
+        self.added: list[str] = []
+        self.removed: list[str] = []
+        self.upgraded: list[FileChange] = []
+        self.downgraded: list[FileChange] = []
+        self.changed: list[FileChange] = []
+        self.moved: list[FileChange] = []
+
+    @property
+    def replaced(self) -> list[FileChange]:
+        return self.upgraded + self.downgraded + self.changed
+
+    @property
+    def source_only(self) -> list[str]:
+        """The sha1 hashes of every source file a sync would bring into the
+        target, whether added, replacing another version or moved."""
+        return (
+            self.added
+            + [change.new_hash for change in self.replaced]
+            + [change.new_hash for change in self.moved]
+        )
+
+    @property
+    def target_only(self) -> list[str]:
+        """The sha1 hashes of every target file a sync would drop or move."""
+        return (
+            self.removed
+            + [change.old_hash for change in self.replaced]
+            + [change.old_hash for change in self.moved]
+        )
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.replaced or self.moved)
+
+    def to_json(self) -> dict:
+        """Describes the diff as a json-encodable dictionary."""
+
+        def describe(file: ModrinthFile) -> dict:
+            return {
+                "sha1": file.sha1,
+                "path": file.path,
+                "title": file.title,
+                "version": file.version_number,
+            }
+
+        def describe_changes(changes: list[FileChange]) -> list[dict]:
+            return [
+                {"from": describe(change.old), "to": describe(change.new)}
+                for change in changes
+            ]
+
+        return {
+            "added": [describe(self.source.files[hash]) for hash in self.added],
+            "removed": [describe(self.target.files[hash]) for hash in self.removed],
+            "upgraded": describe_changes(self.upgraded),
+            "downgraded": describe_changes(self.downgraded),
+            "changed": describe_changes(self.changed),
+            "moved": describe_changes(self.moved),
+        }
+
+
+def _version_key(file: ModrinthFile) -> Optional[tuple]:
+    # Modrinth version numbers aren't required to follow any scheme, so they
+    # are compared part by part, numbers numerically and the rest as text.
+    version_number = file.version_number
+    if not version_number:
+        return None
+    return tuple(
+        (0, int(part), "") if part.isdigit() else (1, 0, part.lower())
+        for part in _version_part.split(version_number)
+        if part
+    )
+
+
+def _compare_versions(old: ModrinthFile, new: ModrinthFile) -> int:
+    """Orders two versions of the same project.
+
+    Returns:
+        int: 1 if new is newer, -1 if it is older and 0 if it can't be told.
+    """
+    if old.version_file is not None and new.version_file is not None:
+        old_published = old.version_file.date_published
+        new_published = new.version_file.date_published
+        if old_published and new_published and old_published != new_published:
+            # ISO 8601 timestamps in the same format order as strings.
+            return 1 if new_published > old_published else -1
+
+    old_key, new_key = _version_key(old), _version_key(new)
+    if old_key is None or new_key is None or old_key == new_key:
+        return 0
+    return 1 if new_key > old_key else -1
+
+
+def _pairing_key(file: ModrinthFile) -> str:
+    if file.version_file is not None:
+        return f"project:{file.version_file.project_id}"
+    return f"path:{file.path}"
+
+
+def _index(
+    manifest: ModrinthManifest, hashes: list[str]
+) -> dict[str, list[str]]:
+    index: dict[str, list[str]] = {}
+    for hash in hashes:
+        index.setdefault(_pairing_key(manifest.files[hash]), []).append(hash)
+    return index
+
+
+def diff_manifests(source: ModrinthManifest, target: ModrinthManifest) -> ManifestDiff:
+    """Diffs a target manifest against the source manifest it syncs from.
+
+    Upgrades and downgrades are only found between files of enriched
+    manifests, otherwise a new version of a file is reported as changed when
+    it keeps its path, or as added and removed when it doesn't.
+
+    Args:
+        source (ModrinthManifest): The manifest being synced from, such as the
+        remote manifest.
+        target (ModrinthManifest): The manifest being synced to, such as the
+        local manifest.
+
+    Returns:
+        ManifestDiff: The classified differences, with each list in its
+        manifest's order.
+    """
+    diff = ManifestDiff(source, target)
+
+    source_files = source.files
+    target_files = target.files
+
+    source_only: list[str] = []
+    for hash, file in source_files.items():
+        target_file = target_files.get(hash)
+        if target_file is None:
+            source_only.append(hash)
+        elif target_file.path != file.path:
+            diff.moved.append(FileChange(target_file, file))
+    target_only = [hash for hash in target_files if hash not in source_files]
+
+    # A project with a single file on each side is a new version of that file.
+    # Projects with several files, such as a mod split into loader-specific
+    # jars, can't be paired reliably and are left as added and removed.
+    target_index = _index(target, target_only)
+    paired: set[str] = set()
+    for key, source_hashes in _index(source, source_only).items():
+        target_hashes = target_index.get(key)
+        if len(source_hashes) != 1 or target_hashes is None or len(target_hashes) != 1:
+            continue
+        change = FileChange(target_files[target_hashes[0]], source_files[source_hashes[0]])
+        order = _compare_versions(change.old, change.new)
+        if order > 0:
+            diff.upgraded.append(change)
+        elif order < 0:
+            diff.downgraded.append(change)
+        else:
+            diff.changed.append(change)
+        paired.add(source_hashes[0])
+        paired.add(target_hashes[0])
+
+    diff.added = [hash for hash in source_only if hash not in paired]
+    diff.removed = [hash for hash in target_only if hash not in paired]
+    return diff
@@ -0,0 +1,324 @@
+"""Local history of every manifest version the manager has seen.
+
+Versions are keyed by the manifest's name and versionId and kept in the order
+they were first recorded. Each version stores only the files added and
+removed since the version recorded before it, with a full snapshot every
+snapshot_interval versions so rebuilding any one version stays cheap. Diffing
+two stored versions composes the deltas between them, so it costs time
+proportional to the changes made rather than to the size of the manifest and
+needs no network access.
+
+Usage:
+    from manifest_history import get_history
+
+    added, removed = get_history().diff("Pack", "1.4", "1.7")
+"""
+
+import hashlib
+import json
+import logging
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from paths import user_cache_dir
+
+
+class ManifestHistory:
+    """A SQLite backed store of manifest versions.
+
+    Args:
+        path (Optional[pathlib.Path | str], optional): Location of the
+        database file. Defaults to history.sqlite3 in the user cache dir.
+        snapshot_interval (int, optional): Versions between full snapshots.
+    """
+
+    def __init__(
+        self, path: Optional[pathlib.Path | str] = None, snapshot_interval: int = 20
+    ) -> None:
+        if path is None:
+            path = user_cache_dir().joinpath("history.sqlite3")
+        self.path: pathlib.Path = pathlib.Path(path)
+        self.snapshot_interval: int = snapshot_interval
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._connection:
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS versions (
+                    name TEXT NOT NULL,
+                    version_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    digest TEXT NOT NULL,
+                    file_count INTEGER NOT NULL,
+                    header TEXT NOT NULL,
+                    recorded_at REAL NOT NULL,
+                    PRIMARY KEY (name, version_id),
+                    UNIQUE (name, seq)
+                );
+                CREATE TABLE IF NOT EXISTS changes (
+                    name TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    sha1 TEXT NOT NULL,
+                    added INTEGER NOT NULL,
+                    file TEXT
+                );
+                CREATE INDEX IF NOT EXISTS changes_seq ON changes (name, seq);
+                CREATE INDEX IF NOT EXISTS changes_sha1 ON changes (name, sha1, seq);
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    name TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    sha1 TEXT NOT NULL,
+                    file TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS snapshots_seq ON snapshots (name, seq);
+                """
+            )
+
+    @staticmethod
+    def _digest(files: dict[str, dict]) -> str:
+        return hashlib.sha1("\n".join(sorted(files)).encode()).hexdigest()
+
+    def _seq(self, name: str, version_id: str) -> int:
+        row = self._connection.execute(
+            "SELECT seq FROM versions WHERE name = ? AND version_id = ?",
+            (name, version_id),
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"{name} {version_id} is not in the manifest history")
+        return row[0]
+
+    def _files_at(self, name: str, seq: int) -> dict[str, dict]:
+        snapshot_seq: int = self._connection.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM snapshots WHERE name = ? AND seq <= ?",
+            (name, seq),
+        ).fetchone()[0]
+        files: dict[str, dict] = {
+            sha1: json.loads(file)
+            for sha1, file in self._connection.execute(
+                "SELECT sha1, file FROM snapshots WHERE name = ? AND seq = ?",
+                (name, snapshot_seq),
+            )
+        }
+        for sha1, added, file in self._connection.execute(
+            "SELECT sha1, added, file FROM changes "
+            "WHERE name = ? AND seq > ? AND seq <= ? ORDER BY seq, added",
+            (name, snapshot_seq, seq),
+        ):
+            if added:
+                files[sha1] = json.loads(file)
+            else:
+                files.pop(sha1, None)
+        return files
+
+    def record(self, manifest_json: dict) -> bool:
+        """Records a manifest version if it hasn't been recorded before.
+
+        A versionId that was already recorded keeps its first recorded file
+        list, since later versions are stored as deltas against it.
+
+        Args:
+            manifest_json (dict): The json-encoded manifest.
+
+        Returns:
+            bool: Whether a new version was recorded.
+        """
+        name: str = manifest_json["name"]
+        version_id: str = manifest_json["versionId"]
+        files: dict[str, dict] = {
+            file_json["hashes"]["sha1"]: file_json
+            for file_json in manifest_json["files"]
+        }
+        header = {key: value for key, value in manifest_json.items() if key != "files"}
+
+        with self._lock:
+            existing = self._connection.execute(
+                "SELECT digest FROM versions WHERE name = ? AND version_id = ?",
+                (name, version_id),
+            ).fetchone()
+            if existing is not None:
+                if existing[0] != self._digest(files):
+                    logging.warning(
+                        f"{name} {version_id} differs from the recorded version, "
+                        "keeping the recorded file list"
+                    )
+                return False
+
+            previous_seq: int = self._connection.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM versions WHERE name = ?", (name,)
+            ).fetchone()[0]
+            seq = previous_seq + 1
+            previous_files = self._files_at(name, previous_seq) if previous_seq else {}
+
+            changes = [
+                (name, seq, sha1, 1, json.dumps(file_json))
+                for sha1, file_json in files.items()
+                if sha1 not in previous_files
+            ] + [
+                (name, seq, sha1, 0, None)
+                for sha1 in previous_files
+                if sha1 not in files
+            ]
+
+            with self._connection:
+                self._connection.execute(
+                    "INSERT INTO versions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        name,
+                        version_id,
+                        seq,
+                        self._digest(files),
+                        len(files),
+                        json.dumps(header),
+                        time.time(),
+                    ),
+                )
+                self._connection.executemany(
+                    "INSERT INTO changes VALUES (?, ?, ?, ?, ?)", changes
+                )
+                if seq % self.snapshot_interval == 0:
+                    self._connection.executemany(
+                        "INSERT INTO snapshots VALUES (?, ?, ?, ?)",
+                        [
+                            (name, seq, sha1, json.dumps(file_json))
+                            for sha1, file_json in files.items()
+                        ],
+                    )
+            return True
+
+    def versions(self, name: str) -> list[tuple[str, int, float]]:
+        """Lists the recorded versions of a manifest.
+
+        Args:
+            name (str): The manifest's name.
+
+        Returns:
+            list[tuple[str, int, float]]: The versionId, file count and time
+            recorded of each version, in the order they were recorded.
+        """
+        with self._lock:
+            return self._connection.execute(
+                "SELECT version_id, file_count, recorded_at FROM versions "
+                "WHERE name = ? ORDER BY seq",
+                (name,),
+            ).fetchall()
+
+    def names(self) -> list[str]:
+        with self._lock:
+            return [
+                row[0]
+                for row in self._connection.execute(
+                    "SELECT DISTINCT name FROM versions ORDER BY name"
+                )
+            ]
+
+    def get_manifest(self, name: str, version_id: str) -> dict:
+        """Rebuilds a recorded manifest.
+
+        Raises:
+            KeyError: The version was never recorded.
+        """
+        with self._lock:
+            seq = self._seq(name, version_id)
+            header: dict = json.loads(
+                self._connection.execute(
+                    "SELECT header FROM versions WHERE name = ? AND seq = ?",
+                    (name, seq),
+                ).fetchone()[0]
+            )
+            return {**header, "files": list(self._files_at(name, seq).values())}
+
+    def diff(
+        self, name: str, from_version_id: str, to_version_id: str
+    ) -> tuple[dict[str, dict], dict[str, dict]]:
+        """Finds the files added and removed between two recorded versions.
+
+        Args:
+            name (str): The manifest's name.
+            from_version_id (str): The versionId to diff from.
+            to_version_id (str): The versionId to diff to.
+
+        Returns:
+            tuple[dict[str, dict], dict[str, dict]]: The files only in the
+            later version and the files only in the earlier version, each
+            identified by sha1.
+
+        Raises:
+            KeyError: One of the versions was never recorded.
+        """
+        with self._lock:
+            from_seq = self._seq(name, from_version_id)
+            to_seq = self._seq(name, to_version_id)
+            reverse = to_seq < from_seq
+            low, high = sorted((from_seq, to_seq))
+
+            added: dict[str, Optional[str]] = {}
+            removed: set[str] = set()
+            for sha1, was_added, file in self._connection.execute(
+                "SELECT sha1, added, file FROM changes "
+                "WHERE name = ? AND seq > ? AND seq <= ? ORDER BY seq, added",
+                (name, low, high),
+            ):
+                if was_added:
+                    if sha1 in removed:
+                        removed.discard(sha1)
+                    else:
+                        added[sha1] = file
+                elif sha1 in added:
+                    del added[sha1]
+                else:
+                    removed.add(sha1)
+
+            # Removed files carry no json in their delta, so look up the
+            # version of the file that was present at the earlier version.
+            removed_files: dict[str, dict] = {}
+            for sha1 in removed:
+                row = self._connection.execute(
+                    "SELECT file FROM changes WHERE name = ? AND sha1 = ? "
+                    "AND added = 1 AND seq <= ? ORDER BY seq DESC LIMIT 1",
+                    (name, sha1, low),
+                ).fetchone()
+                removed_files[sha1] = json.loads(row[0]) if row else {}
+
+            added_files = {sha1: json.loads(str(file)) for sha1, file in added.items()}
+
+        if reverse:
+            return removed_files, added_files
+        return added_files, removed_files
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+_history: Optional[ManifestHistory] = None
+_history_enabled: bool = True
+_history_lock = threading.Lock()
+
+
+def set_history(history: Optional[ManifestHistory]) -> None:
+    """Replaces the history store manifests are recorded into.
+
+    Args:
+        history (Optional[ManifestHistory]): The store to use, or None to stop
+        recording manifests.
+    """
+    global _history, _history_enabled
+    with _history_lock:
+        _history = history
+        _history_enabled = history is not None
+
+
+def get_history() -> Optional[ManifestHistory]:
+    """Gets the history store, opening the default on-disk store on first use.
+
+    Returns:
+        Optional[ManifestHistory]: The store, or None if recording is disabled.
+    """
+    global _history
+    with _history_lock:
+        if _history is None and _history_enabled:
+            _history = ManifestHistory()
+        return _history
@@ -0,0 +1,161 @@
+"""Reads a modrinth.index.json incrementally from a byte stream.
+
+The index is decoded a chunk at a time, and every entry of its files array is
+handed out as soon as it has been read, so a huge index never has to be held
+in memory as one string or one list. Header fields that come before the files
+array, such as name and versionId, are available before any file is read.
+
+Usage:
+    from manifest_stream import ManifestReader
+
+    with MrPack("my-pack.mrpack").open_manifest() as index:
+        reader = ManifestReader(index)
+        print(reader.read_header()["name"])
+        for file_json in reader.iter_files():
+            ...
+"""
+
+import codecs
+import json
+import re
+from typing import IO, Iterator
+
+_default_chunk_size = 64 * 1024
+_whitespace = re.compile(r"[ \t\n\r]*")
+
+# Where the reader is in the index's top level object.
+_before_object = 0
+_in_header = 1
+_in_files = 2
+_done = 3
+
+
+class ManifestReader:
+    """Parses an index one chunk at a time.
+
+    Args:
+        source (IO[bytes]): The index's bytes, such as an open zip member.
+        chunk_size (int, optional): Bytes read from source at a time.
+    """
+
+    def __init__(
+        self, source: IO[bytes], chunk_size: int = _default_chunk_size
+    ) -> None:
+        self.chunk_size: int = chunk_size
+        self.header: dict = {}
+        self.bytes_read: int = 0
+
+        self._source = source
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._json = json.JSONDecoder()
+        self._buffer: str = ""
+        self._position: int = 0
+        self._eof: bool = False
+        self._state: int = _before_object
+
+    def _fill(self) -> bool:
+        # Appends the next chunk, dropping the part already parsed so the
+        # buffer stays around a chunk in size. Returns False at the end.
+        if self._eof:
+            return False
+        chunk = self._source.read(self.chunk_size)
+        self.bytes_read += len(chunk)
+        if not chunk:
+            self._eof = True
+        text = self._decoder.decode(chunk, final=self._eof)
+        self._buffer = self._buffer[self._position :] + text
+        self._position = 0
+        return bool(chunk)
+
+    def _peek(self) -> str:
+        # Skips whitespace and returns the next character, or "" at the end.
+        while True:
+            whitespace = _whitespace.match(self._buffer, self._position)
+            # The pattern matches the empty string, so there is always a match.
+            assert whitespace is not None
+            self._position = whitespace.end()
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill():
+                return ""
+
+    def _expect(self, character: str) -> None:
+        found = self._peek()
+        if found != character:
+            raise ValueError(
+                f"Expected {character!r} in the index but found {found or 'the end'!r}"
+            )
+        self._position += 1
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                # The value runs past the buffer, unless the index is over.
+                if not self._fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the
+            # next chunk.
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._position = end
+            return value
+
+    def _read_keys(self) -> None:
+        while self._state == _in_header:
+            character = self._peek()
+            if character == "}":
+                self._position += 1
+                self._state = _done
+            elif character == ",":
+                self._position += 1
+            elif character == "":
+                raise ValueError("The index ended before its closing brace")
+            else:
+                key = self._value()
+                self._expect(":")
+                if key == "files":
+                    self._expect("[")
+                    self._state = _in_files
+                else:
+                    self.header[key] = self._value()
+
+    def read_header(self) -> dict:
+        """Reads the index up to the start of its files array.
+
+        Returns:
+            dict: The fields read so far. Fields after the files array are
+            added once iter_files has finished.
+
+        Raises:
+            ValueError: The index isn't a json object.
+        """
+        if self._state == _before_object:
+            self._expect("{")
+            self._state = _in_header
+        self._read_keys()
+        return self.header
+
+    def iter_files(self) -> Iterator[dict]:
+        """Yields each entry of the files array as it is read, then reads the
+        rest of the header.
+
+        Raises:
+            ValueError: The index is malformed or cut short.
+        """
+        self.read_header()
+        while self._state == _in_files:
+            character = self._peek()
+            if character == "]":
+                self._position += 1
+                self._state = _in_header
+            elif character == ",":
+                self._position += 1
+            elif character == "":
+                raise ValueError("The index ended inside its files array")
+            else:
+                yield self._value()
+        self._read_keys()
@@ -0,0 +1,251 @@
+"""Persistent on-disk cache for Modrinth API metadata.
+
+Version files are keyed by the hash (and hash algorithm) that identifies them
+and projects are keyed by their id. Keys Modrinth doesn't know are cached too,
+so they aren't asked for again until the TTL passes. Entries older than the
+cache's TTL are reported as stale so callers can revalidate them with the ETag
+stored for the request that produced them. The cache is bounded in size and evicts the least
+recently accessed entries first.
+
+Usage:
+    from metadata_cache import MetadataCache
+
+    cache = MetadataCache()
+    fresh, stale, unknown = cache.lookup(MetadataCache.PROJECT, ["project_id"])
+"""
+
+import json
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional
+
+from paths import user_cache_dir
+
+_default_ttl = 24 * 60 * 60
+_default_max_bytes = 64 * 1024 * 1024
+# Stored in place of a payload for keys Modrinth doesn't know.
+_unknown_payload = "null"
+
+
+class MetadataCache:
+    """A SQLite backed store of json-encoded API responses.
+
+    Args:
+        path (Optional[pathlib.Path | str], optional): Location of the
+        database file. Defaults to metadata.sqlite3 in the user cache dir.
+        ttl (float, optional): Seconds an entry is considered fresh for.
+        max_bytes (int, optional): Upper bound on the total size of stored
+        payloads before least recently used entries are evicted.
+    """
+
+    VERSION_FILE = "version_file"
+    PROJECT = "project"
+    VERSION_UPDATE = "version_update"
+
+    def __init__(
+        self,
+        path: Optional[pathlib.Path | str] = None,
+        ttl: float = _default_ttl,
+        max_bytes: int = _default_max_bytes,
+    ) -> None:
+        if path is None:
+            path = user_cache_dir().joinpath("metadata.sqlite3")
+        self.path: pathlib.Path = pathlib.Path(path)
+        self.ttl: float = ttl
+        self.max_bytes: int = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (kind, key)
+                )"""
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)"
+            )
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS etags (
+                    request_key TEXT PRIMARY KEY,
+                    etag TEXT NOT NULL
+                )"""
+            )
+
+    @staticmethod
+    def version_file_key(hash: str, algorithm: str = "sha1") -> str:
+        return f"{algorithm}:{hash}"
+
+    @staticmethod
+    def version_update_key(
+        hash: str, loaders: list[str], game_versions: list[str], algorithm: str = "sha1"
+    ) -> str:
+        # The newest version of a file's project depends on what it has to
+        # run on, so that is part of the key.
+        return (
+            f"{','.join(sorted(loaders))}/{','.join(sorted(game_versions))}/"
+            f"{algorithm}:{hash}"
+        )
+
+    def lookup(
+        self, kind: str, keys: Iterable[str]
+    ) -> tuple[dict[str, dict], dict[str, dict], set[str]]:
+        """Looks up cached payloads.
+
+        Args:
+            kind (str): Either MetadataCache.VERSION_FILE or
+            MetadataCache.PROJECT.
+            keys (Iterable[str]): The keys to look up.
+
+        Returns:
+            tuple[dict[str, dict], dict[str, dict], set[str]]: The fresh and
+            the stale payloads found, each identified by key, and the keys
+            recently found to be unknown to Modrinth. Keys that are in none
+            of them were not cached, or were unknown too long ago.
+        """
+        keys = list(dict.fromkeys(keys))
+        fresh: dict[str, dict] = {}
+        stale: dict[str, dict] = {}
+        unknown: set[str] = set()
+        now = time.time()
+
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement.
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT key, payload, fetched_at FROM entries "
+                    f"WHERE kind = ? AND key IN ({placeholders})",
+                    [kind, *chunk],
+                ).fetchall()
+                for key, payload, fetched_at in rows:
+                    if payload == _unknown_payload:
+                        if now - fetched_at <= self.ttl:
+                            unknown.add(key)
+                    elif now - fetched_at <= self.ttl:
+                        fresh[key] = json.loads(payload)
+                    else:
+                        stale[key] = json.loads(payload)
+                if rows:
+                    with self._connection:
+                        self._connection.executemany(
+                            "UPDATE entries SET accessed_at = ? WHERE kind = ? AND key = ?",
+                            [(now, kind, row[0]) for row in rows],
+                        )
+
+        self.hits += len(fresh) + len(unknown)
+        self.misses += len(keys) - len(fresh) - len(unknown)
+        return fresh, stale, unknown
+
+    def store(self, kind: str, entries: dict[str, dict]) -> None:
+        """Stores payloads, replacing any existing entries with the same keys.
+
+        Args:
+            kind (str): Either MetadataCache.VERSION_FILE or
+            MetadataCache.PROJECT.
+            entries (dict[str, dict]): The payloads to store identified by key.
+        """
+        if not entries:
+            return
+        now = time.time()
+        rows = []
+        for key, value in entries.items():
+            payload = json.dumps(value, separators=(",", ":"))
+            rows.append((kind, key, payload, len(payload), now, now))
+
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+        self.evict()
+
+    def store_unknown(self, kind: str, keys: Iterable[str]) -> None:
+        """Records keys Modrinth had nothing for, replacing any existing
+        entries with the same keys, so they are skipped until the TTL passes.
+
+        Args:
+            kind (str): Either MetadataCache.VERSION_FILE or
+            MetadataCache.PROJECT.
+            keys (Iterable[str]): The keys that weren't found.
+        """
+        now = time.time()
+        rows = [
+            (kind, key, _unknown_payload, len(_unknown_payload), now, now)
+            for key in keys
+        ]
+        if not rows:
+            return
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+        self.evict()
+
+    def touch(self, kind: str, keys: Iterable[str]) -> None:
+        """Marks entries as freshly fetched after a successful revalidation."""
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE kind = ? AND key = ?",
+                [(now, now, kind, key) for key in keys],
+            )
+
+    def get_etag(self, request_key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT etag FROM etags WHERE request_key = ?", (request_key,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def set_etag(self, request_key: str, etag: Optional[str]) -> None:
+        if etag is None:
+            return
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO etags VALUES (?, ?)", (request_key, etag)
+            )
+
+    def evict(self) -> None:
+        """Removes least recently accessed entries until the stored payloads
+        fit within max_bytes."""
+        with self._lock:
+            total: int = self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            # Evict down to 90% so that every store doesn't trigger an eviction.
+            excess = total - int(self.max_bytes * 0.9)
+            doomed = []
+            for kind, key, size in self._connection.execute(
+                "SELECT kind, key, size FROM entries ORDER BY accessed_at ASC"
+            ):
+                doomed.append((kind, key))
+                excess -= size
+                if excess <= 0:
+                    break
+
+            with self._connection:
+                self._connection.executemany(
+                    "DELETE FROM entries WHERE kind = ? AND key = ?", doomed
+                )
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM entries")
+            self._connection.execute("DELETE FROM etags")
+
+    def close(self) -> None:
+        self._connection.close()
@@ -0,0 +1,369 @@
+"""Local stand-ins for the parts of Modrinth's REST API and CDN the manager
+uses.
+
+The API server runs in a background thread, enforces a rate limit with the
+same headers Modrinth sends, and can inject latency and failed responses so
+bulk lookups and retries can be exercised and measured without touching the
+real API. The file server serves
+downloads with Range support and can be told to fail or cut off transfers, so
+installs can be exercised the same way.
+
+Usage:
+    from mock_api import MockModrinthServer
+    from modrinth_api import ModrinthClient, set_client
+
+    with MockModrinthServer(rate_limit=10) as server:
+        server.add_project({"id": "abc", "title": "A", "description": ""})
+        set_client(ModrinthClient(api_url=server.api_url))
+"""
+
+import json
+import re
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+# The servers only listen on the loopback interface.
+_host = "127.0.0.1"
+
+
+class MockModrinthServer:
+    """Serves projects and version files from memory.
+
+    Args:
+        rate_limit (int, optional): Requests allowed per window before the
+        server answers 429.
+        period (float, optional): Length of a rate limit window in seconds.
+        latency (float, optional): Seconds every response is delayed by.
+        max_url_length (int, optional): Longest request line accepted before
+        the server answers 414.
+    """
+
+    def __init__(
+        self,
+        rate_limit: int = 300,
+        period: float = 60.0,
+        latency: float = 0.0,
+        max_url_length: int = 8192,
+    ) -> None:
+        self.rate_limit: int = rate_limit
+        self.period: float = period
+        self.latency: float = latency
+        self.max_url_length: int = max_url_length
+
+        self.projects: dict[str, dict] = {}
+        self.version_files: dict[str, dict] = {}
+        self.project_versions: dict[str, list[dict]] = {}
+        self.requests: Counter[str] = Counter()
+        self.rate_limited: int = 0
+        # Answers sent instead of the real one to the next requests, as a
+        # status code and the seconds of an optional Retry-After header.
+        self.failures: list[tuple[int, Optional[float]]] = []
+
+        self._lock = threading.Lock()
+        self._window_start: float = time.monotonic()
+        self._window_count: int = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None, "server is not running"
+        return f"http://{_host}:{self._server.server_address[1]}"
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.url}/v2"
+
+    def add_project(self, project_json: dict) -> None:
+        self.projects[project_json["id"]] = project_json
+
+    def add_version_file(self, version_file_json: dict) -> None:
+        """Registers a version so it can be found by the hash of any of its
+        files."""
+        for file in version_file_json["files"]:
+            for algorithm, hash in file["hashes"].items():
+                self.version_files[f"{algorithm}:{hash}"] = version_file_json
+        self.project_versions.setdefault(version_file_json["project_id"], []).append(
+            version_file_json
+        )
+
+    def _latest_version(
+        self, project_id: str, loaders: list[str], game_versions: list[str]
+    ) -> Optional[dict]:
+        # Versions without loaders or game_versions are taken to run anywhere.
+        compatible = [
+            version
+            for version in self.project_versions.get(project_id, [])
+            if set(version.get("loaders", loaders)) & set(loaders)
+            and set(version.get("game_versions", game_versions)) & set(game_versions)
+        ]
+        if not compatible:
+            return None
+        return max(compatible, key=lambda version: version.get("date_published") or "")
+
+    def _take_token(self) -> tuple[bool, int, float]:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.period:
+                self._window_start = now
+                self._window_count = 0
+            reset = self.period - (now - self._window_start)
+            if self._window_count >= self.rate_limit:
+                self.rate_limited += 1
+                return False, 0, reset
+            self._window_count += 1
+            return True, self.rate_limit - self._window_count, reset
+
+    def _handle(self, handler: BaseHTTPRequestHandler, method: str) -> None:
+        length = int(handler.headers.get("content-length") or 0)
+        body = handler.rfile.read(length) if length else b""
+
+        if len(handler.requestline) > self.max_url_length:
+            handler.send_response(414)
+            handler.send_header("content-length", "0")
+            handler.end_headers()
+            return
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        parsed = urllib.parse.urlsplit(handler.path)
+        route = parsed.path.removeprefix("/v2/").rstrip("/")
+        query = urllib.parse.parse_qs(urllib.parse.unquote(parsed.query))
+        with self._lock:
+            self.requests[f"{method} {route.split('/')[0]}"] += 1
+            failure = self.failures.pop(0) if self.failures else None
+
+        if failure is not None:
+            status, retry_after = failure
+            handler.send_response(status)
+            if retry_after is not None:
+                handler.send_header("retry-after", str(retry_after))
+            handler.send_header("content-length", "0")
+            handler.end_headers()
+            return
+
+        allowed, remaining, reset = self._take_token()
+        status, payload = (429, {"error": "ratelimited"})
+        if allowed:
+            status, payload = self.route(method, route, query, body)
+
+        encoded = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header("content-type", "application/json")
+        handler.send_header("content-length", str(len(encoded)))
+        handler.send_header("x-ratelimit-limit", str(self.rate_limit))
+        handler.send_header("x-ratelimit-remaining", str(remaining))
+        handler.send_header("x-ratelimit-reset", str(max(int(reset + 0.999), 1)))
+        handler.end_headers()
+        handler.wfile.write(encoded)
+
+    def route(
+        self, method: str, route: str, query: dict[str, list[str]], body: bytes
+    ) -> tuple[int, Any]:
+        """Answers a single API request.
+
+        Returns:
+            tuple[int, Any]: The status code and json-encodable payload.
+        """
+        if method == "GET" and route == "projects":
+            ids: list[str] = json.loads(query["ids"][0])
+            return 200, [self.projects[id] for id in ids if id in self.projects]
+
+        if method == "GET" and route.startswith("project/"):
+            project = self.projects.get(route.split("/", 1)[1])
+            return (200, project) if project else (404, {"error": "not_found"})
+
+        if method == "POST" and route == "version_files":
+            request = json.loads(body)
+            algorithm = request.get("algorithm", "sha1")
+            found: dict[str, dict] = {}
+            for hash in request["hashes"]:
+                version_file = self.version_files.get(f"{algorithm}:{hash}")
+                if version_file is not None:
+                    found[hash] = version_file
+            return 200, found
+
+        if method == "POST" and route == "version_files/update":
+            request = json.loads(body)
+            algorithm = request.get("algorithm", "sha1")
+            latest: dict[str, dict] = {}
+            for hash in request["hashes"]:
+                version_file = self.version_files.get(f"{algorithm}:{hash}")
+                if version_file is None:
+                    continue
+                version = self._latest_version(
+                    version_file["project_id"],
+                    request.get("loaders", []),
+                    request.get("game_versions", []),
+                )
+                if version is not None:
+                    latest[hash] = version
+            return 200, latest
+
+        if method == "GET" and route.startswith("version_file/"):
+            algorithm = query.get("algorithm", ["sha1"])[0]
+            version_file = self.version_files.get(
+                f"{algorithm}:{route.split('/', 1)[1]}"
+            )
+            return (200, version_file) if version_file else (404, {"error": "not_found"})
+
+        return 404, {"error": "not_found"}
+
+    def start(self) -> "MockModrinthServer":
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, which Nagle's
+            # algorithm would otherwise hold back for a delayed ACK.
+            disable_nagle_algorithm = True
+
+            def do_GET(self) -> None:
+                server._handle(self, "GET")
+
+            def do_POST(self) -> None:
+                server._handle(self, "POST")
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((_host, 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MockModrinthServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+class MockFileServer:
+    """Serves file downloads from memory.
+
+    Args:
+        latency (float, optional): Seconds every response is delayed by.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency: float = latency
+
+        self.files: dict[str, bytes] = {}
+        # Paths answered with a 500, and paths whose next transfer is cut off
+        # after the given number of bytes.
+        self.failing: set[str] = set()
+        self.truncate: dict[str, int] = {}
+        self.requests: Counter[str] = Counter()
+        self.range_requests: Counter[str] = Counter()
+
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None, "server is not running"
+        return f"http://{_host}:{self._server.server_address[1]}"
+
+    def add_file(self, path: str, content: bytes) -> str:
+        """Serves content at a path.
+
+        Returns:
+            str: The URL the content can be downloaded from.
+        """
+        path = path.lstrip("/")
+        self.files[path] = content
+        return f"{self.url}/{path}"
+
+    def _handle(self, handler: BaseHTTPRequestHandler) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+
+        path = urllib.parse.unquote(urllib.parse.urlsplit(handler.path).path).lstrip(
+            "/"
+        )
+        range_header = handler.headers.get("range")
+        with self._lock:
+            self.requests[path] += 1
+            if range_header:
+                self.range_requests[path] += 1
+            cut_off = self.truncate.pop(path, None)
+
+        content = self.files.get(path)
+        if path in self.failing or content is None:
+            status = 500 if path in self.failing else 404
+            handler.send_response(status)
+            handler.send_header("content-length", "0")
+            handler.end_headers()
+            return
+
+        start = 0
+        match = re.fullmatch(r"bytes=(\d+)-", range_header or "")
+        if match:
+            start = int(match.group(1))
+            if start >= len(content):
+                handler.send_response(416)
+                handler.send_header("content-range", f"bytes */{len(content)}")
+                handler.send_header("content-length", "0")
+                handler.end_headers()
+                return
+            handler.send_response(206)
+            handler.send_header(
+                "content-range", f"bytes {start}-{len(content) - 1}/{len(content)}"
+            )
+        else:
+            handler.send_response(200)
+        body = content[start:]
+        handler.send_header("content-type", "application/java-archive")
+        handler.send_header("accept-ranges", "bytes")
+        handler.send_header("content-length", str(len(body)))
+        handler.end_headers()
+
+        if cut_off is not None:
+            handler.wfile.write(body[:cut_off])
+            handler.wfile.flush()
+            handler.close_connection = True
+            return
+        handler.wfile.write(body)
+
+    def start(self) -> "MockFileServer":
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self) -> None:
+                server._handle(self)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((_host, 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MockFileServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -8,51 +8,528 @@ Usage:
     project: ModrinthProject = get_project("project_id")
 """
 
+from __future__ import annotations
+
+import hashlib
 import logging
-from typing import TypeAlias, cast
-import requests
+import asyncio
+import concurrent.futures
+import random
+import sys
+import threading
+import time
+import weakref
+from typing import TYPE_CHECKING, Callable, Optional, TypeAlias, TypeVar, cast
+
+# requests is only imported once the first request is sent, so the app can
+# draw its first frame without paying for it.
+if TYPE_CHECKING:
+    import requests
+    import requests.structures
+
+from metadata_cache import MetadataCache
+from tracing import Span, span
 
 _user_agent = "sean-delcastillo/manifest-manager"
 _default_header = {"user-agent": _user_agent}
 _api_url = "https://api.modrinth.com/v2"
 
+_metadata_cache: Optional[MetadataCache] = None
+_metadata_cache_enabled: bool = True
+
+_retry_statuses = frozenset({429, 500, 502, 503, 504})
+
+
+class RateLimiter:
+    """A token bucket that follows Modrinth's rate limit headers.
+
+    The bucket starts with the documented limit and is corrected from the
+    X-Ratelimit-Limit, X-Ratelimit-Remaining and X-Ratelimit-Reset headers of
+    every response, so concurrent requests block until the window resets
+    instead of running into 429s.
+
+    Args:
+        limit (int, optional): Requests allowed per window.
+        period (float, optional): Length of a window in seconds.
+    """
+
+    def __init__(self, limit: int = 300, period: float = 60.0) -> None:
+        self.limit: int = limit
+        self.period: float = period
+        self._tokens: int = limit
+        self._reset_at: float = time.monotonic() + period
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        """Takes a token, blocking until the current window resets if the
+        bucket is empty."""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if now >= self._reset_at:
+                    self._tokens = self.limit
+                    self._reset_at = now + self.period
+                if self._tokens > 0:
+                    self._tokens -= 1
+                    return
+                self._condition.wait(self._reset_at - now)
+
+    def update(self, headers: dict | requests.structures.CaseInsensitiveDict) -> None:
+        """Corrects the bucket from a response's rate limit headers."""
+        try:
+            remaining = int(headers["x-ratelimit-remaining"])
+            reset = float(headers["x-ratelimit-reset"])
+        except (KeyError, ValueError):
+            return
+
+        with self._condition:
+            if "x-ratelimit-limit" in headers:
+                self.limit = int(headers["x-ratelimit-limit"])
+            reset_at = time.monotonic() + reset
+            if reset_at > self._reset_at + 1:
+                # The server has started a new window since our last update.
+                self._tokens = remaining
+            else:
+                self._tokens = min(self._tokens, remaining)
+            self._reset_at = reset_at
+            self._condition.notify_all()
+
+
+class ModrinthClient:
+    """A pooled HTTP client shared by every request the manager makes.
+
+    Connections are kept alive and reused between requests, responses are
+    gzip encoded and requests that fail with a connection error, a 429 or a
+    5xx are retried with jittered exponential backoff that honours the
+    Retry-After header.
+
+    Requests to api_url share a RateLimiter, and bulk lookups are split into
+    chunks of ids_per_request or hashes_per_request that are fetched
+    concurrently by up to max_workers threads.
+
+    Args:
+        api_url (str, optional): Base URL of the Modrinth API, which can point
+        at a local stand-in server.
+        pool_size (int, optional): Connections kept open per host.
+        max_retries (int, optional): Retries before giving up on a request.
+        backoff_factor (float, optional): Base delay in seconds; the nth retry
+        waits up to backoff_factor * 2 ** n.
+        max_backoff (float, optional): Upper bound on any single delay.
+        timeout (float, optional): Connect and read timeout in seconds.
+        ids_per_request (int, optional): Project ids sent per projects query.
+        hashes_per_request (int, optional): Hashes sent per version_files body.
+        max_workers (int, optional): Chunks fetched at the same time.
+        rate_limiter (Optional[RateLimiter], optional): Bucket shared by API
+        requests. Defaults to Modrinth's documented 300 requests per minute.
+    """
+
+    def __init__(
+        self,
+        api_url: str = _api_url,
+        pool_size: int = 10,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 30.0,
+        timeout: float = 30.0,
+        ids_per_request: int = 100,
+        hashes_per_request: int = 500,
+        max_workers: int = 4,
+        rate_limiter: Optional[RateLimiter] = None,
+    ) -> None:
+        self.api_url: str = api_url.rstrip("/")
+        self.ids_per_request: int = ids_per_request
+        self.hashes_per_request: int = hashes_per_request
+        self.max_workers: int = max_workers
+        self.rate_limiter: RateLimiter = (
+            rate_limiter if rate_limiter is not None else RateLimiter()
+        )
+        self.max_retries: int = max_retries
+        self.backoff_factor: float = backoff_factor
+        self.max_backoff: float = max_backoff
+        self.timeout: float = timeout
+
+        import requests
+        import requests.adapters
+
+        self._adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        self.session.headers.update(
+            {**_default_header, "accept-encoding": "gzip, deflate"}
+        )
+
+        self._stats_lock = threading.Lock()
+        self._requests: int = 0
+        self._retries: int = 0
+        self._failures: int = 0
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response]) -> float:
+        if response is not None and "retry-after" in response.headers:
+            retry_after: str = response.headers["retry-after"]
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                import email.utils
+
+                retry_at = email.utils.parsedate_to_datetime(retry_after)
+                delay = retry_at.timestamp() - time.time()
+            return min(max(delay, 0.0), self.max_backoff)
+
+        if (
+            response is not None
+            and response.status_code == 429
+            and "x-ratelimit-reset" in response.headers
+        ):
+            return min(float(response.headers["x-ratelimit-reset"]), self.max_backoff)
+
+        # Full jitter keeps many clients from retrying in lockstep.
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2**attempt))
+
+    def send(self, request: requests.PreparedRequest) -> requests.Response:
+        """Sends a prepared request, retrying transient failures.
+
+        Args:
+            request (requests.PreparedRequest): The request to send.
+
+        Returns:
+            requests.Response: The final response.
+
+        Raises:
+            HTTPError: A non-successful HTTP code was returned after all
+            retries were used up.
+        """
+        url = cast(str, request.url)
+        with span(
+            f"http {request.method}",
+            "http",
+            route=url.split("?", 1)[0].removeprefix(self.api_url),
+            url_length=len(url),
+            request_bytes=len(request.body or b""),
+        ) as current:
+            response = self._send(request, url, current)
+            current.set(
+                status=response.status_code,
+                response_bytes=len(response.content),
+            )
+            return response
+
+    def download(
+        self, url: str, headers: Optional[dict] = None, timeout: Optional[float] = None
+    ) -> requests.Response:
+        """Starts a streamed GET through the shared session, retrying
+        connection errors, 429s and 5xxs the same way send does.
+
+        Args:
+            url (str): The URL to download.
+            headers (Optional[dict], optional): Extra headers, such as a Range.
+            timeout (Optional[float], optional): Connect and read timeout in
+            seconds. Defaults to the client's timeout.
+
+        Returns:
+            requests.Response: The response, with its body not read yet. It
+            has to be closed once read, for example with a with block.
+
+        Raises:
+            HTTPError: A non-successful HTTP code was returned after all
+            retries were used up.
+        """
+        import requests
+
+        prepared = self.session.prepare_request(
+            requests.Request("GET", url, headers=headers)
+        )
+        with span("http download", "http", url=url) as current:
+            response = self._send(prepared, url, current, stream=True, timeout=timeout)
+            current.set(
+                status=response.status_code,
+                response_bytes=int(response.headers.get("content-length", 0)),
+            )
+            return response
+
+    def _send(
+        self,
+        request: requests.PreparedRequest,
+        url: str,
+        current: Span,
+        stream: bool = False,
+        timeout: Optional[float] = None,
+    ) -> requests.Response:
+        import requests
+
+        rate_limited = url.startswith(self.api_url)
+        attempt = 0
+        while True:
+            response: Optional[requests.Response] = None
+            with self._stats_lock:
+                self._requests += 1
+            if rate_limited:
+                self.rate_limiter.acquire()
+            try:
+                response = self.session.send(
+                    request.copy(), timeout=timeout or self.timeout, stream=stream
+                )
+                if rate_limited:
+                    self.rate_limiter.update(response.headers)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    with self._stats_lock:
+                        self._failures += 1
+                    raise
+
+            if response is not None and response.status_code not in _retry_statuses:
+                if not response.ok:
+                    response.close()
+                response.raise_for_status()
+                return response
+
+            if attempt >= self.max_retries:
+                with self._stats_lock:
+                    self._failures += 1
+                cast("requests.Response", response).close()
+                cast("requests.Response", response).raise_for_status()
+
+            if response is not None:
+                # A streamed body is never read, so its connection is freed.
+                response.close()
+
+            delay = self._backoff(attempt, response)
+            logging.debug(
+                f"Retrying {request.method} {request.url} in {delay:.2f}s "
+                f"({'connection error' if response is None else response.status_code})"
+            )
+            with self._stats_lock:
+                self._retries += 1
+            attempt += 1
+            current.set(retries=attempt)
+            time.sleep(delay)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        params: Optional[dict] = None,
+        json: Optional[dict] = None,
+        data: Optional[str] = None,
+        headers: Optional[dict] = None,
+        raw_query: str = "",
+    ) -> requests.Response:
+        """Builds and sends a request through the shared session.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The absolute URL to request.
+            params (Optional[dict], optional): Percent-encoded query parameters.
+            json (Optional[dict], optional): A json-encodable request body.
+            data (Optional[str], optional): A raw request body.
+            headers (Optional[dict], optional): Extra headers for this request.
+            raw_query (str, optional): A query string appended to the URL
+            as-is, for endpoints that don't accept percent-encoded values.
+
+        Returns:
+            requests.Response: The final response.
+        """
+        import requests
+
+        prepared = self.session.prepare_request(
+            requests.Request(
+                method, url, params=params, json=json, data=data, headers=headers
+            )
+        )
+        assert isinstance(prepared.url, str)
+        prepared.url += raw_query
+        return self.send(prepared)
+
+    def stats(self) -> dict[str, int]:
+        """Gets counters useful for tuning the pool and retry settings.
+
+        Returns:
+            dict[str, int]: The number of requests sent, retries made,
+            requests that failed after retrying, connections opened and
+            requests that reused an already open connection.
+        """
+        opened = 0
+        served = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            opened += pool.num_connections
+            served += pool.num_requests
+        with self._stats_lock:
+            return {
+                "requests": self._requests,
+                "retries": self._retries,
+                "failures": self._failures,
+                "connections_opened": opened,
+                "connections_reused": max(served - opened, 0),
+            }
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_client: Optional[ModrinthClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> ModrinthClient:
+    """Gets the shared client, creating one with default settings on first use.
+
+    Returns:
+        ModrinthClient: The client every request in the manager is sent with.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ModrinthClient()
+        return _client
+
+
+def set_client(client: ModrinthClient) -> None:
+    """Replaces the shared client, for example with one configured for CI.
+
+    Args:
+        client (ModrinthClient): The client to send all future requests with.
+    """
+    global _client
+    with _client_lock:
+        _client = client
+
 
 class ModrinthProject:
     """Projects are what Modrinth is centered around, be it mods, modpacks,
     resource packs, etc.
+
+    Only the fields the manager shows are kept, and ids and slugs are
+    interned. The lookup functions hand out one shared object per project,
+    so every manifest that uses a project points at the same one.
+
     Args:
         project_json (dict): The json-encoded content that corresponds to a
         project.
+        keep_json (bool, optional): Keep project_json for to_json. Defaults to
+        False, which lets it be freed once the fields are read.
     """
 
-    def __init__(self, project_json: dict) -> None:
-        self._dict: dict = project_json
+    __slots__ = ("id", "slug", "title", "description", "_json", "__weakref__")
+
+    def __init__(self, project_json: dict, keep_json: bool = False) -> None:
+        self._json: Optional[dict] = None
+        self._load(project_json, keep_json)
+
+    def _load(self, project_json: dict, keep_json: bool) -> None:
+        self.id: str = sys.intern(project_json["id"])
+        self.slug: str = sys.intern(project_json.get("slug") or project_json["id"])
         self.title: str = project_json["title"]
         self.description: str = project_json["description"]
-        self.id: str = project_json["id"]
+        if keep_json:
+            self._json = project_json
+
+    def to_json(self) -> dict:
+        """Gets the json the project was built from if it was kept, otherwise
+        the fields that were."""
+        if self._json is not None:
+            return self._json
+        return {
+            "id": self.id,
+            "slug": self.slug,
+            "title": self.title,
+            "description": self.description,
+        }
 
     def __str__(self) -> str:
-        return self._dict.__str__()
+        return self.to_json().__str__()
 
 
 class ModrinthVersionFile:
     """Versions can contain multiple files.
 
+    Only the fields the manager uses are kept, with the version's files
+    reduced to their interned sha1s. Like projects, lookups hand out one
+    shared object per version.
+
     Args:
         version_file_json (dict): The json-encoded content that corresponds to
         a version file.
+        keep_json (bool, optional): Keep version_file_json for to_json.
+        Defaults to False.
     """
 
-    def __init__(self, version_file_json: dict) -> None:
-        self._dict: dict = version_file_json
+    __slots__ = (
+        "id",
+        "name",
+        "version_number",
+        "project_id",
+        "date_published",
+        "sha1s",
+        "_json",
+        "__weakref__",
+    )
+
+    def __init__(self, version_file_json: dict, keep_json: bool = False) -> None:
+        self._json: Optional[dict] = None
+        self._load(version_file_json, keep_json)
+
+    def _load(self, version_file_json: dict, keep_json: bool) -> None:
+        self.id: str = sys.intern(version_file_json["id"])
         self.name: str = version_file_json["name"]
         self.version_number: str = version_file_json["version_number"]
-        self.id: str = version_file_json["id"]
-        self.project_id: str = version_file_json["project_id"]
-        self.files: list[dict] = version_file_json["files"]
+        self.project_id: str = sys.intern(version_file_json["project_id"])
+        self.date_published: Optional[str] = version_file_json.get("date_published")
+        self.sha1s: tuple[str, ...] = tuple(
+            sys.intern(file["hashes"]["sha1"])
+            for file in version_file_json["files"]
+            if "sha1" in file.get("hashes", {})
+        )
+        if keep_json:
+            self._json = version_file_json
+
+    def to_json(self) -> dict:
+        """Gets the json the version was built from if it was kept, otherwise
+        the fields that were."""
+        if self._json is not None:
+            return self._json
+        return {
+            "id": self.id,
+            "name": self.name,
+            "version_number": self.version_number,
+            "project_id": self.project_id,
+            "date_published": self.date_published,
+            "files": [{"hashes": {"sha1": sha1}} for sha1 in self.sha1s],
+        }
 
     def __str__(self) -> str:
-        return self._dict.__str__()
+        return self.to_json().__str__()
+
+
+_Model = TypeVar("_Model", ModrinthProject, ModrinthVersionFile)
+
+# Every project and version built from a lookup, for as long as anything
+# still uses it. Looking one up again refreshes the shared object in place.
+_shared_projects: weakref.WeakValueDictionary[str, ModrinthProject] = (
+    weakref.WeakValueDictionary()
+)
+_shared_version_files: weakref.WeakValueDictionary[str, ModrinthVersionFile] = (
+    weakref.WeakValueDictionary()
+)
+_shared_lock = threading.Lock()
+
+
+def _share(
+    shared: weakref.WeakValueDictionary[str, _Model],
+    model: type[_Model],
+    model_json: dict,
+) -> _Model:
+    with _shared_lock:
+        existing = shared.get(model_json["id"])
+        if existing is not None:
+            existing._load(model_json, existing._json is not None)
+            return existing
+        created = model(model_json)
+        shared[created.id] = created
+        return created
 
 
 def _make_get_request(
@@ -61,24 +538,27 @@ def _make_get_request(
     q_params: str = ""
     for key in query_parameters.keys():
         q_params = f"{q_params}?{key}={query_parameters.get(key)}"
-    logging.debug(f"{_api_url}/{route}/{path_parameters}{q_params}")
+    api_url = get_client().api_url
+    logging.debug(f"{api_url}/{route}/{path_parameters}{q_params}")
 
-    request_url: str = f"{_api_url}/{route}"
+    request_url: str = f"{api_url}/{route}"
     if path_parameters != "":
         request_url = request_url + f"/{path_parameters}"
 
-    request: requests.Response = requests.get(
-        url=request_url, headers=_default_header, params=query_parameters, data=data
+    request: requests.Response = get_client().request(
+        "GET", request_url, params=query_parameters, data=data or None
     )
-    request.raise_for_status()
 
     return request.json()
 
 
-def _make_get_request_without_percent_encoding(
-    route: str, path_parameters: str = "", query_parameters: dict = {}, data: str = ""
-) -> list[dict]:
-    request_url: str = f"{_api_url}/{route}"
+def _send_get_request_without_percent_encoding(
+    route: str,
+    path_parameters: str = "",
+    query_parameters: dict = {},
+    headers: dict = {},
+) -> requests.Response:
+    request_url: str = f"{get_client().api_url}/{route}"
     if path_parameters != "":
         request_url = request_url + f"/{path_parameters}"
 
@@ -87,27 +567,187 @@ def _make_get_request_without_percent_encoding(
         q_params += f"?{str(key)}={str(query_parameters[key])}"
     q_params = q_params.replace("'", '"')
 
-    s = requests.Session()
-    req = requests.Request("GET", request_url)
-    p = req.prepare()
-    assert isinstance(p.url, str)
-    p.url += q_params
+    return get_client().request(
+        "GET", request_url, headers=headers, raw_query=q_params
+    )
+
+
+def _make_get_request_without_percent_encoding(
+    route: str, path_parameters: str = "", query_parameters: dict = {}, data: str = ""
+) -> list[dict]:
+    return _send_get_request_without_percent_encoding(
+        route, path_parameters, query_parameters
+    ).json()
+
+
+def _send_post_request(route: str, body: dict, headers: dict = {}) -> requests.Response:
 
-    response: requests.Response = s.send(p)
-    response.raise_for_status()
+    request_url: str = f"{get_client().api_url}/{route}"
 
-    return response.json()
+    return get_client().request("POST", request_url, json=body, headers=headers)
 
 
 def _make_post_request(route: str, body: dict) -> dict:
+    return _send_post_request(route, body).json()
 
-    request_url: str = f"{_api_url}/{route}"
 
-    request: requests.Response = requests.post(url=request_url, json=body)
+def set_metadata_cache(cache: Optional[MetadataCache]) -> None:
+    """Replaces the metadata cache used by the bulk lookup functions.
 
-    request.raise_for_status()
+    Args:
+        cache (Optional[MetadataCache]): The cache to use, or None to disable
+        caching and always go to the API.
+    """
+    global _metadata_cache, _metadata_cache_enabled
+    _metadata_cache = cache
+    _metadata_cache_enabled = cache is not None
 
-    return request.json()
+
+def get_metadata_cache() -> Optional[MetadataCache]:
+    """Gets the metadata cache, opening the default on-disk cache on first use.
+
+    Returns:
+        Optional[MetadataCache]: The cache, or None if caching is disabled.
+    """
+    global _metadata_cache
+    if _metadata_cache is None and _metadata_cache_enabled:
+        _metadata_cache = MetadataCache()
+    return _metadata_cache
+
+
+# Fetches the payloads for the given keys. GET fetchers send the given ETag as
+# If-None-Match and return None as the payloads when the server answered 304.
+# The API ignores If-None-Match on POST, so POST fetchers ignore the ETag and
+# never return one.
+_Fetcher: TypeAlias = Callable[
+    [list[str], Optional[str]], tuple[Optional[dict[str, dict]], Optional[str]]
+]
+
+
+def _chunks(keys: list[str], chunk_size: int) -> list[list[str]]:
+    return [keys[start : start + chunk_size] for start in range(0, len(keys), chunk_size)]
+
+
+_LookupJob: TypeAlias = tuple[list[str], bool]
+
+
+def _prepare_lookup(
+    kind: str,
+    keys: list[str],
+    fetch: _Fetcher,
+    chunk_size: int,
+    aliases: Callable[[dict], list[str]] = lambda payload: [],
+) -> tuple[
+    dict[str, dict], list[_LookupJob], Callable[[list[str], bool], dict[str, dict]]
+]:
+    # Splits a lookup into the payloads the cache already has, and the chunked
+    # requests still needed along with a function that runs one of them.
+    cache = get_metadata_cache()
+    fresh: dict[str, dict] = {}
+    stale: dict[str, dict] = {}
+    unknown: set[str] = set()
+    if cache is not None:
+        fresh, stale, unknown = cache.lookup(kind, keys)
+
+    def fetch_and_store(request_keys: list[str], revalidating: bool) -> dict[str, dict]:
+        with span(
+            f"fetch {kind}", "api", keys=len(request_keys), revalidating=revalidating
+        ) as current:
+            payloads = _fetch_and_store(request_keys, revalidating)
+            current.set(found=len(payloads))
+            return payloads
+
+    def _fetch_and_store(
+        request_keys: list[str], revalidating: bool
+    ) -> dict[str, dict]:
+        if cache is None:
+            return cast(dict[str, dict], fetch(request_keys, None)[0])
+
+        request_key = (
+            f"{kind}:"
+            + hashlib.sha1("\n".join(sorted(request_keys)).encode()).hexdigest()
+        )
+        etag = cache.get_etag(request_key) if revalidating else None
+        payloads, new_etag = fetch(request_keys, etag)
+        if payloads is None:
+            logging.debug(f"{kind} cache revalidated {len(request_keys)} entries")
+            cache.touch(kind, request_keys)
+            return {key: stale[key] for key in request_keys}
+
+        entries: dict[str, dict] = dict(payloads)
+        for payload in payloads.values():
+            entries.update({alias: payload for alias in aliases(payload)})
+        cache.store(kind, entries)
+        # Keys Modrinth doesn't know, such as jars from elsewhere, would
+        # otherwise be sent again on every lookup.
+        cache.store_unknown(kind, [key for key in request_keys if key not in entries])
+        cache.set_etag(request_key, new_etag)
+        return payloads
+
+    # Stale chunks are sorted so the same set of keys maps onto the same
+    # requests, and therefore the same ETags, from one run to the next.
+    missing = [
+        key
+        for key in keys
+        if key not in fresh and key not in stale and key not in unknown
+    ]
+    jobs: list[_LookupJob] = [
+        (chunk, True) for chunk in _chunks(sorted(stale), chunk_size)
+    ] + [(chunk, False) for chunk in _chunks(missing, chunk_size)]
+
+    return dict(fresh), jobs, fetch_and_store
+
+
+def _cached_lookup(
+    kind: str,
+    keys: list[str],
+    fetch: _Fetcher,
+    chunk_size: int,
+    aliases: Callable[[dict], list[str]] = lambda payload: [],
+) -> dict[str, dict]:
+    with span(f"lookup {kind}", "api", keys=len(keys)) as current:
+        results, jobs, fetch_and_store = _prepare_lookup(
+            kind, keys, fetch, chunk_size, aliases
+        )
+        current.set(cache_hits=len(results), requests=len(jobs))
+
+        if len(jobs) == 1:
+            results.update(fetch_and_store(*jobs[0]))
+        elif jobs:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=get_client().max_workers
+            ) as executor:
+                for payloads in executor.map(lambda job: fetch_and_store(*job), jobs):
+                    results.update(payloads)
+
+        return results
+
+
+async def _cached_lookup_async(
+    kind: str,
+    keys: list[str],
+    fetch: _Fetcher,
+    chunk_size: int,
+    aliases: Callable[[dict], list[str]] = lambda payload: [],
+) -> dict[str, dict]:
+    with span(f"lookup {kind}", "api", keys=len(keys)) as current:
+        results, jobs, fetch_and_store = await asyncio.to_thread(
+            _prepare_lookup, kind, keys, fetch, chunk_size, aliases
+        )
+        current.set(cache_hits=len(results), requests=len(jobs))
+
+        # Chunks are only handed to a thread once a slot is free, so
+        # cancelling the lookup drops every chunk that hasn't started yet.
+        slots = asyncio.Semaphore(get_client().max_workers)
+
+        async def run(job: _LookupJob) -> dict[str, dict]:
+            async with slots:
+                return await asyncio.to_thread(fetch_and_store, *job)
+
+        for payloads in await asyncio.gather(*[run(job) for job in jobs]):
+            results.update(payloads)
+
+        return results
 
 
 def get_project(id: str) -> ModrinthProject:
@@ -123,12 +763,51 @@ def get_project(id: str) -> ModrinthProject:
         HTTPError: A non-successful HTTP code was returned while attemping
         to get the project.
     """
-    return ModrinthProject(_make_get_request(route="project", path_parameters=id))
+    return _share(
+        _shared_projects,
+        ModrinthProject,
+        _make_get_request(route="project", path_parameters=id),
+    )
 
 
 ModrinthProjectId: TypeAlias = str
 
 
+def _fetch_projects(
+    request_ids: list[str], etag: Optional[str]
+) -> tuple[Optional[dict[str, dict]], Optional[str]]:
+    response = _send_get_request_without_percent_encoding(
+        route="projects",
+        query_parameters={"ids": str(request_ids)},
+        headers={} if etag is None else {"if-none-match": etag},
+    )
+    if response.status_code == 304:
+        return None, etag
+    with span("json decode", "json", bytes=len(response.content)):
+        projects_json: list[dict] = response.json()
+    return {
+        project_json["id"]: project_json for project_json in projects_json
+    }, response.headers.get("etag")
+
+
+def build_projects(projects_json: dict[str, dict]) -> dict[str, ModrinthProject]:
+    """Builds projects from their json without a request, sharing one object
+    per project id with every other lookup.
+
+    Args:
+        projects_json (dict[str, dict]): Json-encoded projects by id.
+
+    Returns:
+        dict[str, ModrinthProject]: The projects by id.
+    """
+    projects: dict[str, ModrinthProject] = {}
+    for project_json in projects_json.values():
+        project = _share(_shared_projects, ModrinthProject, project_json)
+        projects.update({project.id: project})
+
+    return projects
+
+
 def get_projects(ids: list[str]) -> dict[ModrinthProjectId, ModrinthProject]:
     """Gets a list of project objects.
 
@@ -138,21 +817,38 @@ def get_projects(ids: list[str]) -> dict[ModrinthProjectId, ModrinthProject]:
     Returns:
         dict[ModrinthProjectId, ModrinthProject]: The projects corresponding
         to the given id list argument identified by the projects' id property.
+        Cached projects are returned without a request, the rest are fetched
+        concurrently in chunks of the client's ids_per_request.
 
     Raises:
         HTTPError: A non-successful HTTP code was returned while attemping
         to get projects.
     """
-    projects_json: list = _make_get_request_without_percent_encoding(
-        route="projects", query_parameters={"ids": str(ids)}
+
+    projects_json = _cached_lookup(
+        MetadataCache.PROJECT,
+        list(dict.fromkeys(ids)),
+        _fetch_projects,
+        chunk_size=get_client().ids_per_request,
     )
+    return build_projects(projects_json)
 
-    projects: dict[str, ModrinthProject] = {}
-    for project_json in projects_json:
-        project = ModrinthProject(project_json)
-        projects.update({project.id: project})
 
-    return projects
+async def get_projects_async(
+    ids: list[str],
+) -> dict[ModrinthProjectId, ModrinthProject]:
+    """Gets a list of project objects without blocking the event loop.
+
+    Behaves like get_projects. Cancelling the returned coroutine stops any
+    chunks that haven't been requested yet.
+    """
+    projects_json = await _cached_lookup_async(
+        MetadataCache.PROJECT,
+        list(dict.fromkeys(ids)),
+        _fetch_projects,
+        chunk_size=get_client().ids_per_request,
+    )
+    return build_projects(projects_json)
 
 
 def get_version_file_from_hash(
@@ -169,18 +865,74 @@ def get_version_file_from_hash(
     Returns:
         ModrinthVersionFile: A version file object
     """
-    return ModrinthVersionFile(
+    return _share(
+        _shared_version_files,
+        ModrinthVersionFile,
         _make_get_request(
             "version_file",
             path_parameters=hash,
             query_parameters={"algorithm": algorithm},
-        )
+        ),
     )
 
 
 ModrinthVersionId: TypeAlias = str
 
 
+def _version_file_aliases(version_file_json: dict) -> list[str]:
+    # A version file can be looked up by the sha1 or sha512 of any of its files.
+    aliases: list[str] = []
+    for file in version_file_json.get("files", []):
+        for algorithm in ("sha1", "sha512"):
+            if algorithm in file.get("hashes", {}):
+                aliases.append(
+                    MetadataCache.version_file_key(file["hashes"][algorithm], algorithm)
+                )
+    return aliases
+
+
+def _version_files_fetcher(algorithm: str) -> _Fetcher:
+    def fetch(
+        keys: list[str], etag: Optional[str]
+    ) -> tuple[Optional[dict[str, dict]], Optional[str]]:
+        request_body = {
+            "hashes": [key.split(":", 1)[1] for key in keys],
+            "algorithm": algorithm,
+        }
+        response = _send_post_request("version_files", body=request_body)
+        with span("json decode", "json", bytes=len(response.content)):
+            version_files_json: dict[str, dict] = response.json()
+        return {
+            MetadataCache.version_file_key(hash, algorithm): version_file_json
+            for hash, version_file_json in version_files_json.items()
+        }, None
+
+    return fetch
+
+
+def build_version_files(
+    version_files_json: dict[str, dict]
+) -> dict[str, ModrinthVersionFile]:
+    """Builds version files from their json without a request, sharing one
+    object per version id with every other lookup.
+
+    Args:
+        version_files_json (dict[str, dict]): Json-encoded version files by
+        version id.
+
+    Returns:
+        dict[str, ModrinthVersionFile]: The version files by version id.
+    """
+    version_files: dict[str, ModrinthVersionFile] = {}
+    for version_file_json in version_files_json.values():
+        version: ModrinthVersionFile = _share(
+            _shared_version_files, ModrinthVersionFile, version_file_json
+        )
+        version_files.update({version.id: version})
+
+    return version_files
+
+
 def get_version_files_from_hashes(
     hashes: list[str], algorithm: str = "sha1"
 ) -> dict[ModrinthVersionId, ModrinthVersionFile]:
@@ -195,15 +947,97 @@ def get_version_files_from_hashes(
     Returns:
         dict[ModrinthVersionId, ModrinthVersionFile]: The version files
         corresponding to the given list of hashes identified by their unique
-        version file ID.
+        version file ID. Cached version files are returned without a request,
+        the rest are fetched concurrently in chunks of the client's
+        hashes_per_request.
     """
+    version_files_json = _cached_lookup(
+        MetadataCache.VERSION_FILE,
+        [MetadataCache.version_file_key(hash, algorithm) for hash in hashes],
+        _version_files_fetcher(algorithm),
+        chunk_size=get_client().hashes_per_request,
+        aliases=_version_file_aliases,
+    )
+    return build_version_files(version_files_json)
 
-    version_files: dict[str, ModrinthVersionFile] = {}
-    request_body = {"hashes": hashes, "algorithm": algorithm}
-    version_files_json: dict = _make_post_request("version_files", body=request_body)
 
-    for version_file_json in version_files_json.values():
-        version: ModrinthVersionFile = ModrinthVersionFile(version_file_json)
-        version_files.update({version.id: version})
+async def get_version_files_from_hashes_async(
+    hashes: list[str], algorithm: str = "sha1"
+) -> dict[ModrinthVersionId, ModrinthVersionFile]:
+    """Gets version files from a list of hash identifiers without blocking the
+    event loop.
 
-    return version_files
+    Behaves like get_version_files_from_hashes. Cancelling the returned
+    coroutine stops any chunks that haven't been requested yet.
+    """
+    version_files_json = await _cached_lookup_async(
+        MetadataCache.VERSION_FILE,
+        [MetadataCache.version_file_key(hash, algorithm) for hash in hashes],
+        _version_files_fetcher(algorithm),
+        chunk_size=get_client().hashes_per_request,
+        aliases=_version_file_aliases,
+    )
+    return build_version_files(version_files_json)
+
+
+def _version_updates_fetcher(
+    algorithm: str, loaders: list[str], game_versions: list[str]
+) -> _Fetcher:
+    def fetch(
+        keys: list[str], etag: Optional[str]
+    ) -> tuple[Optional[dict[str, dict]], Optional[str]]:
+        hashes = [key.rsplit(":", 1)[1] for key in keys]
+        request_body = {
+            "hashes": hashes,
+            "algorithm": algorithm,
+            "loaders": loaders,
+            "game_versions": game_versions,
+        }
+        response = _send_post_request("version_files/update", body=request_body)
+        with span("json decode", "json", bytes=len(response.content)):
+            versions_json: dict[str, dict] = response.json()
+        return {
+            key: versions_json[hash]
+            for key, hash in zip(keys, hashes)
+            if hash in versions_json
+        }, None
+
+    return fetch
+
+
+def get_latest_versions_from_hashes(
+    hashes: list[str],
+    loaders: list[str],
+    game_versions: list[str],
+    algorithm: str = "sha1",
+) -> dict[str, ModrinthVersionFile]:
+    """Gets the newest version that runs on the given loaders and game
+    versions of the project each hash belongs to.
+
+    Args:
+        hashes (list[str]): Hashes of files in the current versions.
+        loaders (list[str]): Loaders the versions must support, like "fabric".
+        game_versions (list[str]): Game versions the versions must support.
+        algorithm (str, optional): The hash format of the hashes. Defaults to
+        "sha1".
+
+    Returns:
+        dict[str, ModrinthVersionFile]: The newest version for each hash
+        Modrinth knows, which is the hash's own version if it is the newest.
+        The versions keep their json so their files can be read, and are
+        fetched in chunks of the client's hashes_per_request and cached.
+    """
+    keys = {
+        MetadataCache.version_update_key(hash, loaders, game_versions, algorithm): hash
+        for hash in hashes
+    }
+    versions_json = _cached_lookup(
+        MetadataCache.VERSION_UPDATE,
+        list(keys),
+        _version_updates_fetcher(algorithm, loaders, game_versions),
+        chunk_size=get_client().hashes_per_request,
+    )
+    return {
+        keys[key]: ModrinthVersionFile(version_json, keep_json=True)
+        for key, version_json in versions_json.items()
+    }
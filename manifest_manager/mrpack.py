@@ -1,10 +1,70 @@
+from __future__ import annotations
+
+import os
 import pathlib
-from typing import Optional
-import zipfile
-import tempfile
 import shutil
+import struct
+from contextlib import contextmanager
+from typing import IO, TYPE_CHECKING, BinaryIO, Iterator, Optional
 import json
 
+from tracing import Span, span
+
+# zipfile is only imported once a pack is opened, so the app can draw its
+# first frame without it.
+if TYPE_CHECKING:
+    import zipfile
+
+_copy_buffer_size = 1024 * 1024
+_zip64_extra_id = 0x0001
+_data_descriptor_flag = 0x08
+
+# The zip local file header, from APPNOTE.TXT section 4.3.7: signature,
+# version needed (2 bytes), flags, method, time, date, crc-32, compressed
+# size, uncompressed size, file name length and extra field length.
+_local_file_header = struct.Struct("<4s2B4HL2L2H")
+_local_file_header_signature = b"PK\x03\x04"
+_lfh_filename_length = 10
+_lfh_extra_length = 11
+
+
+def _can_append_raw(archive: zipfile.ZipFile) -> bool:
+    # zipfile has no public way to add a member whose data is already
+    # compressed. _append_raw updates the archive's bookkeeping the way
+    # ZipFile.open(.., "w") does on close, which has been the same from
+    # Python 3.10 through 3.12; anywhere else members are compressed again.
+    import sys
+
+    return (
+        (3, 10) <= sys.version_info[:2] <= (3, 12)
+        and archive.mode == "w"
+        and hasattr(archive, "_didModify")
+    )
+
+
+def _append_raw(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> None:
+    # Records a member written straight to archive.fp, so it is listed in the
+    # central directory when the archive is closed. Only called once
+    # _can_append_raw has checked the private attribute exists.
+    assert archive.fp is not None
+    archive.filelist.append(info)
+    archive.NameToInfo[info.filename] = info
+    archive.start_dir = archive.fp.tell()
+    setattr(archive, "_didModify", True)
+
+
+def _strip_zip64_extra(extra: bytes) -> bytes:
+    # FileHeader appends its own zip64 field when one is needed, so any zip64
+    # field carried over from the source archive has to go.
+    stripped = b""
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, length = struct.unpack("<HH", extra[offset : offset + 4])
+        if header_id != _zip64_extra_id:
+            stripped += extra[offset : offset + 4 + length]
+        offset += 4 + length
+    return stripped
+
 
 class MrPack:
     def __init__(self, path: pathlib.Path | str) -> None:
@@ -12,16 +72,105 @@ class MrPack:
             path if isinstance(path, pathlib.Path) else pathlib.Path(path)
         )
 
-    def _get_extracted_files(self) -> dict[zipfile.ZipInfo, str]:
-        extracted_files: dict[zipfile.ZipInfo, str] = {}
+    @contextmanager
+    def open_manifest(self) -> Iterator[IO[bytes]]:
+        """Opens the pack's modrinth.index.json for reading as a stream, see
+        manifest_stream.ManifestReader.
+
+        Yields:
+            IO[bytes]: The index's decompressed bytes.
+        """
+        import zipfile
 
         with zipfile.ZipFile(self.path, "r") as manifest_archive:
-            with tempfile.TemporaryDirectory() as tmpdirname:
-                for member_info in manifest_archive.infolist():
-                    file_content = manifest_archive.extract(member_info, tmpdirname)
-                    extracted_files.update({member_info: file_content})
+            with manifest_archive.open("modrinth.index.json") as manifest_file:
+                yield manifest_file
+
+    def read_manifest(self) -> dict:
+        """Reads the pack's modrinth.index.json.
+
+        Returns:
+            dict: The json-encoded manifest.
+        """
+        import zipfile
 
-                return extracted_files
+        with span("mrpack read manifest", "io", path=str(self.path)) as current:
+            with zipfile.ZipFile(self.path, "r") as manifest_archive:
+                with manifest_archive.open("modrinth.index.json") as manifest_file:
+                    content = manifest_file.read()
+            current.set(bytes=len(content))
+            with span("json decode", "json", bytes=len(content)):
+                return json.loads(content)
+
+    @staticmethod
+    def _copy_raw_member(
+        source: BinaryIO,
+        source_archive: zipfile.ZipFile,
+        member_info: zipfile.ZipInfo,
+        archive: zipfile.ZipFile,
+    ) -> None:
+        # Copies a member's compressed bytes as they are, so overrides are
+        # never inflated and deflated again.
+        import zipfile
+
+        copied_info = zipfile.ZipInfo(member_info.filename, member_info.date_time)
+        copied_info.compress_type = member_info.compress_type
+        copied_info.comment = member_info.comment
+        copied_info.extra = _strip_zip64_extra(member_info.extra)
+        copied_info.create_system = member_info.create_system
+        copied_info.create_version = member_info.create_version
+        copied_info.extract_version = member_info.extract_version
+        copied_info.external_attr = member_info.external_attr
+        copied_info.internal_attr = member_info.internal_attr
+
+        if not _can_append_raw(archive):
+            # Without the bookkeeping _append_raw relies on, the member goes
+            # through the public API and is compressed again.
+            zip64 = member_info.file_size > zipfile.ZIP64_LIMIT
+            with source_archive.open(member_info) as member, archive.open(
+                copied_info, "w", force_zip64=zip64
+            ) as target:
+                shutil.copyfileobj(member, target, _copy_buffer_size)
+            return
+
+        source.seek(member_info.header_offset)
+        local_header = _local_file_header.unpack(
+            source.read(_local_file_header.size)
+        )
+        if local_header[0] != _local_file_header_signature:
+            raise zipfile.BadZipFile(
+                f"Bad local header for member {member_info.filename} in archive"
+            )
+        source.seek(
+            local_header[_lfh_filename_length] + local_header[_lfh_extra_length],
+            os.SEEK_CUR,
+        )
+
+        copied_info.CRC = member_info.CRC
+        copied_info.compress_size = member_info.compress_size
+        copied_info.file_size = member_info.file_size
+        # Sizes are known up front, so no data descriptor follows the data.
+        copied_info.flag_bits = member_info.flag_bits & ~_data_descriptor_flag
+
+        assert archive.fp is not None
+        zip64 = (
+            copied_info.file_size > zipfile.ZIP64_LIMIT
+            or copied_info.compress_size > zipfile.ZIP64_LIMIT
+        )
+        copied_info.header_offset = archive.fp.tell()
+        archive.fp.write(copied_info.FileHeader(zip64))
+
+        remaining = copied_info.compress_size
+        while remaining > 0:
+            chunk = source.read(min(_copy_buffer_size, remaining))
+            if not chunk:
+                raise zipfile.BadZipFile(
+                    f"Truncated member {member_info.filename} in archive"
+                )
+            archive.fp.write(chunk)
+            remaining -= len(chunk)
+
+        _append_raw(archive, copied_info)
 
     def copy_manifest(
         self, src_manifest: dict, new_pack_dest: Optional[pathlib.Path | str] = None
@@ -29,6 +178,13 @@ class MrPack:
         """Copies a manifest dictionary into MrPack's manifest file, replacing the existing manifest file. If given a
         new pack destination instead creates a new .mrpack archive.
 
+        Every other member is kept, including the client-overrides/ and
+        server-overrides/ folders and files outside any override folder,
+        where earlier versions kept only overrides/. Members are streamed
+        across without being decompressed, and the new archive is written
+        next to the destination and renamed into place so it is never left
+        half written.
+
         Args:
             src_manifest (dict): A new manifest dictionary to write into file.
             new_pack_dest (Optional[pathlib.Path  |  str], optional): New pack destination. Defaults to None.
@@ -42,18 +198,98 @@ class MrPack:
                 else pathlib.Path(new_pack_dest)
             )
 
-        with tempfile.TemporaryDirectory() as tmpdirname:
-            tmp_archive = pathlib.Path(tmpdirname).joinpath("tmparchive")
-            with zipfile.ZipFile(tmp_archive, "x") as archive:
-                for zip_info, file_content in self._get_extracted_files().items():
-                    if zip_info.filename.startswith("overrides/"):
-                        archive.writestr(zip_info, file_content)
+        with span("mrpack copy manifest", "io", path=str(new_pack_dest)) as current:
+            self._copy_manifest(src_manifest, new_pack_dest, current)
 
-                archive.writestr(
-                    "modrinth.index.json", json.dumps(src_manifest, indent=4)
-                )
+    def _copy_manifest(
+        self, src_manifest: dict, new_pack_dest: pathlib.Path, current: Span
+    ) -> None:
+        import tempfile
+        import zipfile
 
-            shutil.copy2(
-                tmp_archive,
-                new_pack_dest,
+        tmp_fd, tmp_name = tempfile.mkstemp(
+            dir=new_pack_dest.parent, prefix=f".{new_pack_dest.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(tmp_fd, "wb") as tmp_file:
+                with open(self.path, "rb") as source, zipfile.ZipFile(
+                    source, "r"
+                ) as source_archive, zipfile.ZipFile(tmp_file, "w") as archive:
+                    copied_bytes = 0
+                    for member_info in source_archive.infolist():
+                        if member_info.filename == "modrinth.index.json":
+                            continue
+                        self._copy_raw_member(
+                            source, source_archive, member_info, archive
+                        )
+                        copied_bytes += member_info.compress_size
+                    current.set(
+                        members=len(archive.filelist), copied_bytes=copied_bytes
+                    )
+
+                    archive.writestr(
+                        "modrinth.index.json",
+                        json.dumps(src_manifest, indent=4),
+                        compress_type=zipfile.ZIP_DEFLATED,
+                    )
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+
+            shutil.copymode(
+                new_pack_dest if new_pack_dest.exists() else self.path, tmp_name
             )
+            os.replace(tmp_name, new_pack_dest)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def extract_overrides(
+        self, instance_dir: pathlib.Path | str, side: Optional[str] = None
+    ) -> list[str]:
+        """Unpacks the pack's overrides into an instance directory.
+
+        The shared overrides/ folder is unpacked first, then the side specific
+        client-overrides/ or server-overrides/ folder on top of it.
+
+        Args:
+            instance_dir (pathlib.Path | str): The instance's root directory.
+            side (Optional[str], optional): Either "client" or "server".
+            Defaults to None, which only unpacks the shared overrides.
+
+        Returns:
+            list[str]: The instance relative paths of the unpacked files.
+
+        Raises:
+            ValueError: A member would be unpacked outside the instance.
+        """
+        import zipfile
+
+        instance_dir = pathlib.Path(instance_dir)
+        prefixes = ["overrides/"] + ([f"{side}-overrides/"] if side else [])
+        extracted: list[str] = []
+        with zipfile.ZipFile(self.path, "r") as archive:
+            members = archive.infolist()
+            for prefix in prefixes:
+                for member_info in members:
+                    if member_info.is_dir() or not member_info.filename.startswith(
+                        prefix
+                    ):
+                        continue
+                    relative = pathlib.PurePosixPath(
+                        member_info.filename.removeprefix(prefix)
+                    )
+                    if relative.is_absolute() or ".." in relative.parts:
+                        raise ValueError(
+                            f"{member_info.filename} would be unpacked outside the instance"
+                        )
+                    destination = instance_dir.joinpath(*relative.parts)
+                    destination.parent.mkdir(parents=True, exist_ok=True)
+                    with archive.open(member_info) as source, open(
+                        destination, "wb"
+                    ) as target:
+                        shutil.copyfileobj(source, target, _copy_buffer_size)
+                    extracted.append(str(relative))
+        return extracted
@@ -0,0 +1,326 @@
+"""Finds .mrpack files in the background and remembers them between runs.
+
+Directories are walked with os.scandir, whose entries tell directories from
+files without a stat of their own on most platforms, so only the packs
+themselves are stat'ed. Each walk is limited in depth and skips directories
+such as .git or node_modules. Every pack found is kept in a SQLite index with
+its size, modification time and the name and versionId from its
+modrinth.index.json, which is only read again when the size or modification
+time changed. Searching the index is a single query, so picking a pack is
+instant even while a scan is still running.
+
+Usage:
+    from pack_index import get_pack_index
+
+    index = get_pack_index()
+    index.scan([pathlib.Path.home()])
+    for pack in index.search("fabric 1.20"):
+        print(pack.path, pack.name, pack.version_id)
+"""
+
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterable, Iterator, Optional
+
+from manifest_stream import ManifestReader
+from mrpack import MrPack
+from paths import user_cache_dir
+from tracing import span
+
+_default_max_depth = 6
+_default_search_limit = 50
+# Directories that are large and never hold packs worth listing.
+_default_excludes = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".svn",
+        ".cache",
+        ".venv",
+        "venv",
+        "node_modules",
+        "__pycache__",
+        ".Trash",
+    }
+)
+# Scanned packs are written to the index this many at a time.
+_commit_batch = 100
+
+
+class IndexedPack:
+    """A pack found by a scan.
+
+    Attributes:
+        path (pathlib.Path): Where the pack is.
+        size (int): The pack's size in bytes.
+        mtime_ns (int): The pack's modification time.
+        name (str): The name from the pack's index.
+        version_id (str): The versionId from the pack's index.
+    """
+
+    def __init__(
+        self, path: str, size: int, mtime_ns: int, name: str, version_id: str
+    ) -> None:
+        self.path: pathlib.Path = pathlib.Path(path)
+        self.size: int = size
+        self.mtime_ns: int = mtime_ns
+        self.name: str = name
+        self.version_id: str = version_id
+
+    def to_json(self) -> dict:
+        return {
+            "path": str(self.path),
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "name": self.name,
+            "versionId": self.version_id,
+        }
+
+
+def _walk_packs(
+    root: pathlib.Path,
+    max_depth: int,
+    excludes: frozenset[str],
+    is_cancelled: Callable[[], bool],
+) -> Iterator[os.DirEntry]:
+    # Yields the .mrpack entries under root. Symlinked directories aren't
+    # followed, so a link back up the tree can't loop the walk.
+    pending: list[tuple[str, int]] = [(str(root), 0)]
+    while pending and not is_cancelled():
+        directory, depth = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if depth < max_depth and entry.name not in excludes:
+                            pending.append((entry.path, depth + 1))
+                    elif entry.name.endswith(".mrpack") and entry.is_file():
+                        yield entry
+        except OSError:
+            continue
+
+
+def _read_header(path: str) -> dict:
+    # Only the fields before the files array are read, which is where
+    # name and versionId usually are.
+    with MrPack(path).open_manifest() as manifest_file:
+        return ManifestReader(manifest_file).read_header()
+
+
+class PackIndex:
+    """A SQLite backed index of the packs on this machine.
+
+    Args:
+        path (Optional[pathlib.Path | str], optional): Location of the
+        database file. Defaults to packs.sqlite3 in the user cache dir.
+    """
+
+    def __init__(self, path: Optional[pathlib.Path | str] = None) -> None:
+        if path is None:
+            path = user_cache_dir().joinpath("packs.sqlite3")
+        self.path: pathlib.Path = pathlib.Path(path)
+
+        self._lock = threading.Lock()
+        # Held for the whole of a scan of the root, see scan.
+        self._root_locks: dict[str, threading.Lock] = {}
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._connection:
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS packs (
+                    path TEXT PRIMARY KEY,
+                    root TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    version_id TEXT NOT NULL,
+                    error TEXT,
+                    seen_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS packs_root ON packs (root, seen_at);
+                """
+            )
+
+    def scan(
+        self,
+        roots: Iterable[pathlib.Path | str],
+        max_depth: int = _default_max_depth,
+        excludes: frozenset[str] = _default_excludes,
+        on_progress: Optional[Callable[[int], None]] = None,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+    ) -> int:
+        """Walks directories for packs and brings the index up to date.
+
+        Packs that are no longer under a scanned root are dropped from the
+        index. A pack whose size and modification time are unchanged isn't
+        opened again. Scans of the same root, from this or another thread,
+        run one after the other, so one can't drop the packs another has
+        just marked as seen.
+
+        Args:
+            roots (Iterable[pathlib.Path | str]): Directories to walk.
+            max_depth (int, optional): Levels of subdirectories to descend.
+            excludes (frozenset[str], optional): Names of directories to skip.
+            on_progress (Optional[Callable[[int], None]], optional): Called
+            with the number of packs found so far each time a batch of them
+            has been written to the index.
+            is_cancelled (Optional[Callable[[], bool]], optional): Checked
+            between directories and packs. Once it returns True the scan
+            stops, keeping what it wrote but dropping nothing, since the walk
+            was incomplete.
+
+        Returns:
+            int: The number of packs found.
+        """
+        cancelled = is_cancelled or (lambda: False)
+        found = 0
+        for root in roots:
+            root = str(pathlib.Path(root).resolve())
+            with self._lock:
+                root_lock = self._root_locks.setdefault(root, threading.Lock())
+            with root_lock, span("pack scan", "io", root=root) as current:
+                started = time.time()
+                with self._lock:
+                    known: dict[str, tuple[int, int]] = {
+                        path: (size, mtime_ns)
+                        for path, size, mtime_ns in self._connection.execute(
+                            "SELECT path, size, mtime_ns FROM packs WHERE root = ?",
+                            (root,),
+                        )
+                    }
+
+                seen: list[tuple[float, str]] = []
+                changed: list[tuple] = []
+                for entry in _walk_packs(
+                    pathlib.Path(root), max_depth, excludes, cancelled
+                ):
+                    if cancelled():
+                        break
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    found += 1
+                    if known.get(entry.path) == (stat.st_size, stat.st_mtime_ns):
+                        seen.append((started, entry.path))
+                    else:
+                        changed.append(
+                            self._describe(entry.path, root, stat, started)
+                        )
+                    if len(seen) + len(changed) >= _commit_batch:
+                        self._write(seen, changed)
+                        seen, changed = [], []
+                        if on_progress is not None:
+                            on_progress(found)
+                self._write(seen, changed)
+                if cancelled():
+                    current.set(packs=found, cancelled=True)
+                    return found
+
+                with self._lock, self._connection:
+                    removed = self._connection.execute(
+                        "DELETE FROM packs WHERE root = ? AND seen_at < ?",
+                        (root, started),
+                    ).rowcount
+                current.set(packs=found, removed=removed)
+            if on_progress is not None:
+                on_progress(found)
+        return found
+
+    @staticmethod
+    def _describe(
+        path: str, root: str, stat: os.stat_result, seen_at: float
+    ) -> tuple:
+        name = version_id = ""
+        error: Optional[str] = None
+        try:
+            header = _read_header(path)
+            name = str(header.get("name", ""))
+            version_id = str(header.get("versionId", ""))
+        except Exception as read_error:
+            error = str(read_error)
+        return (
+            path,
+            root,
+            stat.st_size,
+            stat.st_mtime_ns,
+            name,
+            version_id,
+            error,
+            seen_at,
+        )
+
+    def _write(self, seen: list[tuple[float, str]], changed: list[tuple]) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "UPDATE packs SET seen_at = ? WHERE path = ?", seen
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO packs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", changed
+            )
+
+    def search(
+        self, query: str = "", limit: int = _default_search_limit
+    ) -> list[IndexedPack]:
+        """Finds indexed packs, most recently modified first.
+
+        Args:
+            query (str, optional): Words that must each appear in a pack's
+            path, name or versionId, ignoring case. Defaults to every pack.
+            limit (int, optional): The most packs returned.
+
+        Returns:
+            list[IndexedPack]: The matching packs that could be read.
+        """
+        conditions = ["error IS NULL"]
+        parameters: list = []
+        for word in query.split():
+            conditions.append(
+                "(path LIKE ? ESCAPE '\\' OR name LIKE ? ESCAPE '\\'"
+                " OR version_id LIKE ? ESCAPE '\\')"
+            )
+            pattern = "%{}%".format(
+                word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            )
+            parameters += [pattern, pattern, pattern]
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT path, size, mtime_ns, name, version_id FROM packs "
+                f"WHERE {' AND '.join(conditions)} ORDER BY mtime_ns DESC LIMIT ?",
+                (*parameters, limit),
+            ).fetchall()
+        return [IndexedPack(*row) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM packs WHERE error IS NULL"
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+_pack_index: Optional[PackIndex] = None
+_pack_index_lock = threading.Lock()
+
+
+def set_pack_index(pack_index: Optional[PackIndex]) -> None:
+    """Replaces the shared pack index, for example with one in a temporary
+    directory."""
+    global _pack_index
+    with _pack_index_lock:
+        _pack_index = pack_index
+
+
+def get_pack_index() -> PackIndex:
+    """Gets the shared pack index, opening the default on-disk index on first
+    use."""
+    global _pack_index
+    with _pack_index_lock:
+        if _pack_index is None:
+            _pack_index = PackIndex()
+        return _pack_index
@@ -0,0 +1,39 @@
+"""Locates the per-user directories where manifest manager keeps state.
+
+The cache directory can be overridden with the MANIFEST_MANAGER_CACHE_DIR
+environment variable, which is useful for CI boxes that want a shared or
+throwaway location.
+"""
+
+import os
+import pathlib
+import sys
+
+_app_name = "manifest-manager"
+_cache_dir_env = "MANIFEST_MANAGER_CACHE_DIR"
+
+
+def user_cache_dir() -> pathlib.Path:
+    """Gets the platform appropriate cache directory, creating it if needed.
+
+    Returns:
+        pathlib.Path: The directory manifest manager should store caches in.
+    """
+    override = os.environ.get(_cache_dir_env)
+    if override:
+        cache_dir = pathlib.Path(override)
+    elif sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or pathlib.Path.home().joinpath(
+            "AppData", "Local"
+        )
+        cache_dir = pathlib.Path(base).joinpath(_app_name, "Cache")
+    elif sys.platform == "darwin":
+        cache_dir = pathlib.Path.home().joinpath("Library", "Caches", _app_name)
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or pathlib.Path.home().joinpath(
+            ".cache"
+        )
+        cache_dir = pathlib.Path(base).joinpath(_app_name)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
@@ -0,0 +1,151 @@
+"""Checks how long the app takes to draw its first frame.
+
+The app is started headless in a fresh interpreter several times, and the
+median time from launching the interpreter to the first refresh is compared
+with a budget. The check also fails if a networking or archive module was
+imported before the first frame, since those are meant to be deferred until
+a manifest is loaded. The exit code is 1 if either check fails, so it can run
+alongside the benchmarks in CI.
+
+Usage:
+    python startup_check.py
+    python startup_check.py --budget 0.8 --runs 9
+"""
+
+import argparse
+import json
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+from typing import Optional
+
+_default_budget = 1.0
+_default_runs = 5
+# Modules the app must not import before its first frame.
+_deferred_modules = (
+    "requests",
+    "urllib3",
+    "http.client",
+    "zipfile",
+    "tempfile",
+    "email.utils",
+)
+
+# Runs in the child interpreter. Modules the interpreter itself loaded before
+# the app, for example through a .pth file, are not held against the app.
+_child_source = """
+import importlib.util, json, sys, time
+started = time.perf_counter()
+preloaded = set(sys.modules)
+sys.path.insert(0, {directory!r})
+spec = importlib.util.spec_from_file_location(
+    "manifest_manager_app", {app_path!r}
+)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+
+
+class StartupApp(module.ManagerApp):
+    CSS_PATH = {css_path!r}
+
+    def on_mount(self) -> None:
+        self.call_after_refresh(self.report)
+
+    def report(self) -> None:
+        print(json.dumps({{
+            "import_seconds": imported - started,
+            "frame_seconds": time.perf_counter() - started,
+            "deferred": sorted(
+                name for name in {deferred!r}
+                if name in sys.modules and name not in preloaded
+            ),
+        }}), flush=True)
+        self.exit()
+
+
+StartupApp().run(headless=True)
+"""
+
+
+def measure_startup() -> dict:
+    """Starts the app once in a fresh interpreter.
+
+    Returns:
+        dict: The seconds spent importing the app, the seconds until its first
+        frame, both measured inside the interpreter, the wall time including
+        the interpreter's own startup and the deferred modules imported.
+    """
+    directory = pathlib.Path(__file__).parent.resolve()
+    source = _child_source.format(
+        directory=str(directory),
+        app_path=str(directory.joinpath("manifest-manager.py")),
+        css_path=str(directory.joinpath("manifest-manager.tcss")),
+        deferred=_deferred_modules,
+    )
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", source],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        cwd=directory,
+    )
+    assert process.stdout is not None
+    line = process.stdout.readline()
+    wall_seconds = time.perf_counter() - started
+    _, stderr = process.communicate()
+    if not line:
+        raise RuntimeError(f"The app exited before its first frame:\n{stderr}")
+    result: dict = json.loads(line)
+    result["wall_seconds"] = wall_seconds
+    return result
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Check the app's time to first frame against a budget."
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=_default_budget,
+        help="Allowed median seconds from launch to the first frame.",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=_default_runs,
+        help="Launches to take the median of.",
+    )
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    results = [measure_startup() for _ in range(args.runs)]
+
+    wall = statistics.median(result["wall_seconds"] for result in results)
+    frame = statistics.median(result["frame_seconds"] for result in results)
+    imports = statistics.median(result["import_seconds"] for result in results)
+    deferred = sorted({name for result in results for name in result["deferred"]})
+    print(
+        f"first frame {wall * 1000:.0f}ms after launch "
+        f"({imports * 1000:.0f}ms importing, {frame * 1000:.0f}ms in the app), "
+        f"budget {args.budget * 1000:.0f}ms"
+    )
+
+    failed = False
+    if wall > args.budget:
+        print("FAIL: first frame is over budget")
+        failed = True
+    if deferred:
+        print(f"FAIL: imported before the first frame: {', '.join(deferred)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""Lightweight timing spans for finding where a load spends its time.
+
+Every span adds its duration to a per-name summary, which is cheap enough to
+leave on all the time and is what the live timing panel shows. Only when
+recording is turned on is every span also kept as an event, so it can be
+written out as a Chrome trace and opened in chrome://tracing or Perfetto.
+
+Recording is turned on by setting the MANIFEST_MANAGER_TRACE environment
+variable to the path the trace should be written to when the process exits,
+or by passing --trace to manifest-manager.py or cli.py.
+
+Usage:
+    from tracing import span, traced
+
+    with span("mrpack read manifest", "io", path=str(path)) as current:
+        ...
+        current.set(bytes=size)
+
+    @traced("manifest sort")
+    def sort_files(self) -> None: ...
+"""
+
+import atexit
+import functools
+import inspect
+import json
+import os
+import pathlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+_trace_env = "MANIFEST_MANAGER_TRACE"
+_default_max_events = 200_000
+
+_Function = TypeVar("_Function", bound=Callable[..., Any])
+
+
+class Span:
+    """A span in progress, which can be annotated until it ends."""
+
+    __slots__ = ("name", "category", "args", "start_ns")
+
+    def __init__(self, name: str, category: str, args: dict) -> None:
+        self.name: str = name
+        self.category: str = category
+        self.args: dict = args
+        self.start_ns: int = time.perf_counter_ns()
+
+    def set(self, **args: Any) -> None:
+        """Attaches arguments to the span, such as sizes or cache hits."""
+        self.args.update(args)
+
+
+class SpanSummary:
+    """The accumulated timings of every span with the same name."""
+
+    __slots__ = ("name", "count", "total_ns", "last_ns", "max_ns")
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.count: int = 0
+        self.total_ns: int = 0
+        self.last_ns: int = 0
+        self.max_ns: int = 0
+
+
+class Tracer:
+    """Collects spans from every thread.
+
+    Args:
+        recording (bool, optional): Keep every span as an event for
+        write_chrome_trace. Defaults to False, which only keeps summaries.
+        max_events (int, optional): Events kept before the oldest are dropped.
+    """
+
+    def __init__(
+        self, recording: bool = False, max_events: int = _default_max_events
+    ) -> None:
+        self.recording: bool = recording
+        self.max_events: int = max_events
+        self.origin_ns: int = time.perf_counter_ns()
+
+        self._lock = threading.Lock()
+        self._events: list[dict] = []
+        self._summaries: dict[str, SpanSummary] = {}
+
+    @contextmanager
+    def span(self, name: str, category: str = "app", **args: Any) -> Iterator[Span]:
+        """Times the enclosed block.
+
+        Args:
+            name (str): The span's name, which summaries are grouped by.
+            category (str, optional): The trace viewer category.
+            **args: Arguments shown with the span in the trace viewer.
+        """
+        current = Span(name, category, args)
+        try:
+            yield current
+        except BaseException as error:
+            current.args["error"] = type(error).__name__
+            raise
+        finally:
+            self._finish(current, time.perf_counter_ns())
+
+    def _finish(self, current: Span, end_ns: int) -> None:
+        duration = end_ns - current.start_ns
+        with self._lock:
+            summary = self._summaries.get(current.name)
+            if summary is None:
+                summary = self._summaries[current.name] = SpanSummary(current.name)
+            summary.count += 1
+            summary.total_ns += duration
+            summary.last_ns = duration
+            summary.max_ns = max(summary.max_ns, duration)
+
+            if not self.recording:
+                return
+            if len(self._events) >= self.max_events:
+                del self._events[: self.max_events // 10]
+            self._events.append(
+                {
+                    "name": current.name,
+                    "cat": current.category,
+                    "ph": "X",
+                    "ts": (current.start_ns - self.origin_ns) / 1000,
+                    "dur": duration / 1000,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": current.args,
+                }
+            )
+
+    def summaries(self) -> list[SpanSummary]:
+        """Gets a snapshot of the summaries, longest total time first."""
+        with self._lock:
+            snapshot = []
+            for summary in self._summaries.values():
+                copied = SpanSummary(summary.name)
+                copied.count = summary.count
+                copied.total_ns = summary.total_ns
+                copied.last_ns = summary.last_ns
+                copied.max_ns = summary.max_ns
+                snapshot.append(copied)
+        return sorted(snapshot, key=lambda summary: summary.total_ns, reverse=True)
+
+    def write_chrome_trace(self, path: pathlib.Path | str) -> None:
+        """Writes the recorded events in the Chrome trace event format."""
+        with self._lock:
+            events = list(self._events)
+        thread_names = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "tid": thread.ident,
+                "args": {"name": thread.name},
+            }
+            for thread in threading.enumerate()
+        ]
+        with open(path, "w") as trace_file:
+            json.dump(
+                {"traceEvents": thread_names + events, "displayTimeUnit": "ms"},
+                trace_file,
+                default=str,
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._events.clear()
+            self._summaries.clear()
+
+
+_tracer: Tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def set_tracer(tracer: Tracer) -> None:
+    global _tracer
+    _tracer = tracer
+
+
+def span(name: str, category: str = "app", **args: Any):
+    """Times the enclosed block with the shared tracer, see Tracer.span."""
+    return _tracer.span(name, category, **args)
+
+
+def traced(name: str, category: str = "app") -> Callable[[_Function], _Function]:
+    """Wraps every call of a function, or coroutine function, in a span."""
+
+    def decorate(function: _Function) -> _Function:
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with _tracer.span(name, category):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _tracer.span(name, category):
+                return function(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def enable_recording(trace_path: Optional[pathlib.Path | str] = None) -> Tracer:
+    """Starts recording every span, and writes the trace to a file when the
+    process exits.
+
+    Args:
+        trace_path (Optional[pathlib.Path | str], optional): Where to write
+        the trace. Defaults to the MANIFEST_MANAGER_TRACE environment
+        variable, and to not writing a file if that isn't set either.
+
+    Returns:
+        Tracer: The shared tracer.
+    """
+    trace_path = trace_path or os.environ.get(_trace_env)
+    _tracer.recording = True
+    if trace_path:
+        atexit.register(_tracer.write_chrome_trace, trace_path)
+    return _tracer
+
+
+if os.environ.get(_trace_env):
+    enable_recording()
@@ -0,0 +1,193 @@
+"""Finds newer releases of the mods in a manifest.
+
+The pack's loader and Minecraft version are taken from the manifest's
+dependencies, and the hash of every file is sent to Modrinth's bulk
+version_files/update endpoint, which answers with the newest version of each
+file's project that runs on them. Hashes are sent in chunks of the client's
+hashes_per_request and the answers are cached like other metadata, so
+checking a 400 mod pack takes a single request, and none when it is checked
+again while the cache is fresh.
+
+Usage:
+    from updates import check_updates
+
+    check = check_updates(manifest)
+    for update in check.updates.values():
+        print(update.file.title, update.latest.version_number)
+    MrPack("my-pack.mrpack").copy_manifest(check.updated_manifest_json())
+"""
+
+import posixpath
+
+from manifest import ModrinthFile, ModrinthManifest
+from modrinth_api import ModrinthVersionFile, get_latest_versions_from_hashes
+from tracing import span
+
+# Manifest dependency names of the loaders, and what Modrinth calls them.
+_loaders = {
+    "fabric-loader": "fabric",
+    "quilt-loader": "quilt",
+    "forge": "forge",
+    "neoforge": "neoforge",
+}
+
+
+def pack_platform(manifest: ModrinthManifest) -> tuple[list[str], list[str]]:
+    """Gets the loaders and game versions a pack runs on.
+
+    Args:
+        manifest (ModrinthManifest): The pack's manifest.
+
+    Returns:
+        tuple[list[str], list[str]]: Modrinth's names of the pack's loaders,
+        and its Minecraft version.
+
+    Raises:
+        ValueError: The manifest's dependencies don't name a Minecraft
+        version.
+    """
+    dependencies = manifest.dependencies
+    if "minecraft" not in dependencies:
+        raise ValueError(f"{manifest.name} doesn't say which Minecraft it runs on")
+    loaders = [
+        loader for dependency, loader in _loaders.items() if dependency in dependencies
+    ]
+    return loaders, [dependencies["minecraft"]]
+
+
+class FileUpdate:
+    """A newer version of one of a manifest's files.
+
+    Attributes:
+        file (ModrinthFile): The file in the manifest.
+        latest (ModrinthVersionFile): The newest compatible version of the
+        file's project, which has at least one file.
+    """
+
+    def __init__(self, file: ModrinthFile, latest: ModrinthVersionFile) -> None:
+        self.file: ModrinthFile = file
+        self.latest: ModrinthVersionFile = latest
+
+    def file_json(self) -> dict:
+        """Builds the manifest entry for the newer version's primary file, in
+        the same directory and with the same env as the file it replaces."""
+        files: list[dict] = self.latest.to_json()["files"]
+        primary = next((file for file in files if file.get("primary")), files[0])
+        file_json: dict = {
+            "path": posixpath.join(
+                posixpath.dirname(self.file.path), primary["filename"]
+            ),
+            "hashes": {
+                algorithm: primary["hashes"][algorithm]
+                for algorithm in ("sha1", "sha512")
+                if algorithm in primary["hashes"]
+            },
+        }
+        if self.file.env is not None:
+            file_json["env"] = self.file.env
+        file_json["downloads"] = [primary["url"]]
+        if "size" in primary:
+            file_json["fileSize"] = primary["size"]
+        return file_json
+
+    def to_json(self) -> dict:
+        return {
+            "path": self.file.path,
+            "title": self.file.title,
+            "current": self.file.version_number,
+            "latest": self.latest.version_number,
+            "file": self.file_json(),
+        }
+
+
+class UpdateCheck:
+    """The newer versions available for a manifest's files.
+
+    Attributes:
+        manifest (ModrinthManifest): The manifest checked.
+        loaders (list[str]): The loaders newer versions had to support.
+        game_versions (list[str]): The game versions they had to support.
+        updates (dict[str, FileUpdate]): The updates by the sha1 of the file
+        they replace.
+        known (int): Files Modrinth knew, the rest couldn't be checked.
+    """
+
+    def __init__(
+        self,
+        manifest: ModrinthManifest,
+        loaders: list[str],
+        game_versions: list[str],
+    ) -> None:
+        self.manifest: ModrinthManifest = manifest
+        self.loaders: list[str] = loaders
+        self.game_versions: list[str] = game_versions
+        self.updates: dict[str, FileUpdate] = {}
+        self.known: int = 0
+
+    def updated_manifest_json(self) -> dict:
+        """Gets the manifest's json with every updated file replaced, keeping
+        the order of the files."""
+        manifest_json = self.manifest.to_json()
+        manifest_json["files"] = [
+            (
+                self.updates[file_json["hashes"]["sha1"]].file_json()
+                if file_json["hashes"]["sha1"] in self.updates
+                else file_json
+            )
+            for file_json in manifest_json["files"]
+        ]
+        return manifest_json
+
+    def to_json(self) -> dict:
+        return {
+            "name": self.manifest.name,
+            "versionId": self.manifest.version_id,
+            "loaders": self.loaders,
+            "game_versions": self.game_versions,
+            "files": len(self.manifest.files),
+            "known": self.known,
+            "updates": [update.to_json() for update in self.updates.values()],
+        }
+
+
+def _is_newer(file: ModrinthFile, latest: ModrinthVersionFile) -> bool:
+    if file.sha1 in latest.sha1s:
+        return False
+    # A version without files, such as one whose files were all deleted,
+    # has nothing to update to.
+    if not latest.to_json()["files"]:
+        return False
+    # The newest version for a loader and game version can be older than a
+    # file built for something newer, which isn't worth offering.
+    current = file.version_file
+    if current is not None and current.date_published and latest.date_published:
+        return latest.date_published > current.date_published
+    return True
+
+
+def check_updates(manifest: ModrinthManifest) -> UpdateCheck:
+    """Finds the files of a manifest that have newer compatible versions.
+
+    Args:
+        manifest (ModrinthManifest): The manifest to check. Enriching it first
+        lets versions older than the current file be told apart.
+
+    Returns:
+        UpdateCheck: The updates found.
+
+    Raises:
+        ValueError: The manifest doesn't say which Minecraft it runs on.
+    """
+    loaders, game_versions = pack_platform(manifest)
+    check = UpdateCheck(manifest, loaders, game_versions)
+    with span("check updates", "api", files=len(manifest.files)) as current:
+        latest_versions = get_latest_versions_from_hashes(
+            list(manifest.files), loaders, game_versions
+        )
+        check.known = len(latest_versions)
+        for hash, latest in latest_versions.items():
+            file = manifest.files[hash]
+            if _is_newer(file, latest):
+                check.updates[hash] = FileUpdate(file, latest)
+        current.set(known=check.known, updates=len(check.updates))
+    return check
@@ -0,0 +1,237 @@
+"""Notices when a local pack or the remote manifest changes.
+
+A local pack is watched with inotify on Linux, through its directory since a
+sync renames a new archive into place, and by polling its stat everywhere
+else. The remote manifest is polled with conditional requests, waiting longer
+between polls for as long as it stays the same, so a dashboard left open
+costs little more than a 304 every few minutes.
+
+Usage:
+    from watch import PackWatcher, RemotePoller
+
+    watcher = PackWatcher(path)
+    while True:
+        if watcher.wait(timeout=1.0):
+            reload_pack()
+
+    poller = RemotePoller(url, manifest=remote)
+    while True:
+        time.sleep(poller.interval)
+        changed = poller.poll()
+"""
+
+import logging
+import os
+import pathlib
+import select
+import struct
+import sys
+import time
+from typing import Optional
+
+from manifest import ModrinthManifest, get_remote_manifest
+from tracing import span
+
+# From <sys/inotify.h>. A pack is only reported once the writer has closed it
+# or it has been renamed into place, never while it is half written.
+_in_close_write = 0x008
+_in_moved_from = 0x040
+_in_moved_to = 0x080
+_in_create = 0x100
+_in_delete = 0x200
+_in_watch_mask = (
+    _in_close_write | _in_moved_from | _in_moved_to | _in_create | _in_delete
+)
+_inotify_event = struct.Struct("iIII")
+_read_size = 64 * 1024
+
+_default_poll_interval = 1.0
+_default_min_interval = 30.0
+_default_max_interval = 900.0
+_default_backoff = 2.0
+
+
+def _open_inotify(directory: pathlib.Path) -> Optional[int]:
+    # Returns a non-blocking inotify descriptor watching directory, or None
+    # where inotify isn't available.
+    if not sys.platform.startswith("linux"):
+        return None
+    # ctypes is only needed once a pack is watched, not at startup.
+    import ctypes
+    import ctypes.util
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+    except OSError:
+        return None
+    descriptor = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if descriptor < 0:
+        return None
+    watch = libc.inotify_add_watch(descriptor, os.fsencode(directory), _in_watch_mask)
+    if watch < 0:
+        os.close(descriptor)
+        return None
+    return descriptor
+
+
+class PackWatcher:
+    """Watches one pack for changes.
+
+    Args:
+        path (pathlib.Path | str): The pack to watch.
+        poll_interval (float, optional): Seconds between stat checks where
+        inotify isn't available.
+    """
+
+    def __init__(
+        self,
+        path: pathlib.Path | str,
+        poll_interval: float = _default_poll_interval,
+    ) -> None:
+        self.path: pathlib.Path = pathlib.Path(path)
+        self.poll_interval: float = poll_interval
+
+        self._stat: Optional[tuple[int, int, int]] = self._read_stat()
+        self._pending_stat: Optional[tuple[int, int, int]] = self._stat
+        self._descriptor: Optional[int] = _open_inotify(self.path.parent)
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._descriptor is not None
+
+    def _read_stat(self) -> Optional[tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _names_changed(self) -> set[bytes]:
+        assert self._descriptor is not None
+        names: set[bytes] = set()
+        while True:
+            try:
+                data = os.read(self._descriptor, _read_size)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = _inotify_event.unpack_from(data, offset)
+                offset += _inotify_event.size
+                names.add(data[offset : offset + length].rstrip(b"\0"))
+                offset += length
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until the pack changes or the timeout passes.
+
+        Args:
+            timeout (Optional[float], optional): Seconds to wait at most.
+            Defaults to poll_interval.
+
+        Returns:
+            bool: Whether the pack was replaced, rewritten or deleted since
+            the watcher was made or wait last returned True.
+        """
+        timeout = self.poll_interval if timeout is None else timeout
+        if self._descriptor is not None:
+            readable, _, _ = select.select([self._descriptor], [], [], timeout)
+            if not readable:
+                return False
+            if os.fsencode(self.path.name) not in self._names_changed():
+                return False
+            stat = self._read_stat()
+        else:
+            # A stat is only trusted once it reads the same twice in a row, so
+            # a pack that is still being written isn't reported early.
+            time.sleep(timeout)
+            stat = self._read_stat()
+            settled = stat == self._pending_stat
+            self._pending_stat = stat
+            if not settled:
+                return False
+
+        if stat == self._stat:
+            return False
+        self._stat = stat
+        return True
+
+    def close(self) -> None:
+        if self._descriptor is not None:
+            os.close(self._descriptor)
+            self._descriptor = None
+
+
+def has_changed(previous: ModrinthManifest, current: ModrinthManifest) -> bool:
+    """Whether two versions of a manifest differ in their files or header."""
+    return (
+        previous.files.keys() != current.files.keys()
+        or previous.name != current.name
+        or previous.version_id != current.version_id
+        or previous.dependencies != current.dependencies
+    )
+
+
+class RemotePoller:
+    """Polls a remote manifest, backing off while it stays the same.
+
+    Every poll is a conditional request, see manifest.read_remote_if_changed.
+    The interval starts at min_interval, grows by backoff after every poll
+    that finds nothing new or fails, and drops back once a change is found.
+
+    Args:
+        url (str): The URL of the remote modrinth.index.json.
+        manifest (Optional[ModrinthManifest], optional): The manifest already
+        shown, which the first poll is compared against.
+        min_interval (float, optional): Seconds between polls after a change.
+        max_interval (float, optional): The longest wait between polls.
+        backoff (float, optional): How much the interval grows per poll.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        manifest: Optional[ModrinthManifest] = None,
+        min_interval: float = _default_min_interval,
+        max_interval: float = _default_max_interval,
+        backoff: float = _default_backoff,
+    ) -> None:
+        self.url: str = url
+        self.manifest: Optional[ModrinthManifest] = manifest
+        self.min_interval: float = min_interval
+        self.max_interval: float = max_interval
+        self.backoff: float = backoff
+        self.interval: float = min_interval
+
+    def poll(self) -> Optional[ModrinthManifest]:
+        """Fetches the remote manifest once.
+
+        Returns:
+            Optional[ModrinthManifest]: The new manifest if it changed since
+            the last poll, otherwise None. Failed polls are logged and count
+            as unchanged.
+        """
+        with span("remote poll", "remote", interval=self.interval) as current:
+            try:
+                manifest, _ = get_remote_manifest(self.url)
+            except Exception as error:
+                logging.warning(f"Polling {self.url} failed: {error}")
+                manifest = None
+
+            # A server without validators answers every poll in full, so the
+            # manifest itself is compared rather than trusting the status.
+            previous = self.manifest
+            changed = (
+                manifest is not None
+                and previous is not None
+                and manifest is not previous
+                and has_changed(previous, manifest)
+            )
+            if manifest is not None:
+                self.manifest = manifest
+            current.set(changed=changed)
+
+        if not changed:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+            return None
+        self.interval = self.min_interval
+        return manifest
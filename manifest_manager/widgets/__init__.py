@@ -1,5 +1,8 @@
 from .custom_directory_tree import CustomDirectoryTree
 from .manifest_box import RemoteManifestBox, LocalManifestBox, ManifestBox
 from .manifest_file_box import ManifestFileBox
+from .manifest_file_list import ManifestFileList
 from .manifest_menu import ManifestMenu
 from .manager_menu import ManagerMenu
+from .fleet_view import FleetView
+from .pack_picker import PackPicker
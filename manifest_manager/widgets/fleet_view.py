@@ -0,0 +1,141 @@
+from pathlib import Path
+from typing import Optional
+
+from fleet import Fleet, FleetEntry, load_fleet, unique_paths
+
+from .manifest_menu import ManifestMenu
+
+from textual import on, work
+from textual.widgets import DataTable, Label, Static
+from textual.containers import Vertical
+from textual.app import ComposeResult
+
+
+class FleetView(Static):
+    """A table of local packs diffed against one remote manifest. Selecting a
+    pack lists its files with the ones that differ from the remote on top."""
+
+    DEFAULT_CSS = """
+    #fleet-summary {
+        margin: 1;
+        width: 100%;
+    }
+
+    #fleet-table {
+        height: auto;
+        max-height: 20;
+    }
+
+    #fleet-detail {
+        height: auto;
+    }
+
+    #fleet-changes {
+        margin: 1;
+    }
+    """
+
+    columns = ("Pack", "Version", "Files", "Behind", "Extra", "Upgraded", "Status")
+
+    def __init__(self, remote_url: str, pack_paths: list[str], **kwargs) -> None:
+        """
+        Args:
+            remote_url (str): The URL of the remote modrinth.index.json.
+            pack_paths (list[str]): Paths of the local .mrpack archives. A
+            pack given more than once gets a single row.
+        """
+        super().__init__(**kwargs)
+        self.remote_url = remote_url
+        self.pack_paths = unique_paths(pack_paths)
+        self.fleet: Optional[Fleet] = None
+        self._entries: dict[str, FleetEntry] = {}
+
+    def compose(self) -> ComposeResult:
+        yield Label(
+            f"Loading {len(self.pack_paths)} packs against {self.remote_url}",
+            id="fleet-summary",
+        )
+        yield DataTable(id="fleet-table", cursor_type="row", zebra_stripes=True)
+        yield Vertical(id="fleet-detail")
+
+    def on_mount(self) -> None:
+        table = self.query_one("#fleet-table", DataTable)
+        for column in self.columns:
+            table.add_column(column, key=column)
+        for path in self.pack_paths:
+            table.add_row(
+                Path(path).name, "", "", "", "", "", "loading", key=path
+            )
+        self.load_fleet()
+
+    @work(thread=True, exclusive=True, group="fleet-load")
+    def load_fleet(self) -> None:
+        try:
+            fleet = load_fleet(
+                self.remote_url,
+                self.pack_paths,
+                on_entry=lambda entry: self.app.call_from_thread(
+                    self.update_entry, entry
+                ),
+            )
+        except Exception as error:
+            self.app.call_from_thread(
+                self.query_one("#fleet-summary", Label).update,
+                f"Couldn't load the remote manifest: {error}",
+            )
+            return
+        self.app.call_from_thread(self.show_fleet, fleet)
+
+    def update_entry(self, entry: FleetEntry) -> None:
+        """Fills in a pack's row as soon as it is read, and again once it has
+        been diffed."""
+        self._entries[entry.path] = entry
+        table = self.query_one("#fleet-table", DataTable)
+        cells: dict[str, object] = {"Status": entry.status}
+        if entry.manifest is not None:
+            cells["Pack"] = entry.manifest.name
+            cells["Version"] = entry.manifest.version_id
+            cells["Files"] = len(entry.manifest.files)
+        if entry.diff is not None:
+            cells["Behind"] = len(entry.diff.source_only)
+            cells["Extra"] = len(entry.diff.target_only)
+            cells["Upgraded"] = len(entry.diff.upgraded)
+        for column, value in cells.items():
+            table.update_cell(entry.path, column, value)
+
+    def show_fleet(self, fleet: Fleet) -> None:
+        self.fleet = fleet
+        statuses = [entry.status for entry in fleet.entries]
+        self.query_one("#fleet-summary", Label).update(
+            f"Remote: {fleet.remote.name} {fleet.remote.version_id}"
+            f" | {len(statuses)} packs, {statuses.count('outdated')} outdated,"
+            f" {statuses.count('error')} failed"
+            f" | loaded in {fleet.seconds:.2f}s"
+        )
+
+    @on(DataTable.RowSelected, "#fleet-table")
+    async def show_pack(self, event: DataTable.RowSelected) -> None:
+        entry = self._entries.get(str(event.row_key.value))
+        detail = self.query_one("#fleet-detail", Vertical)
+        await detail.remove_children()
+        if entry is None:
+            return
+        if entry.error is not None:
+            await detail.mount(Label(entry.error, classes="highlight-error"))
+            return
+        if entry.manifest is None or entry.diff is None:
+            await detail.mount(Label("Still loading", classes="highlight-warning"))
+            return
+
+        diff = entry.diff
+        await detail.mount(
+            Label(
+                f"{len(diff.added)} added, {len(diff.removed)} removed,"
+                f" {len(diff.upgraded)} upgraded, {len(diff.downgraded)} downgraded,"
+                f" {len(diff.changed)} changed, {len(diff.moved)} moved",
+                id="fleet-changes",
+            )
+        )
+        manifest_menu = ManifestMenu(entry.manifest, dispirate_file_symbol="<<")
+        await detail.mount(manifest_menu)
+        manifest_menu.set_dispirate_files(diff.target_only)
@@ -4,12 +4,15 @@ from textual.app import ComposeResult
 from textual.containers import Horizontal, Vertical, Center
 from textual.message import Message
 
+from tracing import get_tracer
+
 
 class ManagerMenu(Static):
     is_local_manifest_loaded: reactive[bool] = reactive(False)
     is_remote_manifest_loaded: reactive[bool] = reactive(False)
     count_remote_files_only: reactive[int] = reactive(0)
     count_local_files_only: reactive[int] = reactive(0)
+    timing_panel_rows: int = 6
 
     DEFAULT_CSS = """
     ManagerMenu {
@@ -36,6 +39,11 @@ class ManagerMenu(Static):
     #sync-button {
         margin: 1;
     }
+
+    #timing-panel {
+        width: auto;
+        color: $text-muted;
+    }
     """
 
     def compose(self) -> ComposeResult:
@@ -54,6 +62,8 @@ class ManagerMenu(Static):
                     yield Label(id="all-good-warning", classes="highlight-ok")
                 with Center():
                     yield Button("Sync Local", id="sync-button")
+                with Center():
+                    yield Label(id="timing-panel")
 
     def on_mount(self) -> None:
         outdated_warning = self.query_one("#local-manifest-outdated-warning", Label)
@@ -65,6 +75,23 @@ class ManagerMenu(Static):
         all_good = self.query_one("#all-good-warning", Label)
         all_good.display = False
 
+        # Timings are only shown while a trace is being recorded, so a normal
+        # run doesn't pay for redrawing them.
+        timing_panel = self.query_one("#timing-panel", Label)
+        timing_panel.display = get_tracer().recording
+        if timing_panel.display:
+            self.set_interval(0.5, self.update_timing_panel)
+
+    def update_timing_panel(self) -> None:
+        """Shows the spans that took the most time so far."""
+        lines = [
+            f"{summary.name:<24} {summary.count:>5}x"
+            f" last {summary.last_ns / 1e6:>8.1f}ms"
+            f" total {summary.total_ns / 1e6:>9.1f}ms"
+            for summary in get_tracer().summaries()[: self.timing_panel_rows]
+        ]
+        self.query_one("#timing-panel", Label).update("\n".join(lines))
+
     def watch_is_local_manifest_loaded(self, new_is_local_manifest_loaded: bool):
         warning_label = self.query_one("#manifestmenu-loaded-warning", Label)
         if new_is_local_manifest_loaded and self.is_remote_manifest_loaded:
@@ -1,14 +1,20 @@
-import json
+import asyncio
+import time
 from pathlib import Path
 from typing import Optional
-from zipfile import ZipFile
 
-from manifest import ModrinthManifest, read_remote
+from manifest import ModrinthManifest, get_remote_manifest_async
+from mrpack import MrPack
+from tracing import span
+from updates import UpdateCheck, check_updates
+from watch import PackWatcher, RemotePoller
 
 from .custom_directory_tree import CustomDirectoryTree
 from .manifest_menu import ManifestMenu
-from .manifest_file_box import ManifestFileBox
+from .pack_picker import PackPicker
 
+from textual import work
+from textual.worker import get_current_worker
 from textual.widgets import DirectoryTree, Static, Button, Label, Input
 from textual.containers import Horizontal
 from textual.message import Message
@@ -34,9 +40,12 @@ class ManifestBox(Static):
             self.control = control
             super().__init__()
 
-    dispirate_files: reactive[list] = reactive([])
+    dispirate_files: reactive[list] = reactive([], always_update=True)
     dispirate_file_symbol: str = ""
-    manifest_json: dict
+    manifest: Optional[ModrinthManifest] = None
+    watching: reactive[bool] = reactive(False)
+    # Seconds a watch worker sleeps between checks for being cancelled.
+    watch_tick: float = 1.0
 
     DEFAULT_CSS = """
     .dispirate {
@@ -51,30 +60,79 @@ class ManifestBox(Static):
     def add_manifest_menu(self):
         raise NotImplementedError()
 
+    async def mount_manifest_menu(self, manifest: ModrinthManifest) -> ManifestMenu:
+        """Mounts a menu for a manifest straight away and then streams in its
+        metadata without blocking the event loop, unless the manifest was
+        already enriched. Meant to be awaited from a load worker so that the
+        load is abandoned if the worker is cancelled."""
+        previous = self.manifest
+        if (
+            previous is not None
+            and previous is not manifest
+            and previous.is_enriched
+            and not manifest.is_enriched
+        ):
+            # A new version of the manifest already shown only looks up the
+            # files it doesn't share with the old one.
+            missing = manifest.adopt_metadata(previous)
+            with span("ui enrich changed", "ui", files=len(missing)):
+                if missing:
+                    await manifest.enrich_async(missing)
+            manifest.sort_files()
+            manifest.is_enriched = True
+
+        manifest_menu = ManifestMenu(
+            manifest=manifest,
+            dispirate_file_symbol=self.dispirate_file_symbol,
+        )
+        self.manifest = manifest
+        with span(
+            "ui mount menu",
+            "ui",
+            files=len(manifest.files),
+            virtualized=manifest_menu.virtualized,
+        ):
+            await self.mount(manifest_menu)
+        with span("ui enrich menu", "ui"):
+            await manifest_menu.enrich()
+        return manifest_menu
+
+    def cancel_manifest_load(self) -> None:
+        self.workers.cancel_group(self, "manifest-load")
+
+    def start_watch(self) -> None:
+        """Starts the workers that reload the manifest when it changes. The
+        box itself has nothing to watch, so this does nothing here and each
+        kind of box starts its own."""
+
+    def watch_watching(self, watching: bool) -> None:
+        if watching:
+            self.start_watch()
+        else:
+            self.workers.cancel_group(self, "watch")
+
     def update_manifest_menu(self) -> None:
-        current_menu = self.query_one(ManifestMenu)
-        current_menu.remove()
+        for current_menu in self.query(ManifestMenu):
+            current_menu.remove()
 
         self.add_manifest_menu()
 
     def watch_dispirate_files(self, new_dispirate_files: list):
-        if new_dispirate_files == []:
+        # The menu may still be loading, it will be rescanned once it posts
+        # its ManifestLoaded message.
+        manifest_menus = self.query(ManifestMenu)
+        if not manifest_menus:
             return
-
-        manifest_menu = self.query_one(ManifestMenu)
-        hash: str
-        for hash in new_dispirate_files:
-            file_box = manifest_menu.query_one(f"#_{hash}", ManifestFileBox)
-            file_box.mark_dispirate()
-            file_box.add_class("dispirate")
-
-        manifest_menu.reorder_file_list = True
+        manifest_menus.first().set_dispirate_files(new_dispirate_files)
 
 
 class LocalManifestBox(ManifestBox):
     local_manifest_path: reactive[Path] = reactive(Path.home())
-    is_directory_tree_open = False
+    is_picker_open = False
     dispirate_file_symbol = "<<"
+    _loaded_manifest: Optional[ModrinthManifest] = None
+    _loaded_stat: Optional[tuple[Path, int, int]] = None
+    _update_check: Optional[UpdateCheck] = None
 
     DEFAULT_CSS = """
     #localmanifestbox-title {
@@ -83,14 +141,35 @@ class LocalManifestBox(ManifestBox):
         width: 100%;
         text-align: right;
     }
+
+    #check_updates, #apply_updates {
+        width: 1fr;
+    }
     """
 
+    def on_mount(self) -> None:
+        self.query_one("#apply_updates", Button).display = False
+
+    def close_picker(self) -> None:
+        self.is_picker_open = False
+        for picker in self.query("#pack_picker, #dir_tree"):
+            picker.remove()
+
+    def on_pack_picker_selected(self, event: PackPicker.Selected) -> None:
+        self.close_picker()
+        self.local_manifest_path = event.path
+
+    def on_pack_picker_browse(self, event: PackPicker.Browse) -> None:
+        # The directory tree stays as a fallback for packs outside the
+        # scanned directories.
+        self.query_one("#pack_picker", PackPicker).remove()
+        self.mount(CustomDirectoryTree(Path.home(), id="dir_tree"))
+
     def on_directory_tree_file_selected(
         self, event: DirectoryTree.FileSelected
     ) -> None:
+        self.close_picker()
         self.local_manifest_path = event.path
-        self.is_directory_tree_open = False
-        self.get_child_by_id("dir_tree").remove()
 
     def on_directory_tree_directory_selected(
         self, event: DirectoryTree.DirectorySelected
@@ -103,27 +182,100 @@ class LocalManifestBox(ManifestBox):
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
         button_id = event.button.id
-        if button_id == "local_file_select" and self.is_directory_tree_open == False:
-            self.is_directory_tree_open = True
-            directory_tree = CustomDirectoryTree(Path.home(), id="dir_tree")
-            self.mount(directory_tree)
+        if button_id == "local_file_select" and self.is_picker_open == False:
+            self.is_picker_open = True
+            self.mount(PackPicker(id="pack_picker"))
         elif button_id == "local_file_select":
-            self.is_directory_tree_open = False
-            self.get_child_by_id("dir_tree").remove()
+            self.close_picker()
+        elif button_id == "check_updates":
+            self.find_updates()
+        elif button_id == "apply_updates":
+            self.apply_updates()
+
+    @work(exclusive=True, group="update-check")
+    async def find_updates(self) -> None:
+        """Shows the newer compatible version of every file that has one."""
+        manifest = self.manifest
+        if manifest is None or not self.query(ManifestMenu):
+            self.notify("Load a local manifest first", severity="warning")
+            return
+        try:
+            check = await asyncio.to_thread(check_updates, manifest)
+        except ValueError as error:
+            self.notify(str(error), severity="error")
+            return
+        if check.manifest is not self.manifest:
+            return
+        self._update_check = check
+        for manifest_menu in self.query(ManifestMenu):
+            manifest_menu.show_updates(check)
+        self.query_one("#apply_updates", Button).display = bool(check.updates)
+
+    def apply_updates(self) -> None:
+        """Writes the pack's index with every file found by the last update
+        check replaced by its newer version."""
+        check = self._update_check
+        if check is None or check.manifest is not self.manifest:
+            return
+        MrPack(self.local_manifest_path).copy_manifest(check.updated_manifest_json())
+        self.notify(f"Updated {len(check.updates)} files")
+        self.update_manifest_menu()
 
-    def add_manifest_menu(self) -> None:
+    @work(exclusive=True, group="manifest-load")
+    async def add_manifest_menu(self) -> None:
         if self.local_manifest_path == Path.home():
             return
-        with ZipFile(self.local_manifest_path, "r") as local_pack:
-            with local_pack.open("modrinth.index.json") as local_manifest:
-                manifest_json = json.loads(local_manifest.read())
-                manifest_menu = ManifestMenu(
-                    manifest_json=manifest_json,
-                    dispirate_file_symbol=self.dispirate_file_symbol,
-                )
-                self.mount(manifest_menu)
-                self.manifest_json = manifest_json
-                self.post_message(self.ManifestLoaded(manifest_menu.manifest, self))
+        self._update_check = None
+        self.query_one("#apply_updates", Button).display = False
+        path = self.local_manifest_path
+        stat = await asyncio.to_thread(path.stat)
+        pack_stat = (path, stat.st_mtime_ns, stat.st_size)
+        if self._loaded_manifest is None or pack_stat != self._loaded_stat:
+            # Only re-read and re-enrich the pack if it changed on disk. The
+            # index is streamed, so the pack's name shows before it is read.
+            def read_pack() -> ModrinthManifest:
+                with MrPack(path).open_manifest() as manifest_file:
+                    return ModrinthManifest.from_stream(
+                        manifest_file,
+                        enrich=False,
+                        on_header=lambda header: self.app.call_from_thread(
+                            self.show_header, header
+                        ),
+                    )
+
+            self._loaded_manifest = await asyncio.to_thread(read_pack)
+            self._loaded_stat = pack_stat
+        manifest_menu = await self.mount_manifest_menu(self._loaded_manifest)
+        self.post_message(self.ManifestLoaded(manifest_menu.manifest, self))
+        if self.watching:
+            self.start_watch()
+
+    def start_watch(self) -> None:
+        if self.local_manifest_path != Path.home():
+            self.watch_pack(self.local_manifest_path)
+
+    @work(thread=True, exclusive=True, group="watch")
+    def watch_pack(self, path: Path) -> None:
+        """Reloads the pack whenever it changes on disk, until cancelled."""
+        worker = get_current_worker()
+        watcher = PackWatcher(path)
+        try:
+            while not worker.is_cancelled:
+                if watcher.wait(timeout=self.watch_tick):
+                    # Scheduled through the box so the reload runs in its
+                    # context, which the @on handlers of ManifestLoaded need.
+                    self.app.call_from_thread(
+                        self.call_later, self.update_manifest_menu
+                    )
+        finally:
+            watcher.close()
+
+    def show_header(self, header: dict) -> None:
+        """Names the pack being loaded in the box's title."""
+        title = self.query_one("#localmanifestbox-title", Label)
+        title.update(
+            f"Local Manifest: {header.get('name', '')} {header.get('versionId', '')}"
+        )
 
     def watch_local_manifest_path(self, new_manifest_path: str) -> None:
         try:
@@ -144,6 +296,8 @@ class LocalManifestBox(ManifestBox):
                 id="local_path_input",
             )
             yield Button("Select File", id="local_file_select")
+            yield Button("Check Updates", id="check_updates")
+            yield Button("Apply Updates", id="apply_updates")
 
 
 class RemoteManifestBox(ManifestBox):
@@ -160,21 +314,56 @@ class RemoteManifestBox(ManifestBox):
 
     def toggle_is_manifest_loaded(self) -> None:
         self.is_manifest_loaded = not self.is_manifest_loaded
-        if self.is_manifest_loaded:
-            manifest_menu = self.query_one(ManifestMenu)
-            self.post_message(self.ManifestLoaded(manifest_menu.manifest, self))
 
-    def add_manifest_menu(self) -> None:
-        manifest_json = read_remote(self.query_one("#remote_url_input", Input).value)
-        manifest_menu = ManifestMenu(
-            manifest_json=manifest_json,
-            dispirate_file_symbol=self.dispirate_file_symbol,
-        )
-        self.manifest_json = manifest_json
-        self.mount(manifest_menu)
+    @work(exclusive=True, group="manifest-load")
+    async def add_manifest_menu(
+        self, manifest: Optional[ModrinthManifest] = None
+    ) -> None:
+        # An unchanged remote answers with a 304 and hands back the manifest
+        # that was already parsed and enriched.
+        if manifest is None:
+            manifest, _ = await get_remote_manifest_async(self.remote_url)
+        manifest_menu = await self.mount_manifest_menu(manifest)
+        self.post_message(self.ManifestLoaded(manifest_menu.manifest, self))
+        if self.watching:
+            self.start_watch()
+
+    @property
+    def remote_url(self) -> str:
+        return self.query_one("#remote_url_input", Input).value
+
+    def show_polled_manifest(self, manifest: ModrinthManifest) -> None:
+        for current_menu in self.query(ManifestMenu):
+            current_menu.remove()
+        self.add_manifest_menu(manifest)
+
+    def start_watch(self) -> None:
+        if self.is_manifest_loaded and self.manifest is not None:
+            self.poll_remote(self.remote_url, self.manifest)
+
+    @work(thread=True, exclusive=True, group="watch")
+    def poll_remote(self, url: str, manifest: ModrinthManifest) -> None:
+        """Shows the remote manifest again whenever it changes, until
+        cancelled."""
+        worker = get_current_worker()
+        poller = RemotePoller(url, manifest=manifest)
+        next_poll = time.monotonic() + poller.interval
+        while not worker.is_cancelled:
+            time.sleep(self.watch_tick)
+            if time.monotonic() < next_poll:
+                continue
+            changed = poller.poll()
+            next_poll = time.monotonic() + poller.interval
+            if changed is not None and not worker.is_cancelled:
+                self.app.call_from_thread(
+                    self.call_later, self.show_polled_manifest, changed
+                )
 
     def remove_manifest_menu(self) -> None:
-        self.query_one(ManifestMenu).remove()
+        self.cancel_manifest_load()
+        self.workers.cancel_group(self, "watch")
+        for manifest_menu in self.query(ManifestMenu):
+            manifest_menu.remove()
 
     def relabel_load_button(self, label: str) -> None:
         button: Button = self.query_one("#load_remote_button", Button)
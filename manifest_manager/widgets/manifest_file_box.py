@@ -34,11 +34,17 @@ class ManifestFileBox(Static):
     """
 
     def __init__(
-        self, file_name: str, version: str, id: str, classes: Optional[str] = None
+        self,
+        file_name: str,
+        version: str,
+        id: str,
+        classes: Optional[str] = None,
+        dispirate_file_symbol: str = "",
     ) -> None:
         super().__init__(id=id, classes=classes)
         self.file_name = file_name
         self.version = version
+        self.dispirate_file_symbol = dispirate_file_symbol
 
     def compose(self) -> ComposeResult:
         with Horizontal():
@@ -46,11 +52,24 @@ class ManifestFileBox(Static):
             yield Label(self.version, id="filebox-version")
             yield Label(id="dispirate-symbol")
 
+    def update_metadata(self, file_name: str, version: str) -> None:
+        self.file_name = file_name
+        self.version = version
+        if not self.is_mounted:
+            return
+        self.query_one("#filebox-title", Label).update(file_name)
+        self.query_one("#filebox-version", Label).update(version)
+
     def mark_dispirate(self):
         self.is_dispirate = True
         symbol_label = self.query_one("#dispirate-symbol", Label)
         symbol_label.update(self.dispirate_file_symbol)
 
+    def unmark_dispirate(self):
+        self.is_dispirate = False
+        symbol_label = self.query_one("#dispirate-symbol", Label)
+        symbol_label.update("")
+
     def update_symbol(self):
         if not self.is_dispirate:
             return
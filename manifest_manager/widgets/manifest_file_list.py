@@ -0,0 +1,105 @@
+from typing import Iterable
+
+from rich.segment import Segment
+
+from textual.geometry import Size
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+
+
+class FileRow:
+    """The data behind one line of a ManifestFileList."""
+
+    def __init__(self, hash: str, file_name: str, version: str) -> None:
+        self.hash: str = hash
+        self.file_name: str = file_name
+        self.version: str = version
+        self.is_dispirate: bool = False
+
+
+class ManifestFileList(ScrollView):
+    """A virtualized list of manifest files.
+
+    Only the rows scrolled into view are ever rendered, one line per file, so
+    mounting and laying out the list costs the same for any pack size.
+    """
+
+    COMPONENT_CLASSES = {
+        "manifest-file-list--version",
+        "manifest-file-list--dispirate",
+        "manifest-file-list--symbol",
+    }
+
+    DEFAULT_CSS = """
+    ManifestFileList {
+        height: 1fr;
+    }
+
+    ManifestFileList > .manifest-file-list--version {
+        color: $text-muted;
+    }
+
+    ManifestFileList > .manifest-file-list--dispirate {
+        background: red 10%;
+    }
+
+    ManifestFileList > .manifest-file-list--symbol {
+        color: red 90%;
+    }
+    """
+
+    def __init__(
+        self,
+        rows: Iterable[FileRow],
+        dispirate_file_symbol: str = "",
+        *,
+        id: str | None = None,
+        classes: str | None = None,
+    ) -> None:
+        super().__init__(id=id, classes=classes)
+        self.rows: list[FileRow] = list(rows)
+        self.dispirate_file_symbol: str = dispirate_file_symbol
+        self.virtual_size = Size(0, len(self.rows))
+
+    def visible_hashes(self) -> list[str]:
+        top = self.scroll_offset.y
+        return [row.hash for row in self.rows[top : top + self.size.height]]
+
+    def render_line(self, y: int) -> Strip:
+        width = self.size.width
+        index = self.scroll_offset.y + y
+        base_style = self.rich_style
+        if index >= len(self.rows):
+            return Strip.blank(width, base_style)
+
+        row = self.rows[index]
+        if row.is_dispirate:
+            base_style += self.get_component_rich_style("manifest-file-list--dispirate")
+
+        # Mirrors ManifestFileBox's columns: title 3fr, version 2fr right
+        # aligned, then the dispirate symbol.
+        symbol = f" {self.dispirate_file_symbol}" if row.is_dispirate else ""
+        symbol_width = len(f" {self.dispirate_file_symbol}")
+        content_width = max(width - 2 - symbol_width, 0)
+        title_width = content_width * 3 // 5
+        version_width = content_width - title_width
+
+        segments = [
+            Segment(" ", base_style),
+            Segment(row.file_name[:title_width].ljust(title_width), base_style),
+            Segment(
+                row.version[:version_width].rjust(version_width),
+                base_style
+                + self.get_component_rich_style("manifest-file-list--version"),
+            ),
+            Segment(
+                symbol.rjust(symbol_width),
+                base_style + self.get_component_rich_style("manifest-file-list--symbol"),
+            ),
+            Segment(" ", base_style),
+        ]
+        return Strip(segments).adjust_cell_length(width, base_style)
+
+    def refresh_rows(self) -> None:
+        self.virtual_size = Size(0, len(self.rows))
+        self.refresh()
@@ -1,8 +1,11 @@
-from typing import Optional, cast
-from modrinth_api import ModrinthProject, ModrinthVersionFile
+import asyncio
+from typing import Optional
 from .manifest_file_box import ManifestFileBox
+from .manifest_file_list import FileRow, ManifestFileList
 
 from manifest import ModrinthManifest
+from modrinth_api import get_client
+from updates import UpdateCheck
 
 from textual.widgets import Static, Label
 from textual.containers import Vertical, VerticalScroll
@@ -16,6 +19,7 @@ class ManifestMenu(Static):
     version_id: reactive[str] = reactive("")
     reorder_file_list: reactive[bool] = reactive(False)
     dispirate_file_symbol: reactive[str] = reactive("")
+    virtualize_threshold: int = 100
 
     DEFAULT_CSS = """
     Vertical Label {
@@ -30,28 +34,182 @@ class ManifestMenu(Static):
     """
 
     def __init__(
-        self, manifest_json, dispirate_file_symbol: Optional[str] = None
+        self,
+        manifest: ModrinthManifest,
+        dispirate_file_symbol: str = "",
+        virtualized: Optional[bool] = None,
     ) -> None:
+        """
+        Args:
+            manifest (ModrinthManifest): The manifest to list.
+            dispirate_file_symbol (str, optional): Shown next to files that
+            differ from the other manifest. Defaults to nothing.
+            virtualized (Optional[bool], optional): Render the files as a
+            single line-based list instead of a widget per file. Defaults to
+            doing so for manifests with more than virtualize_threshold files.
+        """
         super().__init__()
 
-        self.manifest = ModrinthManifest(manifest_json=manifest_json)
+        self.manifest = manifest
+        self.virtualized: bool = (
+            len(manifest.files) > self.virtualize_threshold
+            if virtualized is None
+            else virtualized
+        )
+        # Rows and file boxes are indexed by hash so diff results can be
+        # applied without walking the DOM.
+        self._rows: dict[str, FileRow] = {}
+        self._fileboxes: dict[str, ManifestFileBox] = {}
+        self._dispirate: set[str] = set()
 
         self.manifest_name = str(self.manifest.name)
         self.format_version = str(self.manifest.format_version)
         self.version_id = str(self.manifest.version_id)
-        self.dispirate_file_symbol = str(dispirate_file_symbol)
+        self.dispirate_file_symbol = dispirate_file_symbol
 
     def compose(self) -> ComposeResult:
         with Vertical():
             yield Label(f"{self.manifest_name} {self.version_id}")
             yield Label(f"{len(self.manifest.files)} Files")
+            yield Label(id="manifestmenu-updates", classes="highlight-warning")
+        if self.virtualized:
+            self._rows = {
+                hash: FileRow(hash, file.title, file.version_number)
+                for hash, file in self.manifest.files.items()
+            }
+            yield ManifestFileList(
+                self._rows.values(),
+                dispirate_file_symbol=self.dispirate_file_symbol,
+                id="filebox-list",
+            )
+            return
+
+        self._fileboxes = {
+            hash: ManifestFileBox(
+                file_name=file.title,
+                version=file.version_number,
+                id=f"_{hash}",
+                dispirate_file_symbol=self.dispirate_file_symbol,
+            )
+            for hash, file in self.manifest.files.items()
+        }
         with VerticalScroll(id="filebox-list"):
-            for hash, file in self.manifest.files.items():
-                yield ManifestFileBox(
-                    file_name=cast(ModrinthProject, file.project).title,
-                    version=cast(ModrinthVersionFile, file.version_file).version_number,
-                    id=f"_{hash}",
+            yield from self._fileboxes.values()
+
+    def visible_hashes(self) -> list[str]:
+        """Gets the hashes of the file rows currently scrolled into view."""
+        if self.virtualized:
+            return self.query_one("#filebox-list", ManifestFileList).visible_hashes()
+
+        fileboxes = self.query_one("#filebox-list", VerticalScroll)
+        top = fileboxes.scroll_offset.y
+        bottom = top + fileboxes.size.height
+        return [
+            hash
+            for hash, filebox in self._fileboxes.items()
+            if filebox.virtual_region.bottom > top and filebox.virtual_region.y < bottom
+        ]
+
+    def update_file_rows(self, hashes: list[str]) -> None:
+        for hash in hashes:
+            file = self.manifest.files[hash]
+            if file.project is None:
+                continue
+            if self.virtualized:
+                self._rows[hash].file_name = file.title
+                self._rows[hash].version = file.version_number
+                continue
+            self._fileboxes[hash].update_metadata(file.title, file.version_number)
+
+        if self.virtualized:
+            self.query_one("#filebox-list", ManifestFileList).refresh()
+
+    def on_mount(self) -> None:
+        self.query_one("#manifestmenu-updates", Label).display = False
+
+    def show_updates(self, check: UpdateCheck) -> None:
+        """Shows the newer version next to each file that has one."""
+        summary = self.query_one("#manifestmenu-updates", Label)
+        platform = " ".join(check.loaders + check.game_versions)
+        summary.update(f"{len(check.updates)} Updates for {platform}")
+        summary.display = True
+
+        with self.app.batch_update():
+            for hash, update in check.updates.items():
+                if hash not in self.manifest.files:
+                    continue
+                version = (
+                    f"{update.file.version_number} -> {update.latest.version_number}"
                 )
+                if self.virtualized:
+                    self._rows[hash].version = version
+                else:
+                    self._fileboxes[hash].update_metadata(update.file.title, version)
+            if self.virtualized:
+                self.query_one("#filebox-list", ManifestFileList).refresh()
+
+    def set_dispirate_files(self, hashes: list[str]) -> None:
+        """Highlights exactly the given files as differing from the other
+        manifest and moves them to the top of the list. Only rows whose state
+        changed are touched, and all of them in a single screen update."""
+        # A scan may finish after this menu replaced the one it compared, so
+        # hashes from another manifest are ignored.
+        new_dispirate = {hash for hash in hashes if hash in self.manifest.files}
+        marked = new_dispirate - self._dispirate
+        unmarked = self._dispirate - new_dispirate
+        self._dispirate = new_dispirate
+        if not marked and not unmarked:
+            return
+
+        with self.app.batch_update():
+            if self.virtualized:
+                for hash in marked:
+                    self._rows[hash].is_dispirate = True
+                for hash in unmarked:
+                    self._rows[hash].is_dispirate = False
+            else:
+                for hash in marked:
+                    self._fileboxes[hash].mark_dispirate()
+                    self._fileboxes[hash].add_class("dispirate")
+                for hash in unmarked:
+                    self._fileboxes[hash].unmark_dispirate()
+                    self._fileboxes[hash].remove_class("dispirate")
+
+            self.reorder_file_list = True
+
+    async def enrich(self) -> None:
+        """Streams version file and project metadata into the already rendered
+        file rows. Rows in view are fetched first, then the rest in chunks of
+        the client's hashes_per_request that are all fetched at once, each
+        chunk's rows updating as soon as it arrives. Once every row is
+        enriched the list is reordered by title."""
+        if self.manifest.is_enriched:
+            return
+
+        files = self.manifest.files
+        visible = [hash for hash in self.visible_hashes() if hash in files]
+        if visible:
+            await self.manifest.enrich_async(visible)
+            self.update_file_rows(visible)
+
+        shown = set(visible)
+        rest = [hash for hash in files if hash not in shown]
+        chunk_size = get_client().hashes_per_request
+
+        async def enrich_chunk(chunk: list[str]) -> None:
+            await self.manifest.enrich_async(chunk)
+            self.update_file_rows(chunk)
+
+        await asyncio.gather(
+            *[
+                enrich_chunk(rest[start : start + chunk_size])
+                for start in range(0, len(rest), chunk_size)
+            ]
+        )
+
+        self.manifest.sort_files()
+        self.manifest.is_enriched = True
+        self.reorder_file_list = True
 
     def watch_reorder_file_list(self, new_bool):
         if new_bool:
@@ -59,34 +217,26 @@ class ManifestMenu(Static):
         else:
             return
 
-        fileboxes = self.query_one("#filebox-list", VerticalScroll)
-
-        new_file_list = []
-
-        for filebox in fileboxes.query(ManifestFileBox):
-            new_file_list.append(
-                {
-                    "file_name": filebox.file_name,
-                    "version": filebox.version,
-                    "hash": filebox.id,
-                    "is_dispirate": filebox.is_dispirate,
-                }
-            )
-
-        fileboxes.remove_children()
-
-        # Sorting file list to make sure dispirate files are on top
-        new_file_list = sorted(
-            new_file_list,
-            key=lambda file: not bool(file["is_dispirate"]),
+        # Sorting file list to make sure dispirate files are on top, and in
+        # the manifest's order otherwise
+        order = sorted(
+            self.manifest.files, key=lambda hash: hash not in self._dispirate
         )
 
-        for file in new_file_list:
-            new_filebox = ManifestFileBox(
-                file_name=file["file_name"],
-                version=file["version"],
-                id=file["hash"],
-                classes="dispirate" if file["is_dispirate"] else None,
-            )
-            fileboxes.mount(new_filebox)
-            new_filebox.update_symbol()
+        if self.virtualized:
+            file_list = self.query_one("#filebox-list", ManifestFileList)
+            file_list.rows = [self._rows[hash] for hash in order]
+            file_list.refresh_rows()
+            return
+
+        # Existing file boxes are moved rather than torn down and remounted.
+        fileboxes = self.query_one("#filebox-list", VerticalScroll)
+        current = list(fileboxes.children)
+        with self.app.batch_update():
+            for index, hash in enumerate(order):
+                filebox = self._fileboxes[hash]
+                if current[index] is filebox:
+                    continue
+                fileboxes.move_child(filebox, before=index)
+                current.remove(filebox)
+                current.insert(index, filebox)
@@ -0,0 +1,143 @@
+from pathlib import Path
+from typing import Optional
+
+from pack_index import IndexedPack, get_pack_index
+
+from rich.markup import escape
+from textual import on, work
+from textual.app import ComposeResult
+from textual.containers import Horizontal
+from textual.message import Message
+from textual.widgets import Button, Input, Label, OptionList, Static
+from textual.widgets.option_list import Option
+from textual.worker import get_current_worker
+
+
+class PackPicker(Static):
+    """Searches the packs found on this machine. The index is searched as
+    soon as the picker opens, while a background scan brings it up to date."""
+
+    class Selected(Message):
+        def __init__(self, path: Path) -> None:
+            self.path = path
+            super().__init__()
+
+    class Browse(Message):
+        """Asks for the directory tree instead."""
+
+    BINDINGS = [("down", "focus_results", "Results")]
+
+    DEFAULT_CSS = """
+    PackPicker {
+        height: auto;
+    }
+
+    #pack-search {
+        width: 5fr;
+    }
+
+    #pack-browse {
+        width: 1fr;
+    }
+
+    #pack-results {
+        height: auto;
+        max-height: 15;
+    }
+
+    #pack-scan-status {
+        color: $text-muted;
+        margin-left: 1;
+    }
+
+    PackPicker Horizontal {
+        height: auto;
+    }
+    """
+
+    def __init__(
+        self, roots: Optional[list[Path]] = None, *, id: Optional[str] = None
+    ) -> None:
+        """
+        Args:
+            roots (Optional[list[Path]], optional): Directories to scan for
+            packs. Defaults to the home directory.
+        """
+        super().__init__(id=id)
+        self.roots: list[Path] = roots or [Path.home()]
+        self._results: list[IndexedPack] = []
+
+    def compose(self) -> ComposeResult:
+        with Horizontal():
+            yield Input(placeholder="Search packs", id="pack-search")
+            yield Button("Browse", id="pack-browse")
+        yield OptionList(id="pack-results")
+        yield Label("Scanning for packs", id="pack-scan-status")
+
+    def on_mount(self) -> None:
+        self.query_one("#pack-search", Input).focus()
+        self.refresh_results()
+        self.scan_packs()
+
+    @work(thread=True, exclusive=True, group="pack-scan")
+    def scan_packs(self) -> None:
+        # Removing the picker cancels the worker, which stops the walk
+        # rather than leaving it to finish against a detached picker.
+        worker = get_current_worker()
+
+        def is_cancelled() -> bool:
+            return worker.is_cancelled
+
+        def on_progress(found: int) -> None:
+            if not worker.is_cancelled:
+                self.app.call_from_thread(self._show_scan_progress)
+
+        found = get_pack_index().scan(
+            self.roots, on_progress=on_progress, is_cancelled=is_cancelled
+        )
+        if not worker.is_cancelled:
+            self.app.call_from_thread(self._show_scan_progress, found)
+
+    def _show_scan_progress(self, found: Optional[int] = None) -> None:
+        # Runs on the app's thread, where the picker may have been removed
+        # since the scan asked for it.
+        if not self.is_attached:
+            return
+        self.refresh_results()
+        if found is not None:
+            self.query_one("#pack-scan-status", Label).update(f"{found} packs found")
+
+    @on(Input.Changed, "#pack-search")
+    def refresh_results(self) -> None:
+        """Lists the indexed packs matching the search."""
+        query = self.query_one("#pack-search", Input).value
+        self._results = get_pack_index().search(query)
+        results = self.query_one("#pack-results", OptionList)
+        results.clear_options()
+        results.add_options(
+            Option(
+                f"{escape(pack.name)} {escape(pack.version_id)}"
+                f"  [dim]{escape(str(pack.path))}[/dim]"
+            )
+            for pack in self._results
+        )
+        if self._results:
+            results.highlighted = 0
+
+    @on(Input.Submitted, "#pack-search")
+    def select_highlighted(self) -> None:
+        highlighted = self.query_one("#pack-results", OptionList).highlighted
+        if highlighted is not None and highlighted < len(self._results):
+            self.post_message(self.Selected(self._results[highlighted].path))
+
+    @on(OptionList.OptionSelected, "#pack-results")
+    def select_option(self, event: OptionList.OptionSelected) -> None:
+        self.post_message(self.Selected(self._results[event.option_index].path))
+
+    def action_focus_results(self) -> None:
+        self.query_one("#pack-results", OptionList).focus()
+
+    @on(Button.Pressed, "#pack-browse")
+    def browse(self, event: Button.Pressed) -> None:
+        event.stop()
+        self.post_message(self.Browse())
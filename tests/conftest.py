@@ -0,0 +1,51 @@
+import pathlib
+from typing import Iterator
+
+import pytest
+
+import instance
+import manifest_history
+import modrinth_api
+import pack_index
+from metadata_cache import MetadataCache
+from mock_api import MockFileServer, MockModrinthServer
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[None]:
+    """Keeps every cache, history and index of a test in its own directory."""
+    cache_dir = tmp_path.joinpath("cache")
+    monkeypatch.setenv("MANIFEST_MANAGER_CACHE_DIR", str(cache_dir))
+    cache_dir.mkdir()
+    modrinth_api.set_metadata_cache(
+        MetadataCache(cache_dir.joinpath("metadata.sqlite3"))
+    )
+    manifest_history.set_history(None)
+    instance.set_digest_cache(None)
+    pack_index.set_pack_index(None)
+    yield
+    modrinth_api.set_metadata_cache(None)
+    instance.set_digest_cache(None)
+    pack_index.set_pack_index(None)
+
+
+@pytest.fixture
+def api_server() -> Iterator[MockModrinthServer]:
+    """A local Modrinth API that the shared client sends every request to.
+    Retries back off for milliseconds rather than seconds."""
+    with MockModrinthServer() as server:
+        client = modrinth_api.ModrinthClient(
+            api_url=server.api_url, backoff_factor=0.01, max_backoff=1.0
+        )
+        modrinth_api.set_client(client)
+        yield server
+        client.close()
+
+
+@pytest.fixture
+def file_server(api_server: MockModrinthServer) -> Iterator[MockFileServer]:
+    """A local CDN, downloaded from through the same client as api_server."""
+    with MockFileServer() as server:
+        yield server
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import pathlib
+import zipfile
+
+from installer import Installer, install_pack
+from manifest import ModrinthFile
+from mock_api import MockFileServer
+
+
+def _file_json(path: str, content: bytes, downloads: list[str]) -> dict:
+    return {
+        "path": path,
+        "downloads": downloads,
+        "hashes": {
+            "sha1": hashlib.sha1(content).hexdigest(),
+            "sha512": hashlib.sha512(content).hexdigest(),
+        },
+        "fileSize": len(content),
+    }
+
+
+def _write_pack(path: pathlib.Path, files: list[dict]) -> None:
+    manifest_json = {
+        "formatVersion": 1,
+        "game": "minecraft",
+        "versionId": "1.0",
+        "name": "Pack",
+        "files": files,
+        "dependencies": {"minecraft": "1.20.1"},
+    }
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("modrinth.index.json", json.dumps(manifest_json))
+        archive.writestr("overrides/config/a.cfg", b"a")
+        archive.writestr("server-overrides/server.properties", b"s")
+
+
+def test_installs_files_and_overrides(
+    tmp_path: pathlib.Path, file_server: MockFileServer
+) -> None:
+    contents = {f"mods/{index}.jar": os.urandom(10_000) for index in range(5)}
+    files = [
+        _file_json(path, content, [file_server.add_file(path, content)])
+        for path, content in contents.items()
+    ]
+    _write_pack(tmp_path.joinpath("pack.mrpack"), files)
+    instance_dir = tmp_path.joinpath("instance")
+
+    report = install_pack(tmp_path.joinpath("pack.mrpack"), instance_dir, side="server")
+
+    assert not report.failed
+    for path, content in contents.items():
+        assert instance_dir.joinpath(path).read_bytes() == content
+    assert instance_dir.joinpath("config/a.cfg").read_bytes() == b"a"
+    assert instance_dir.joinpath("server.properties").read_bytes() == b"s"
+
+    # Installing again only checks the files that are already there.
+    again = install_pack(tmp_path.joinpath("pack.mrpack"), instance_dir)
+    assert all(timing.skipped for timing in again.files)
+    assert sum(file_server.requests.values()) == len(contents)
+
+
+def test_resumes_a_truncated_download(
+    tmp_path: pathlib.Path, file_server: MockFileServer
+) -> None:
+    content = os.urandom(1_000_000)
+    url = file_server.add_file("mods/a.jar", content)
+    # Past the first chunk written to the .part file.
+    file_server.truncate["mods/a.jar"] = 400_000
+    file = ModrinthFile(_file_json("mods/a.jar", content, [url]))
+
+    timing = Installer().install_file(file, tmp_path)
+
+    assert timing.error is None
+    assert timing.resumed
+    assert tmp_path.joinpath("mods/a.jar").read_bytes() == content
+    assert not tmp_path.joinpath("mods/a.jar.part").exists()
+    assert file_server.requests["mods/a.jar"] == 2
+    assert file_server.range_requests["mods/a.jar"] == 1
+    # Nothing already in the .part file was downloaded again.
+    assert timing.bytes == len(content)
+
+
+def test_restarts_when_the_partial_file_cannot_be_resumed(
+    tmp_path: pathlib.Path, file_server: MockFileServer
+) -> None:
+    content = os.urandom(50_000)
+    url = file_server.add_file("mods/a.jar", content)
+    tmp_path.joinpath("mods").mkdir()
+    tmp_path.joinpath("mods/a.jar.part").write_bytes(os.urandom(60_000))
+    file = ModrinthFile(_file_json("mods/a.jar", content, [url]))
+
+    timing = Installer().install_file(file, tmp_path)
+
+    assert timing.error is None
+    assert not timing.resumed
+    assert tmp_path.joinpath("mods/a.jar").read_bytes() == content
+    # The 416 isn't retried by the client, the installer starts over once.
+    assert file_server.range_requests["mods/a.jar"] == 1
+    assert file_server.requests["mods/a.jar"] == 2
+
+
+def test_rejects_content_that_does_not_match_its_hashes(
+    tmp_path: pathlib.Path, file_server: MockFileServer
+) -> None:
+    content = os.urandom(10_000)
+    tampered = file_server.add_file("mirror/a.jar", os.urandom(10_000))
+    good = file_server.add_file("cdn/a.jar", content)
+    file = ModrinthFile(_file_json("mods/a.jar", content, [tampered, good]))
+    installer = Installer(attempts_per_url=2)
+
+    timing = installer.install_file(file, tmp_path)
+
+    assert timing.error is None
+    assert timing.url == good
+    assert tmp_path.joinpath("mods/a.jar").read_bytes() == content
+    assert file_server.requests["mirror/a.jar"] == installer.attempts_per_url
+    assert file_server.requests["cdn/a.jar"] == 1
+
+
+def test_rejects_a_sha512_mismatch_even_when_sha1_matches(
+    tmp_path: pathlib.Path, file_server: MockFileServer
+) -> None:
+    content = os.urandom(10_000)
+    url = file_server.add_file("mods/a.jar", content)
+    file_json = _file_json("mods/a.jar", content, [url])
+    file_json["hashes"]["sha512"] = "0" * 128
+
+    timing = Installer(attempts_per_url=1).install_file(
+        ModrinthFile(file_json), tmp_path
+    )
+
+    assert timing.error is not None and "hashes" in timing.error
+    assert not tmp_path.joinpath("mods/a.jar").exists()
+    assert not tmp_path.joinpath("mods/a.jar.part").exists()
+
+
+def test_fails_over_to_the_next_url(
+    tmp_path: pathlib.Path, file_server: MockFileServer
+) -> None:
+    content = os.urandom(10_000)
+    broken = file_server.add_file("broken/a.jar", content)
+    file_server.failing.add("broken/a.jar")
+    good = file_server.add_file("cdn/a.jar", content)
+    file = ModrinthFile(_file_json("mods/a.jar", content, [broken, good]))
+
+    timing = Installer(attempts_per_url=1).install_file(file, tmp_path)
+
+    assert timing.error is None
+    assert timing.url == good
+    assert file_server.requests["cdn/a.jar"] == 1
+
+
+def test_overrides_are_not_unpacked_when_a_file_fails(
+    tmp_path: pathlib.Path, file_server: MockFileServer
+) -> None:
+    content = os.urandom(10_000)
+    url = file_server.add_file("mods/a.jar", content)
+    file_server.failing.add("mods/a.jar")
+    _write_pack(
+        tmp_path.joinpath("pack.mrpack"), [_file_json("mods/a.jar", content, [url])]
+    )
+    instance_dir = tmp_path.joinpath("instance")
+
+    report = install_pack(tmp_path.joinpath("pack.mrpack"), instance_dir)
+
+    assert report.failed == ["mods/a.jar"]
+    assert not instance_dir.joinpath("config/a.cfg").exists()
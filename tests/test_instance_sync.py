@@ -0,0 +1,147 @@
+import hashlib
+import os
+import pathlib
+
+import pytest
+
+import instance_sync
+from installer import Installer
+from instance_sync import recover_instance, sync_instance
+from manifest import ModrinthManifest
+from manifest_diff import ManifestDiff, diff_manifests
+from mock_api import MockFileServer
+
+
+class _Crash(BaseException):
+    """Stands in for the process dying, which no except clause handles."""
+
+
+def _manifest(
+    file_server: MockFileServer, contents: dict[str, bytes], version: str
+) -> ModrinthManifest:
+    files = [
+        {
+            "path": path,
+            "downloads": [
+                file_server.add_file(hashlib.sha1(content).hexdigest(), content)
+            ],
+            "hashes": {
+                "sha1": hashlib.sha1(content).hexdigest(),
+                "sha512": hashlib.sha512(content).hexdigest(),
+            },
+            "fileSize": len(content),
+        }
+        for path, content in contents.items()
+    ]
+    manifest_json = {
+        "formatVersion": 1,
+        "game": "minecraft",
+        "versionId": version,
+        "name": "Pack",
+        "files": files,
+        "dependencies": {"minecraft": "1.20.1"},
+    }
+    return ModrinthManifest(manifest_json, enrich=False)
+
+
+@pytest.fixture
+def versions(
+    tmp_path: pathlib.Path, file_server: MockFileServer
+) -> tuple[pathlib.Path, dict[str, bytes], dict[str, bytes], ManifestDiff]:
+    """An instance installed at version 1.0, and a diff to 1.1 that keeps one
+    file, drops two and adds two."""
+    old = {f"mods/{name}.jar": os.urandom(5_000) for name in ("a", "b", "c")}
+    new = {
+        "mods/a.jar": old["mods/a.jar"],
+        "mods/d.jar": os.urandom(5_000),
+        "mods/e.jar": os.urandom(5_000),
+    }
+    instance_dir = tmp_path.joinpath("instance")
+    old_manifest = _manifest(file_server, old, "1.0")
+    assert not Installer().install(old_manifest, instance_dir).failed
+    new_manifest = _manifest(file_server, new, "1.1")
+    return instance_dir, old, new, diff_manifests(new_manifest, old_manifest)
+
+
+def _contents(instance_dir: pathlib.Path) -> dict[str, bytes]:
+    return {
+        path.relative_to(instance_dir).as_posix(): path.read_bytes()
+        for path in instance_dir.rglob("*")
+        if path.is_file() and instance_sync._sync_dir_name not in path.parts
+    }
+
+
+def test_syncs_only_the_changed_files(versions) -> None:
+    instance_dir, old, new, diff = versions
+    kept = instance_dir.joinpath("mods/a.jar").stat().st_ino
+
+    report = sync_instance(diff, instance_dir)
+
+    assert report.to_json()["ok"]
+    assert sorted(report.removed) == ["mods/b.jar", "mods/c.jar"]
+    assert sorted(report.placed) == ["mods/d.jar", "mods/e.jar"]
+    assert _contents(instance_dir) == new
+    assert instance_dir.joinpath("mods/a.jar").stat().st_ino == kept
+
+
+def test_failed_download_leaves_the_instance_untouched(
+    versions, file_server: MockFileServer
+) -> None:
+    instance_dir, old, new, diff = versions
+    file_server.failing.add(hashlib.sha1(new["mods/e.jar"]).hexdigest())
+
+    report = sync_instance(diff, instance_dir, Installer(attempts_per_url=1))
+
+    assert report.failed == ["mods/e.jar"]
+    assert _contents(instance_dir) == old
+
+
+def test_failed_swap_is_rolled_back(versions) -> None:
+    instance_dir, old, new, diff = versions
+    # A directory in the way of a new file makes its rename fail after the
+    # old files were already moved aside.
+    instance_dir.joinpath("mods/e.jar").mkdir()
+    instance_dir.joinpath("mods/e.jar/keep").write_bytes(b"keep")
+
+    report = sync_instance(diff, instance_dir)
+
+    assert report.rolled_back
+    assert report.error is not None
+    assert _contents(instance_dir) == {**old, "mods/e.jar/keep": b"keep"}
+
+
+def test_interrupted_swap_is_recovered(
+    versions, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    instance_dir, old, new, diff = versions
+    journal_path = instance_sync._journal_path(
+        instance_dir.joinpath(instance_sync._sync_dir_name)
+    )
+    replace = os.replace
+    swapped: list[str] = []
+
+    def crash_part_way(source, destination) -> None:
+        # Dies once the swap moved both old files aside and placed one new
+        # file. Renames made while staging come before the journal.
+        if journal_path.exists():
+            if len(swapped) == 3:
+                raise _Crash()
+            swapped.append(str(destination))
+        replace(source, destination)
+
+    monkeypatch.setattr(instance_sync.os, "replace", crash_part_way)
+    with pytest.raises(_Crash):
+        sync_instance(diff, instance_dir)
+    monkeypatch.undo()
+
+    assert journal_path.exists()
+    assert _contents(instance_dir) == {
+        "mods/a.jar": old["mods/a.jar"],
+        "mods/d.jar": new["mods/d.jar"],
+    }
+
+    assert recover_instance(instance_dir)
+    assert not journal_path.parent.exists()
+    assert _contents(instance_dir) == old
+    assert not recover_instance(instance_dir)
+
@@ -0,0 +1,62 @@
+import hashlib
+import os
+import pathlib
+import stat
+
+from jar_store import JarStore
+
+
+def _add(store: JarStore, content: bytes) -> str:
+    sha1 = hashlib.sha1(content).hexdigest()
+    part = store.incoming_path(sha1)
+    part.write_bytes(content)
+    store.add(sha1, part)
+    return sha1
+
+
+def test_linked_files_stay_writable_and_replaceable(tmp_path: pathlib.Path) -> None:
+    store = JarStore(tmp_path.joinpath("store"))
+    sha1 = _add(store, b"jar")
+    target = tmp_path.joinpath("instance/mods/a.jar")
+
+    store.link(sha1, target)
+
+    assert target.read_bytes() == b"jar"
+    assert target.stat().st_mode & stat.S_IWUSR
+    # Relinking over an existing file, as a reinstall does, replaces it.
+    store.link(sha1, target)
+    target.unlink()
+
+
+def test_linking_clears_read_only_bits_left_by_older_stores(
+    tmp_path: pathlib.Path,
+) -> None:
+    store = JarStore(tmp_path.joinpath("store"))
+    sha1 = _add(store, b"jar")
+    os.chmod(store.object_path(sha1), stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+    store.link(sha1, tmp_path.joinpath("instance/mods/a.jar"))
+
+    assert store.object_path(sha1).stat().st_mode & stat.S_IWUSR
+
+
+def test_garbage_collection_keeps_referenced_files(tmp_path: pathlib.Path) -> None:
+    store = JarStore(tmp_path.joinpath("store"))
+    used = _add(store, b"used")
+    unused = _add(store, b"unused")
+    os.chmod(store.object_path(unused), stat.S_IRUSR)
+    instance_dir = tmp_path.joinpath("instance")
+    instance_dir.mkdir()
+    store.register(
+        instance_dir,
+        {"name": "Pack", "versionId": "1.0", "files": [{"hashes": {"sha1": used}}]},
+    )
+    # Collection skips files stored after it started.
+    past = store.object_path(unused).stat().st_mtime - 60
+    os.utime(store.object_path(unused), (past, past))
+
+    deleted, freed = store.collect_garbage()
+
+    assert (deleted, freed) == (1, len(b"unused"))
+    assert store.has(used)
+    assert not store.has(unused)
@@ -0,0 +1,147 @@
+import time
+
+import pytest
+import requests
+
+import modrinth_api
+from bench import generate_manifests, populate_server
+from mock_api import MockFileServer, MockModrinthServer
+
+
+def _hashes(manifest_json: dict) -> list[str]:
+    return [file_json["hashes"]["sha1"] for file_json in manifest_json["files"]]
+
+
+def test_retries_server_errors_until_one_succeeds(
+    api_server: MockModrinthServer,
+) -> None:
+    api_server.add_project({"id": "abc", "title": "A", "description": ""})
+    api_server.failures = [(500, None), (503, None)]
+
+    project = modrinth_api.get_project("abc")
+
+    assert project.title == "A"
+    assert api_server.requests["GET project"] == 3
+    assert modrinth_api.get_client().stats()["retries"] == 2
+
+
+def test_gives_up_after_max_retries(api_server: MockModrinthServer) -> None:
+    api_server.add_project({"id": "abc", "title": "A", "description": ""})
+    client = modrinth_api.get_client()
+    api_server.failures = [(502, None)] * (client.max_retries + 1)
+
+    with pytest.raises(requests.HTTPError):
+        modrinth_api.get_project("abc")
+
+    assert api_server.requests["GET project"] == client.max_retries + 1
+    assert client.stats()["failures"] == 1
+
+
+def test_waits_for_retry_after(api_server: MockModrinthServer) -> None:
+    api_server.add_project({"id": "abc", "title": "A", "description": ""})
+    api_server.failures = [(429, 0.3)]
+
+    started = time.monotonic()
+    modrinth_api.get_project("abc")
+
+    # The client's own backoff is milliseconds, so the wait came from the
+    # header.
+    assert time.monotonic() - started >= 0.3
+    assert api_server.requests["GET project"] == 2
+
+
+def test_client_errors_are_not_retried(api_server: MockModrinthServer) -> None:
+    with pytest.raises(requests.HTTPError) as raised:
+        modrinth_api.get_project("missing")
+
+    assert raised.value.response.status_code == 404
+    assert api_server.requests["GET project"] == 1
+
+
+def test_rate_limiter_paces_requests_under_the_limit() -> None:
+    with MockModrinthServer(rate_limit=5, period=1.0) as server:
+        server.add_project({"id": "abc", "title": "A", "description": ""})
+        client = modrinth_api.ModrinthClient(
+            api_url=server.api_url, rate_limiter=modrinth_api.RateLimiter(5, 1.0)
+        )
+        modrinth_api.set_client(client)
+
+        started = time.monotonic()
+        for _ in range(12):
+            modrinth_api.get_project("abc")
+        elapsed = time.monotonic() - started
+        client.close()
+
+    # Twelve requests at five a second span at least two window resets, and
+    # the limiter waits them out rather than running into 429s.
+    assert server.rate_limited == 0
+    assert server.requests["GET project"] == 12
+    assert elapsed >= 1.0
+
+
+def test_bulk_lookups_are_chunked_under_the_url_limit() -> None:
+    remote_json, local_json = generate_manifests(100)
+    with MockModrinthServer(max_url_length=512) as server:
+        populate_server(server, [remote_json, local_json])
+        ids = list(server.projects)
+        # 100 quoted ids in one query would be over twice the limit.
+        modrinth_api.set_client(
+            modrinth_api.ModrinthClient(api_url=server.api_url, ids_per_request=20)
+        )
+        modrinth_api.set_metadata_cache(None)
+
+        projects = modrinth_api.get_projects(ids)
+
+        assert len(projects) == len(ids)
+        assert server.requests["GET projects"] == -(-len(ids) // 20)
+
+        client = modrinth_api.ModrinthClient(
+            api_url=server.api_url, ids_per_request=1000
+        )
+        modrinth_api.set_client(client)
+        with pytest.raises(requests.HTTPError) as raised:
+            modrinth_api.get_projects(ids)
+        assert raised.value.response.status_code == 414
+        assert client.stats()["requests"] == 1
+        assert client.stats()["retries"] == 0
+
+
+def test_lookups_are_cached_including_unknown_hashes(
+    api_server: MockModrinthServer,
+) -> None:
+    remote_json, _ = generate_manifests(10)
+    populate_server(api_server, [remote_json])
+    hashes = _hashes(remote_json) + ["0" * 40]
+
+    first = modrinth_api.get_version_files_from_hashes(hashes)
+    second = modrinth_api.get_version_files_from_hashes(hashes)
+
+    assert len(first) == len(second) == 10
+    assert api_server.requests["POST version_files"] == 1
+
+
+def test_download_resumes_with_a_range(file_server: MockFileServer) -> None:
+    content = bytes(range(256)) * 64
+    url = file_server.add_file("data/a.jar", content)
+
+    with modrinth_api.get_client().download(
+        url, headers={"range": "bytes=1000-"}
+    ) as response:
+        body = b"".join(response.iter_content(4096))
+
+    assert response.status_code == 206
+    assert body == content[1000:]
+    assert file_server.range_requests["data/a.jar"] == 1
+
+
+def test_download_retries_then_raises_on_a_failing_url(
+    file_server: MockFileServer,
+) -> None:
+    url = file_server.add_file("data/a.jar", b"jar")
+    file_server.failing.add("data/a.jar")
+    client = modrinth_api.get_client()
+
+    with pytest.raises(requests.HTTPError):
+        client.download(url)
+
+    assert file_server.requests["data/a.jar"] == client.max_retries + 1
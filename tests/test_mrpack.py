@@ -0,0 +1,81 @@
+import json
+import os
+import pathlib
+import zipfile
+
+import pytest
+
+import mrpack
+from mrpack import MrPack
+
+_members = {
+    "overrides/config/a.cfg": b"a = 1\n" * 1000,
+    "overrides/resourcepacks/pack.zip": os.urandom(50_000),
+    "client-overrides/options.txt": b"fov:70\n",
+    "server-overrides/server.properties": b"motd=hi\n",
+    "README.txt": b"",
+}
+
+
+def _write_pack(path: pathlib.Path) -> None:
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(
+            "modrinth.index.json",
+            json.dumps({"name": "Pack", "versionId": "1.0", "files": []}),
+            compress_type=zipfile.ZIP_DEFLATED,
+        )
+        for name, content in _members.items():
+            # Stored and deflated members, as packs use both.
+            compress_type = (
+                zipfile.ZIP_STORED if name.endswith(".zip") else zipfile.ZIP_DEFLATED
+            )
+            archive.writestr(name, content, compress_type=compress_type)
+
+
+@pytest.fixture(params=["raw", "recompressed"])
+def copy_path(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> str:
+    """Runs a test against both ways members are copied: raw, and through
+    zipfile's public API where its internals aren't the expected ones."""
+    if request.param == "recompressed":
+        monkeypatch.setattr(mrpack, "_can_append_raw", lambda archive: False)
+    return request.param
+
+
+@pytest.mark.parametrize("in_place", [True, False])
+def test_copied_pack_passes_testzip(
+    tmp_path: pathlib.Path, copy_path: str, in_place: bool
+) -> None:
+    source = tmp_path.joinpath("pack.mrpack")
+    _write_pack(source)
+    destination = source if in_place else tmp_path.joinpath("copy.mrpack")
+    new_manifest = {"name": "Pack", "versionId": "2.0", "files": []}
+
+    MrPack(source).copy_manifest(new_manifest, destination)
+
+    with zipfile.ZipFile(destination) as archive:
+        assert archive.testzip() is None
+        assert sorted(archive.namelist()) == sorted(
+            [*_members, "modrinth.index.json"]
+        )
+        for name, content in _members.items():
+            assert archive.read(name) == content
+    assert MrPack(destination).read_manifest() == new_manifest
+    assert [path.name for path in tmp_path.iterdir() if path.suffix == ".tmp"] == []
+
+
+def test_copying_twice_keeps_the_archive_valid(
+    tmp_path: pathlib.Path, copy_path: str
+) -> None:
+    # A copied member's headers are read back by the next copy.
+    pack_path = tmp_path.joinpath("pack.mrpack")
+    _write_pack(pack_path)
+    for version in ("2.0", "3.0"):
+        MrPack(pack_path).copy_manifest(
+            {"name": "Pack", "versionId": version, "files": []}
+        )
+
+    with zipfile.ZipFile(pack_path) as archive:
+        assert archive.testzip() is None
+        for name, content in _members.items():
+            assert archive.read(name) == content
+    assert MrPack(pack_path).read_manifest()["versionId"] == "3.0"
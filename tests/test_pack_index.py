@@ -0,0 +1,87 @@
+import json
+import pathlib
+import threading
+import time
+import zipfile
+
+import pytest
+
+import pack_index
+from pack_index import PackIndex
+
+
+def _write_pack(path: pathlib.Path, name: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(
+            "modrinth.index.json",
+            json.dumps({"name": name, "versionId": "1.0", "files": []}),
+        )
+
+
+def test_scan_indexes_packs_and_drops_removed_ones(tmp_path: pathlib.Path) -> None:
+    root = tmp_path.joinpath("packs")
+    _write_pack(root.joinpath("a.mrpack"), "Alpha")
+    _write_pack(root.joinpath("nested/b.mrpack"), "Beta")
+    _write_pack(root.joinpath("node_modules/c.mrpack"), "Excluded")
+    index = PackIndex(tmp_path.joinpath("packs.sqlite3"))
+
+    assert index.scan([root]) == 2
+    assert [pack.name for pack in index.search("beta")] == ["Beta"]
+
+    root.joinpath("a.mrpack").unlink()
+    assert index.scan([root]) == 1
+    assert [pack.name for pack in index.search()] == ["Beta"]
+
+
+def test_cancelled_scan_keeps_the_packs_it_did_not_reach(
+    tmp_path: pathlib.Path,
+) -> None:
+    root = tmp_path.joinpath("packs")
+    for number in range(5):
+        _write_pack(root.joinpath(f"{number}.mrpack"), f"Pack {number}")
+    index = PackIndex(tmp_path.joinpath("packs.sqlite3"))
+    index.scan([root])
+
+    checks: list[None] = []
+
+    def cancel_part_way() -> bool:
+        checks.append(None)
+        return len(checks) > 2
+
+    index.scan([root], is_cancelled=cancel_part_way)
+
+    assert len(index) == 5
+
+
+def test_scans_of_the_same_root_run_one_at_a_time(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    root = tmp_path.joinpath("packs")
+    for number in range(5):
+        _write_pack(root.joinpath(f"{number}.mrpack"), f"Pack {number}")
+    index = PackIndex(tmp_path.joinpath("packs.sqlite3"))
+
+    # An overlapping scan could stamp packs as seen before an earlier one
+    # stamped them again with its older start time, then drop them as stale.
+    walk = pack_index._walk_packs
+    walking: list[None] = []
+    overlapped = threading.Event()
+
+    def slow_walk(*args):
+        walking.append(None)
+        if len(walking) > 1:
+            overlapped.set()
+        time.sleep(0.2)
+        yield from walk(*args)
+        walking.pop()
+
+    monkeypatch.setattr(pack_index, "_walk_packs", slow_walk)
+    scans = [threading.Thread(target=index.scan, args=([root],)) for _ in range(3)]
+    for scan in scans:
+        scan.start()
+    for scan in scans:
+        scan.join()
+
+    assert not overlapped.is_set()
+    assert len(index) == 5
@@ -0,0 +1,22 @@
+import os
+import pathlib
+import subprocess
+import sys
+
+_startup_check = (
+    pathlib.Path(__file__).parent.parent.joinpath("manifest_manager", "startup_check.py")
+)
+# Seconds from launch to the first frame, loosened on slow CI boxes with
+# MANIFEST_MANAGER_STARTUP_BUDGET.
+_budget = os.environ.get("MANIFEST_MANAGER_STARTUP_BUDGET", "1.0")
+
+
+def test_first_frame_within_budget(tmp_path: pathlib.Path) -> None:
+    result = subprocess.run(
+        [sys.executable, str(_startup_check), "--budget", _budget, "--runs", "3"],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "MANIFEST_MANAGER_CACHE_DIR": str(tmp_path)},
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
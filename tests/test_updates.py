@@ -0,0 +1,89 @@
+import hashlib
+
+from manifest import ModrinthManifest
+from mock_api import MockModrinthServer
+from updates import check_updates
+
+
+def _sha1(name: str) -> str:
+    return hashlib.sha1(name.encode()).hexdigest()
+
+
+def _version(project_id: str, number: str, date: str, files: list[str]) -> dict:
+    return {
+        "id": f"{project_id}-{number}",
+        "name": number,
+        "version_number": number,
+        "project_id": project_id,
+        "date_published": date,
+        "loaders": ["fabric"],
+        "game_versions": ["1.20.1"],
+        "files": [
+            {
+                "hashes": {"sha1": _sha1(name), "sha512": _sha1(name) * 3},
+                "url": f"https://cdn.example/{name}",
+                "filename": name,
+                "primary": True,
+                "size": 10,
+            }
+            for name in files
+        ],
+    }
+
+
+def _manifest(names: list[str]) -> ModrinthManifest:
+    return ModrinthManifest(
+        {
+            "formatVersion": 1,
+            "game": "minecraft",
+            "versionId": "1.0",
+            "name": "Pack",
+            "files": [
+                {
+                    "path": f"mods/{name}",
+                    "downloads": [f"https://cdn.example/{name}"],
+                    "hashes": {"sha1": _sha1(name), "sha512": _sha1(name) * 3},
+                    "env": {"client": "required", "server": "optional"},
+                    "fileSize": 10,
+                }
+                for name in names
+            ],
+            "dependencies": {"minecraft": "1.20.1", "fabric-loader": "0.15.0"},
+        },
+        enrich=False,
+    )
+
+
+def test_finds_newer_versions_and_rewrites_the_manifest(
+    api_server: MockModrinthServer,
+) -> None:
+    api_server.add_version_file(_version("a", "1.0", "2024-01-01", ["a-1.jar"]))
+    api_server.add_version_file(_version("a", "2.0", "2024-06-01", ["a-2.jar"]))
+    api_server.add_version_file(_version("b", "1.0", "2024-01-01", ["b-1.jar"]))
+    manifest = _manifest(["a-1.jar", "b-1.jar", "unknown.jar"])
+
+    check = check_updates(manifest)
+
+    assert check.known == 2
+    assert list(check.updates) == [_sha1("a-1.jar")]
+    files = check.updated_manifest_json()["files"]
+    assert [file["path"] for file in files] == [
+        "mods/a-2.jar",
+        "mods/b-1.jar",
+        "mods/unknown.jar",
+    ]
+    assert files[0]["downloads"] == ["https://cdn.example/a-2.jar"]
+    assert files[0]["env"] == {"client": "required", "server": "optional"}
+    assert api_server.requests["POST version_files"] == 1
+
+
+def test_skips_latest_versions_without_files(api_server: MockModrinthServer) -> None:
+    api_server.add_version_file(_version("a", "1.0", "2024-01-01", ["a-1.jar"]))
+    # Listed as the newest, but every one of its files was deleted.
+    api_server.add_version_file(_version("a", "2.0", "2024-06-01", []))
+
+    check = check_updates(_manifest(["a-1.jar"]))
+
+    assert check.updates == {}
+    assert check.to_json()["updates"] == []
+    assert check.updated_manifest_json()["files"][0]["path"] == "mods/a-1.jar"